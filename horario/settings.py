@@ -84,6 +84,33 @@ else:
         }
     }
 
+# --- CACHE ---
+# LocMemCache desaloja por LRU; con CULL_FREQUENCY = MAX_ENTRIES se descarta
+# de a una entrada (la usada hace más tiempo) al llenarse.
+GENERADOR_CACHE_ENTRADAS = int(os.environ.get('GENERADOR_CACHE_ENTRADAS', '500'))
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'generador': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'generador',
+        'TIMEOUT': int(os.environ.get('GENERADOR_CACHE_TIMEOUT', '3600')),
+        'OPTIONS': {
+            'MAX_ENTRIES': GENERADOR_CACHE_ENTRADAS,
+            'CULL_FREQUENCY': GENERADOR_CACHE_ENTRADAS,
+        },
+    },
+}
+
+# Memoria (MB por proceso) para los conjuntos factibles que se re-puntúan
+# cuando solo cambian las preferencias
+GENERADOR_FACTIBLES_MAX_MB = int(os.environ.get('GENERADOR_FACTIBLES_MAX_MB', '64'))
+
+# Directorio de los snapshots binarios de la oferta (compartido por web y worker,
+# que los mapean en memoria en vez de cargar cada uno su copia)
+GENERADOR_SNAPSHOTS_DIR = Path(os.environ.get('GENERADOR_SNAPSHOTS_DIR', BASE_DIR / 'snapshots'))
+
 # --- PASSWORD VALIDATION ---
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -110,3 +137,13 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_REDIRECT_URL = 'inicio'
 LOGIN_URL = 'login'
 LOGOUT_REDIRECT_URL = 'inicio'
+
+# --- GENERADOR DE HORARIOS ---
+# Procesos para la búsqueda paralela (1 = búsqueda serial en el mismo proceso)
+GENERADOR_PROCESOS = int(os.environ.get('GENERADOR_PROCESOS', '1'))
+
+# Segundos que se conserva (y reutiliza) el resultado de un trabajo de generación
+GENERADOR_TTL_RESULTADOS = int(os.environ.get('GENERADOR_TTL_RESULTADOS', '3600'))
+
+# Segundos de la búsqueda heurística (solicitudes demasiado grandes para la exacta)
+GENERADOR_TIEMPO_HEURISTICO = float(os.environ.get('GENERADOR_TIEMPO_HEURISTICO', '5'))
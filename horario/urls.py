@@ -16,6 +16,13 @@ urlpatterns = [
     # --- GENERADOR DE HORARIOS ---
     path('api/generador/asignaturas/', views.api_asignaturas_generador, name='api_asignaturas_generador'),
     path('api/generador/generar/', views.api_generar_horarios, name='api_generar_horarios'),
+    path('api/generador/generar/stream/', views.api_generar_horarios_stream, name='api_generar_horarios_stream'),
+    path('api/generador/intercambiar/', views.api_intercambiar_seccion, name='api_intercambiar_seccion'),
+    path('api/generador/contar/', views.api_contar_combinaciones, name='api_contar_combinaciones'),
+    path('api/generador/lote/', views.api_generar_lote, name='api_generar_lote'),
+    path('api/generador/cache/', views.api_estadisticas_cache_generador, name='api_estadisticas_cache_generador'),
+    path('api/generador/trabajos/', views.api_crear_trabajo_generacion, name='api_crear_trabajo'),
+    path('api/generador/trabajos/<uuid:trabajo_id>/', views.api_estado_trabajo_generacion, name='api_estado_trabajo'),
 
     # --- AUTENTICACIÓN (MEJORADO) ---
     path('login/', auth_views.LoginView.as_view(
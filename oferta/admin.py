@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Asignatura, Horario, HorarioGuardado
+from .models import Asignatura, Horario, HorarioGuardado, TrabajoGeneracion
 
 # 1. Define una clase ModelAdmin personalizada para Asignatura
 @admin.register(Asignatura)
@@ -39,4 +39,11 @@ class HorarioAdmin(admin.ModelAdmin):
     get_asignatura_nombre.short_description = 'Asignatura'
     get_asignatura_nombre.admin_order_field = 'asignatura'
 
-admin.site.register(HorarioGuardado)
\ No newline at end of file
+admin.site.register(HorarioGuardado)
+
+
+@admin.register(TrabajoGeneracion)
+class TrabajoGeneracionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'estado', 'creado_en', 'terminado_en', 'expira_en', 'tomado_por')
+    list_filter = ('estado',)
+    readonly_fields = ('clave', 'parametros', 'resultado', 'creado_en', 'iniciado_en', 'terminado_en')
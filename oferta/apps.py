@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class OfertaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'oferta'
+
+    def ready(self):
+        from .signals import conectar
+        conectar()
@@ -0,0 +1,181 @@
+"""
+Benchmark del generador automático de horarios.
+
+Ejecuta `generar_combinaciones_optimizado` sobre conjuntos de siglas tomados de
+una sede cargada (--sede) o de una oferta sintética con la forma de la oferta
+real, y reporta nodos explorados y tiempo por estrategia de orden de siglas.
+Con --memoria compara además la memoria y el tiempo de carga de la sede como
+instancias de modelo (con prefetch de horarios), como snapshot compilado y como
+snapshot mapeado desde archivo (sus páginas son compartidas entre procesos).
+La oferta sintética se crea dentro de una transacción que se revierte al final.
+"""
+
+import gc
+import io
+import random
+import tempfile
+import statistics
+import time as reloj
+import tracemalloc
+from collections import defaultdict
+from contextlib import redirect_stdout
+from datetime import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from oferta.models import Asignatura, Horario, VersionOferta
+from oferta.signals import carga_masiva
+from oferta.views.generador_snapshot import abrir_snapshot, cargar_snapshot, escribir_snapshot
+from oferta.views.generador_mitades import MOTORES
+from oferta.views.generador_utils import ESTRATEGIAS_ORDEN, generar_combinaciones_optimizado
+
+SEDE_SINTETICA = '__benchmark__'
+DIAS = ['Lu', 'Ma', 'Mi', 'Ju', 'Vi', 'Sa']
+MODULOS = {
+    'Diurna': [8 * 60 + 31, 10 * 60 + 1, 11 * 60 + 31, 13 * 60 + 1, 14 * 60 + 31, 16 * 60 + 1],
+    'Vespertina': [17 * 60 + 31, 19 * 60 + 1, 20 * 60 + 31],
+}
+SECCIONES_POSIBLES = [2, 2, 3, 4, 4, 6, 8, 10, 14, 20, 30]
+
+
+def crear_oferta_sintetica(rng, num_siglas):
+    """
+    Oferta con la forma de la real: pocas siglas con muchas secciones y muchas
+    con pocas, dos jornadas y bloques de 80 minutos alineados a módulos.
+    """
+    with carga_masiva():
+        for n in range(num_siglas):
+            sigla = f'BEN{n:03d}'
+            for s in range(rng.choice(SECCIONES_POSIBLES)):
+                jornada = 'Diurna' if rng.random() < 0.75 else 'Vespertina'
+                asig = Asignatura.objects.create(
+                    sede=SEDE_SINTETICA, carrera='Benchmark', plan='1', jornada=jornada,
+                    nivel='1', sigla=sigla, nombre=f'Asignatura {n}', seccion=f'{sigla}-{s:03d}',
+                    docente='', virtual_sincronica=str(rng.random() < 0.2),
+                )
+                for dia in rng.sample(DIAS[:5], rng.choice([1, 2, 2, 3])):
+                    inicio = rng.choice(MODULOS[jornada])
+                    fin = inicio + 80
+                    Horario.objects.create(
+                        asignatura=asig, dia=dia,
+                        hora_inicio=time(inicio // 60, inicio % 60),
+                        hora_fin=time(fin // 60, fin % 60),
+                    )
+    VersionOferta.incrementar(SEDE_SINTETICA)
+
+
+def cargar_por_sigla(sede, siglas):
+    por_sigla = defaultdict(list)
+    asignaturas = (
+        Asignatura.objects.filter(sede=sede, sigla__in=siglas)
+        .order_by('id').prefetch_related('horarios')
+    )
+    for asig in asignaturas:
+        por_sigla[asig.sigla].append(asig)
+    return por_sigla
+
+
+def medir_carga(cargar):
+    """(bytes retenidos, segundos) de lo que retorna `cargar()`."""
+    gc.collect()
+    tracemalloc.start()
+    inicio = reloj.perf_counter()
+    resultado = cargar()
+    segundos = reloj.perf_counter() - inicio
+    retenidos = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del resultado
+    return retenidos, segundos
+
+
+def ejecutar(por_sigla, preferencias, **kwargs):
+    estadisticas = {}
+    with redirect_stdout(io.StringIO()):
+        generar_combinaciones_optimizado(por_sigla, dict(preferencias), estadisticas=estadisticas, **kwargs)
+    return estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Mide nodos explorados y tiempo del generador de horarios por estrategia.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sede', help='Sede cargada a usar (por defecto, oferta sintética)')
+        parser.add_argument('--siglas', type=int, default=6, help='Siglas por solicitud')
+        parser.add_argument('--muestras', type=int, default=5, help='Solicitudes a medir')
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--preferencia', default='entrar_temprano',
+                            help='preferencia_horario de las solicitudes')
+        parser.add_argument('--tamano-lote', type=int, default=0,
+                            help='Puntuar hojas de a lotes vectorizados (0 = escalar)')
+        parser.add_argument('--procesos', type=int, default=1,
+                            help='Procesos para la búsqueda paralela (1 = serial)')
+        parser.add_argument('--motor', choices=MOTORES, default='auto',
+                            help='Motor de búsqueda (auto elige por estimación de costo)')
+        parser.add_argument('--sin-agrupar', action='store_true',
+                            help='Buscar sección por sección, sin agrupar las de igual horario')
+        parser.add_argument('--memoria', action='store_true',
+                            help='Comparar memoria de modelos vs snapshot compilado de la sede')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['semilla'])
+        preferencias = {'preferencia_horario': options['preferencia']}
+
+        with transaction.atomic():
+            sede = options['sede']
+            if not sede:
+                sede = SEDE_SINTETICA
+                crear_oferta_sintetica(rng, num_siglas=options['siglas'] * 3)
+
+            disponibles = sorted(
+                Asignatura.objects.filter(sede=sede).values_list('sigla', flat=True).distinct()
+            )
+            if len(disponibles) < options['siglas']:
+                self.stderr.write(f'La sede {sede} tiene solo {len(disponibles)} siglas')
+                transaction.set_rollback(True)
+                return
+
+            solicitudes = [
+                cargar_por_sigla(sede, rng.sample(disponibles, options['siglas']))
+                for _ in range(options['muestras'])
+            ]
+
+            self.stdout.write(
+                f"{'estrategia':<18}{'exploradas':>12}{'válidas':>10}{'podadas_cota':>14}{'tiempo (s)':>12}"
+            )
+            for estrategia in ESTRATEGIAS_ORDEN:
+                resultados = [
+                    ejecutar(por_sigla, preferencias, orden_siglas=estrategia,
+                             tamano_lote=options['tamano_lote'], procesos=options['procesos'],
+                             agrupar=not options['sin_agrupar'], motor=options['motor'])
+                    for por_sigla in solicitudes
+                ]
+                self.stdout.write(
+                    f"{estrategia:<18}"
+                    f"{sum(r['exploradas'] for r in resultados):>12}"
+                    f"{sum(r['validas'] for r in resultados):>10}"
+                    f"{sum(r['podadas_cota'] for r in resultados):>14}"
+                    f"{statistics.mean(r['tiempo'] for r in resultados):>12.3f}"
+                )
+
+            if options['memoria']:
+                self.comparar_memoria(sede)
+
+            transaction.set_rollback(True)
+
+    def comparar_memoria(self, sede):
+        secciones = Asignatura.objects.filter(sede=sede).count()
+        modelos = medir_carga(
+            lambda: list(Asignatura.objects.filter(sede=sede).prefetch_related('horarios'))
+        )
+        snapshot = medir_carga(lambda: cargar_snapshot(sede))
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = Path(directorio) / 'snapshot.bin'
+            escribir_snapshot(cargar_snapshot(sede), ruta)
+            mapeado = medir_carga(lambda: abrir_snapshot(ruta))
+        self.stdout.write(f"\nCarga de la sede {sede} ({secciones} secciones)")
+        self.stdout.write(f"{'forma':<18}{'memoria (KiB)':>16}{'tiempo (s)':>12}")
+        for nombre, (retenidos, segundos) in (('modelos', modelos), ('snapshot', snapshot),
+                                                ('snapshot (mmap)', mapeado)):
+            self.stdout.write(f"{nombre:<18}{retenidos / 1024:>16.1f}{segundos:>12.3f}")
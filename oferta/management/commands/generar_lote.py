@@ -0,0 +1,105 @@
+"""
+Genera horarios para un lote de solicitudes de una sede (ver `oferta.views.lotes`).
+
+Las solicitudes se leen de un archivo JSON (una lista de cuerpos como los de
+la API de generación, o {'solicitudes': [...]}) o, con --por-nivel, se arman
+desde la oferta: una por carrera, nivel y jornada, con todas sus siglas. El
+resultado, con uno por solicitud en el mismo orden, se escribe como JSON en
+--salida o en la salida estándar.
+"""
+
+import io
+import json
+from contextlib import redirect_stdout
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from oferta.models import Asignatura
+from oferta.views.lotes import MAX_SOLICITUDES_LOTE, TIEMPO_POR_SOLICITUD, generar_lote, validar_lote
+
+
+def solicitudes_por_nivel(sede, carrera=None, preferencias=None):
+    """Una solicitud por carrera, nivel y jornada de la sede, con todas sus siglas."""
+    asignaturas = Asignatura.objects.filter(sede=sede)
+    if carrera:
+        asignaturas = asignaturas.filter(carrera=carrera)
+    siglas = {}
+    for carrera, nivel, jornada, sigla in asignaturas.values_list('carrera', 'nivel', 'jornada', 'sigla'):
+        siglas.setdefault((carrera, nivel, jornada), set()).add(sigla)
+    return [
+        {
+            'etiqueta': f'{carrera} · nivel {nivel} · {jornada}',
+            'siglas': sorted(siglas[carrera, nivel, jornada]),
+            'jornada': jornada,
+            'preferencias': dict(preferencias or {}),
+        }
+        for carrera, nivel, jornada in sorted(siglas)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Genera horarios para un lote de solicitudes de una sede, en una sola pasada.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sede', required=True)
+        parser.add_argument('--archivo', help='JSON con las solicitudes del lote')
+        parser.add_argument('--por-nivel', action='store_true',
+                            help='Una solicitud por carrera, nivel y jornada de la oferta de la sede')
+        parser.add_argument('--carrera', help='Con --por-nivel, solo esta carrera')
+        parser.add_argument('--preferencia', default='neutro',
+                            help='Con --por-nivel, preferencia_horario de las solicitudes')
+        parser.add_argument('--tiempo', type=float, default=TIEMPO_POR_SOLICITUD,
+                            help='Segundos por solicitud')
+        parser.add_argument('--procesos', type=int, default=settings.GENERADOR_PROCESOS,
+                            help='Procesos del pool (1 = en este proceso)')
+        parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, la salida estándar)')
+
+    def handle(self, *args, **options):
+        if bool(options['archivo']) == options['por_nivel']:
+            raise CommandError('Indica --archivo o --por-nivel (uno de los dos)')
+
+        if options['archivo']:
+            with open(options['archivo'], encoding='utf-8') as archivo:
+                contenido = json.load(archivo)
+            solicitudes = contenido.get('solicitudes') if isinstance(contenido, dict) else contenido
+        else:
+            solicitudes = solicitudes_por_nivel(
+                options['sede'], options['carrera'], {'preferencia_horario': options['preferencia']}
+            )
+
+        if not isinstance(solicitudes, list) or not solicitudes:
+            raise CommandError('No hay solicitudes que generar')
+
+        # Los lotes más grandes que MAX_SOLICITUDES_LOTE se procesan por partes
+        resultados, estadisticas = [], None
+        for desde in range(0, len(solicitudes), MAX_SOLICITUDES_LOTE):
+            sede, parte, max_tiempo, error = validar_lote({
+                'sede': options['sede'], 'solicitudes': solicitudes[desde:desde + MAX_SOLICITUDES_LOTE],
+                'tiempo_por_solicitud': options['tiempo'],
+            })
+            if error:
+                raise CommandError(error)
+            with redirect_stdout(io.StringIO()):  # sin las estadísticas de cada búsqueda
+                parciales, estadisticas_lote = generar_lote(sede, parte, procesos=options['procesos'],
+                                                            max_tiempo=max_tiempo)
+            resultados.extend(parciales)
+            if estadisticas is None:
+                estadisticas = estadisticas_lote
+            else:
+                for campo, valor in estadisticas_lote.items():
+                    if campo not in ('procesos', 'secciones_compartidas'):
+                        estadisticas[campo] += valor
+
+        salida = json.dumps({'sede': sede, 'resultados': resultados, 'estadisticas': estadisticas},
+                            ensure_ascii=False, indent=2)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(salida)
+            errores = sum('error' in resultado for resultado in resultados)
+            self.stdout.write(
+                f"{len(resultados)} solicitud(es), {errores} sin horarios, "
+                f"{estadisticas['tiempo']:.2f}s -> {options['salida']}"
+            )
+        else:
+            self.stdout.write(salida)
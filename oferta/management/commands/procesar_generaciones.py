@@ -0,0 +1,47 @@
+"""
+Proceso que ejecuta la cola de trabajos del generador de horarios.
+
+Se corre aparte del servidor web (ver docker-compose.yml); pueden correr varios
+a la vez, porque cada trabajo se toma con un UPDATE condicional.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from oferta.views.trabajos import (
+    ejecutar_trabajo,
+    liberar_trabajos_abandonados,
+    purgar_trabajos_vencidos,
+    tomar_siguiente_trabajo,
+)
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta los trabajos pendientes del generador de horarios.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesar lo pendiente y terminar')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            liberados = liberar_trabajos_abandonados()
+            if liberados:
+                self.stdout.write(f'{liberados} trabajo(s) abandonado(s) devuelto(s) a la cola')
+            purgar_trabajos_vencidos()
+
+            trabajo = tomar_siguiente_trabajo()
+            if trabajo is None:
+                if options['una_vez']:
+                    return
+                time.sleep(options['intervalo'])
+                continue
+
+            inicio = time.time()
+            trabajo = ejecutar_trabajo(trabajo)
+            self.stdout.write(f'Trabajo {trabajo.id}: {trabajo.estado} en {time.time() - inicio:.2f}s')
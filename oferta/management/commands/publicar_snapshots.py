@@ -0,0 +1,27 @@
+"""
+Publica los snapshots binarios de la oferta (uno por sede y versión).
+
+`cargar_excel` ya publica el de la sede recargada; este comando sirve para
+generarlos al desplegar o tras cambios hechos fuera de la carga de Excel.
+"""
+
+from django.core.management.base import BaseCommand
+
+from oferta.models import Asignatura
+from oferta.views.generador_snapshot import publicar_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Escribe los snapshots binarios de la oferta que mapean los procesos del generador.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sede', action='append',
+                            help='Sede a publicar (se puede repetir; por defecto, todas)')
+
+    def handle(self, *args, **options):
+        sedes = options['sede'] or (
+            Asignatura.objects.order_by('sede').values_list('sede', flat=True).distinct()
+        )
+        for sede in sedes:
+            ruta = publicar_snapshot(sede)
+            self.stdout.write(f'{sede}: {ruta} ({ruta.stat().st_size / 1024:.1f} KiB)')
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oferta', '0004_trabajogeneracion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionOferta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sede', models.CharField(max_length=100, unique=True)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('actualizada_en', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
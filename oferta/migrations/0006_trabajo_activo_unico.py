@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 02:16
+
+from django.db import migrations, models
+
+
+def retirar_duplicados(apps, schema_editor):
+    """Deja un solo trabajo activo por clave (el más reciente); los demás pasan a error."""
+    TrabajoGeneracion = apps.get_model('oferta', 'TrabajoGeneracion')
+    vistas = set()
+    activos = TrabajoGeneracion.objects.filter(estado__in=['pendiente', 'en_proceso', 'completado'])
+    for trabajo in activos.order_by('-creado_en'):
+        if trabajo.clave in vistas:
+            trabajo.estado = 'error'
+            trabajo.error = 'Trabajo duplicado'
+            trabajo.save(update_fields=['estado', 'error'])
+        vistas.add(trabajo.clave)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('oferta', '0005_versionoferta'),
+    ]
+
+    operations = [
+        migrations.RunPython(retirar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='trabajogeneracion',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['pendiente', 'en_proceso', 'completado'])), fields=('clave',), name='trabajo_activo_unico_por_clave'),
+        ),
+    ]
@@ -1,4 +1,8 @@
+import uuid
+
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 
@@ -57,3 +61,78 @@ class HorarioGuardado(models.Model):
 
     def __str__(self):
         return f"'{self.nombre}' de {self.usuario.username}"
+
+
+# --- VERSIÓN DE LA OFERTA CARGADA POR SEDE ---
+class VersionOferta(models.Model):
+    # Se incrementa al recargar la oferta de la sede o editar una sección (invalida cachés)
+    sede = models.CharField(max_length=100, unique=True)
+    version = models.PositiveIntegerField(default=0)
+    actualizada_en = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def actual(cls, sede):
+        return cls.objects.filter(sede=sede).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def incrementar(cls, sede):
+        cls.objects.get_or_create(sede=sede)
+        cls.objects.filter(sede=sede).update(version=F("version") + 1, actualizada_en=timezone.now())
+
+    def __str__(self):
+        return f"{self.sede} v{self.version}"
+
+
+# --- COLA DE TRABAJOS DEL GENERADOR DE HORARIOS ---
+class TrabajoGeneracion(models.Model):
+    PENDIENTE = "pendiente"
+    EN_PROCESO = "en_proceso"
+    COMPLETADO = "completado"
+    ERROR = "error"
+    ESTADOS = [
+        (PENDIENTE, "Pendiente"),
+        (EN_PROCESO, "En proceso"),
+        (COMPLETADO, "Completado"),
+        (ERROR, "Error"),
+    ]
+    # Estados en que un trabajo se reutiliza para solicitudes idénticas
+    ACTIVOS = [PENDIENTE, EN_PROCESO, COMPLETADO]
+
+    # Identificador público (no adivinable) para consultar el estado
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # Hash de la solicitud normalizada, para deduplicar solicitudes idénticas
+    clave = models.CharField(max_length=64, db_index=True)
+
+    # Cuerpo de la solicitud (sede, jornada, siglas, preferencias)
+    parametros = models.JSONField()
+
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE, db_index=True)
+
+    # Horarios serializados o mensaje de error, según el estado final
+    resultado = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True, default="")
+
+    # Proceso que tomó el trabajo (para diagnóstico)
+    tomado_por = models.CharField(max_length=100, blank=True, default="")
+
+    creado_en = models.DateTimeField(auto_now_add=True)
+    iniciado_en = models.DateTimeField(blank=True, null=True)
+    terminado_en = models.DateTimeField(blank=True, null=True)
+
+    # Después de esta fecha el resultado ya no se reutiliza y se elimina
+    expira_en = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    class Meta:
+        ordering = ["creado_en"]
+        constraints = [
+            # A lo más un trabajo reutilizable por solicitud, aunque dos procesos encolen a la vez
+            models.UniqueConstraint(
+                fields=["clave"],
+                condition=models.Q(estado__in=["pendiente", "en_proceso", "completado"]),
+                name="trabajo_activo_unico_por_clave",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Trabajo {self.id} ({self.estado})"
@@ -0,0 +1,66 @@
+# oferta/signals.py
+"""
+Versión de la oferta ante ediciones individuales
+------------------------------------------------
+Las cachés del generador (resultados, conjuntos factibles y snapshots) se
+indexan por `VersionOferta`. Además de la carga masiva (`cargar_excel`), toda
+edición o eliminación de una `Asignatura` o un `Horario` (desde el admin, por
+ejemplo) incrementa la versión de su sede y, tras el commit, publica el
+snapshot de esa versión, así que la próxima solicitud ya no ve datos viejos.
+
+La carga masiva incrementa la versión una sola vez y suspende los incrementos
+por registro con `carga_masiva`.
+"""
+
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import Asignatura, Horario, VersionOferta
+
+_estado = threading.local()
+
+
+@contextmanager
+def carga_masiva():
+    """No incrementa la versión por cada registro dentro del bloque."""
+    anterior = getattr(_estado, 'suspendido', False)
+    _estado.suspendido = True
+    try:
+        yield
+    finally:
+        _estado.suspendido = anterior
+
+
+def oferta_modificada(sede):
+    if not sede or getattr(_estado, 'suspendido', False):
+        return
+    from .views.generador_snapshot import publicar_si_falta
+
+    VersionOferta.incrementar(sede)
+    transaction.on_commit(partial(publicar_si_falta, sede), robust=True)
+
+
+def asignatura_modificada(sender, instance, raw=False, **kwargs):
+    if not raw:
+        oferta_modificada(instance.sede)
+
+
+def horario_modificado(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        sede = instance.asignatura.sede
+    except Asignatura.DoesNotExist:
+        # Se eliminó junto con su asignatura, que ya incrementa la versión
+        return
+    oferta_modificada(sede)
+
+
+def conectar():
+    for receptor, modelo in ((asignatura_modificada, Asignatura), (horario_modificado, Horario)):
+        post_save.connect(receptor, sender=modelo, dispatch_uid=f'version_oferta_{modelo.__name__}_save')
+        post_delete.connect(receptor, sender=modelo, dispatch_uid=f'version_oferta_{modelo.__name__}_delete')
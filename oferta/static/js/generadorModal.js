@@ -16,6 +16,9 @@ let asignaturasDisponibles = [];
 let asignaturasSeleccionadas = new Map();
 let horariosGenerados = [];
 let horarioActualVista = 0;
+let progresoGeneracion = null; // { exploradas, tiempo } mientras la búsqueda sigue
+let temporizadorConteo = null;
+let consultaConteo = 0; // solo se muestra la respuesta de la última consulta
 
 // ══════════════════════════════════════════════════════════
 //              FUNCIONES DE CONTROL DEL MODAL
@@ -229,6 +232,8 @@ function actualizarResumenSeleccion() {
     const container = document.getElementById('gen-resumen-seleccion');
     if (!container) return;
 
+    actualizarConteoCombinaciones();
+
     if (asignaturasSeleccionadas.size === 0) {
         container.innerHTML = '<p class="text-gray-400 text-sm italic">Ninguna asignatura seleccionada</p>';
         return;
@@ -247,12 +252,63 @@ function actualizarResumenSeleccion() {
     `).join('');
 }
 
+// ══════════════════════════════════════════════════════════
+//          CONTEO DE HORARIOS POSIBLES
+// ══════════════════════════════════════════════════════════
+
+/**
+ * Muestra cuántos horarios sin choques admite la selección, sin generarlos.
+ * Espera a que el usuario deje de cambiar la selección antes de consultar.
+ */
+function actualizarConteoCombinaciones() {
+    const container = document.getElementById('gen-conteo-combinaciones');
+    if (!container) return;
+
+    clearTimeout(temporizadorConteo);
+    const consulta = ++consultaConteo;
+    if (asignaturasSeleccionadas.size === 0) {
+        container.textContent = '';
+        return;
+    }
+
+    temporizadorConteo = setTimeout(async () => {
+        try {
+            const response = await fetch('/api/generador/contar/', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': getCsrfToken()
+                },
+                body: JSON.stringify({
+                    sede: new URLSearchParams(window.location.search).get('sede'),
+                    jornada: document.getElementById('gen-filter-jornada')?.value,
+                    siglas: Array.from(asignaturasSeleccionadas.keys())
+                })
+            });
+            const data = await response.json();
+            if (consulta !== consultaConteo) return;
+
+            if (!response.ok) {
+                container.textContent = '';
+            } else if (data.combinaciones === null) {
+                container.textContent = 'Demasiadas combinaciones para contarlas';
+            } else if (data.combinaciones === 0) {
+                container.textContent = 'Ningún horario posible sin choques';
+            } else {
+                const cantidad = data.combinaciones.toLocaleString('es-CL');
+                container.textContent = `${cantidad} horario${data.combinaciones === 1 ? '' : 's'} posible${data.combinaciones === 1 ? '' : 's'}`;
+            }
+        } catch (error) {
+            if (consulta === consultaConteo) container.textContent = '';
+        }
+    }, 250);
+}
+
 // ══════════════════════════════════════════════════════════
 //                  GENERAR HORARIOS
 // ══════════════════════════════════════════════════════════
 
 async function generarHorarios() {
-    // (Esta función no necesita cambios)
     if (asignaturasSeleccionadas.size === 0) {
         mostrarNotificacion('Debes seleccionar al menos una asignatura', 'error');
         return;
@@ -275,7 +331,7 @@ async function generarHorarios() {
     try {
         const sede = new URLSearchParams(window.location.search).get('sede');
         
-        const response = await fetch('/api/generador/generar/', {
+        const response = await fetch('/api/generador/generar/stream/', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -285,37 +341,73 @@ async function generarHorarios() {
                 sede: sede,
                 jornada: jornada,
                 siglas: Array.from(asignaturasSeleccionadas.keys()),
-                preferencias: preferencias
+                preferencias: preferencias,
+                alternativas: true
             })
         });
 
-        const data = await response.json();
+        if (!response.ok) {
+            const data = await response.json();
+            mostrarNotificacion(data.error || 'Error al generar horarios', 'error');
+            return;
+        }
 
-        if (response.ok) {
-            horariosGenerados = data.horarios;
-            horarioActualVista = 0;
-            
-            if (horariosGenerados.length > 0) {
-                mostrarResultados();
-                const mensaje = horariosGenerados.length === 10 
-                    ? `✓ Se generaron ${horariosGenerados.length} horarios óptimos`
-                    : `✓ Se generaron ${horariosGenerados.length} horario(s)`;
-                mostrarNotificacion(mensaje, 'success');
-            } else {
-                 mostrarNotificacion('No se encontraron combinaciones válidas', 'error');
+        horarioActualVista = 0;
+        let final = null;
+        await leerLineasNdjson(response, (mensaje) => {
+            if (mensaje.tipo === 'error') {
+                final = mensaje;
+                return;
             }
+            horariosGenerados = mensaje.horarios;
+            horarioActualVista = Math.min(horarioActualVista, Math.max(horariosGenerados.length - 1, 0));
+            progresoGeneracion = mensaje.tipo === 'avance' ? mensaje.progreso : null;
+            if (mensaje.tipo === 'final') final = mensaje;
+            if (horariosGenerados.length > 0) mostrarResultados();
+        });
 
+        if (final?.tipo === 'final' && horariosGenerados.length > 0) {
+            const mensaje = horariosGenerados.length === 10 
+                ? `✓ Se generaron ${horariosGenerados.length} horarios óptimos`
+                : `✓ Se generaron ${horariosGenerados.length} horario(s)`;
+            mostrarNotificacion(mensaje, 'success');
         } else {
-            mostrarNotificacion(data.error || 'Error al generar horarios', 'error');
+            mostrarNotificacion(final?.error || 'No se encontraron combinaciones válidas', 'error');
         }
     } catch (error) {
         mostrarNotificacion('Error de conexión', 'error');
     } finally {
+        if (progresoGeneracion) {
+            progresoGeneracion = null;
+            if (horariosGenerados.length > 0) mostrarResultados();
+        }
         if (btnGenerar) btnGenerar.disabled = false;
         if (spinner) spinner.classList.add('hidden');
     }
 }
 
+/**
+ * Lee una respuesta NDJSON a medida que llega y llama a `alRecibir`
+ * con cada objeto JSON completo (uno por línea).
+ */
+async function leerLineasNdjson(response, alRecibir) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let pendiente = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        pendiente += decoder.decode(value ?? new Uint8Array(), { stream: !done });
+        const lineas = pendiente.split('\n');
+        pendiente = lineas.pop();
+        for (const linea of lineas) {
+            if (linea.trim()) alRecibir(JSON.parse(linea));
+        }
+        if (done) break;
+    }
+    if (pendiente.trim()) alRecibir(JSON.parse(pendiente));
+}
+
 // ══════════════════════════════════════════════════════════
 //                  MOSTRAR RESULTADOS
 // ══════════════════════════════════════════════════════════
@@ -351,6 +443,14 @@ function mostrarResultados() {
     // --- MODIFICADO ---
     // Se eliminó el div de "Botones de Acción" del final del HTML
     pasoResultados.innerHTML = `
+        ${progresoGeneracion ? `
+            <div class="mb-3 text-xs text-gray-400 animate-pulse">
+                Buscando mejores opciones… ${progresoGeneracion.exploradas.toLocaleString()} combinaciones revisadas · ${progresoGeneracion.tiempo.toFixed(1)} s
+            </div>` : ''}
+        ${horario.heuristico ? `
+            <div class="mb-3 text-xs text-yellow-400">
+                Hay demasiadas combinaciones para revisarlas todas: estas son buenas opciones, pero podría existir alguna mejor.
+            </div>` : ''}
         <div class="flex flex-col sm:flex-row items-center justify-between mb-4 pb-4 border-b border-gray-700 gap-3">
             <div>
                 <h4 class="text-lg font-semibold text-white">
@@ -403,6 +503,9 @@ function mostrarResultados() {
                             <span class="font-medium text-white text-sm">${a.sigla}</span>
                             <span class="text-gray-300 text-sm"> - ${a.nombre}</span>
                             <div class="text-gray-400 text-xs mt-1">(Sec. ${a.seccion})</div>
+                            ${a.alternativas && a.alternativas.length ? `
+                                <div class="text-gray-500 text-xs mt-1">Mismo horario: ${a.alternativas.map(o => `Sec. ${o.seccion}`).join(', ')}</div>
+                            ` : ''}
                         </div>
                         ${a.virtual ? 
                             '<span class="flex-shrink-0 text-green-400 text-xs bg-green-900/50 border border-green-700 px-2 py-0.5 rounded-full">🌐 Virtual</span>' : 
@@ -534,6 +637,7 @@ export function initGeneradorModal() {
             element.addEventListener('change', cargarAsignaturasDisponibles);
         }
     });
+    document.getElementById('gen-filter-jornada')?.addEventListener('change', actualizarConteoCombinaciones);
 
     // Cerrar al hacer clic fuera (en el fondo oscuro)
     if (modal) {
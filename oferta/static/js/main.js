@@ -4,7 +4,7 @@
 // ============================================================
 
 import { diasLargos, iconoPlus, iconoTicket } from './constants.js';
-import { haySolapamiento } from './schedule.js';
+import { buscarAlternativas, haySolapamiento } from './schedule.js';
 import {
     addSeleccionada,
     removeSeleccionada,
@@ -126,6 +126,51 @@ function seleccionarAsignatura(btn) {
     );
 }
 
+async function cambiarSeccion(sigla) {
+    const sede = new URLSearchParams(window.location.search).get('sede');
+    const actual = getAsignaturaSeleccionada(sigla);
+    if (!sede || !actual) return;
+
+    let alternativas;
+    try {
+        alternativas = await buscarAlternativas(sigla, sede, getCsrfToken());
+    } catch (e) {
+        mostrarModal('Error', e.message);
+        return;
+    }
+
+    // La mejor sección distinta de la actual (vienen de mejor a peor)
+    const mejor = alternativas.find(alternativa => String(alternativa.id) !== String(actual.id));
+    if (!mejor) {
+        mostrarModal(
+            'Sin alternativas',
+            `No hay otra sección de ${actual.nombre} que quepa en tu horario.`
+        );
+        return;
+    }
+
+    const actualEsMejor = String(alternativas[0].id) === String(actual.id);
+    setConfirmCallback(() => {
+        addSeleccionada(sigla, {
+            ...actual,
+            id: mejor.id,
+            seccion: mejor.seccion,
+            docente: mejor.docente,
+            virtual: mejor.virtual,
+            horarios: mejor.horarios
+        });
+        actualizarHorario();
+        actualizarBotones(sigla, mejor.seccion);
+        mostrarNotificacion(`${actual.nombre} (Sec. ${mejor.seccion}) agregada`, 'success');
+    });
+    mostrarModalConfirmacion(
+        'Cambiar Sección',
+        actualEsMejor
+            ? `La sección ${actual.seccion} ya es la mejor para tu horario. La siguiente que cabe es la ${mejor.seccion}. ¿Deseas cambiarla?`
+            : `La sección ${mejor.seccion} de ${actual.nombre} cabe en tu horario y lo mejora. ¿Deseas reemplazar la sección ${actual.seccion}?`
+    );
+}
+
 function actualizarBotones(sigla, seccionSeleccionada) {
     document.querySelectorAll(`.seleccionar-btn[data-sigla="${sigla}"]`).forEach(b => {
         b.disabled = b.dataset.seccion === seccionSeleccionada;
@@ -195,6 +240,13 @@ function inicializarListeners() {
                 return;
             }
 
+            // Buscar otra sección que quepa en el horario
+            const botonAlternativas = e.target.closest('button[data-accion="alternativas-asignatura"]');
+            if (botonAlternativas) {
+                cambiarSeccion(botonAlternativas.dataset.sigla);
+                return;
+            }
+
             // Ver/Ocultar detalles de horarios
             const botonDetalles = e.target.closest('button[data-accion="ver-detalles-asignatura"]');
             if (botonDetalles) {
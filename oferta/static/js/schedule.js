@@ -10,7 +10,7 @@ import {
     getSeleccionadas
 } from './state.js';
 
-import { colores } from './constants.js';
+import { colores, diasLargos } from './constants.js';
 
 
 // ==================================================
@@ -103,3 +103,41 @@ export function haySolapamiento(nuevosHorarios, siglaDelNuevo) {
 
     return null; // No hay conflictos
 }
+
+
+// ==================================================
+//      FUNCIÓN: Buscar secciones alternativas
+// ==================================================
+/**
+ * Pide al servidor las secciones de una asignatura que caben en el horario
+ * actual (las demás seleccionadas quedan fijas), de mejor a peor puntuación
+ * del horario resultante. Devuelve las alternativas con los días en formato
+ * largo; si el servidor responde con error, lanza un Error con su mensaje.
+ */
+export async function buscarAlternativas(sigla, sede, csrfToken, preferencias = {}) {
+    const secciones = Object.values(getSeleccionadas())
+        .map(({ id }) => Number(id))
+        .filter(Number.isInteger);
+
+    const response = await fetch('/api/generador/intercambiar/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': csrfToken
+        },
+        body: JSON.stringify({ sede, sigla, secciones, preferencias })
+    });
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || 'No se pudieron buscar secciones alternativas');
+    }
+
+    return data.alternativas.map(alternativa => ({
+        ...alternativa,
+        horarios: alternativa.horarios.map(h => ({
+            dia: diasLargos[h.dia] || h.dia,
+            inicio: h.inicio,
+            fin: h.fin
+        }))
+    }));
+}
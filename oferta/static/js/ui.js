@@ -148,6 +148,16 @@ function generarHTMLSeleccionadas() {
                         </svg>
                     </button>
 
+                    <button 
+                        data-accion="alternativas-asignatura" 
+                        data-sigla="${sigla}"
+                        class="p-1.5 bg-gray-700/50 hover:bg-purple-600 text-gray-400 hover:text-white rounded-lg transition-all duration-200"
+                        title="Buscar otra sección de ${datos.nombre}">
+                        <svg xmlns="http://www.w3.org/2000/svg" class="w-4 h-4" fill="none" viewBox="0 0 24 24" stroke="currentColor">
+                            <path stroke-linecap="round" stroke-linejoin="round" stroke-width="2" d="M7.5 21 3 16.5m0 0L7.5 12M3 16.5h13.5m0-13.5L21 7.5m0 0L16.5 12M21 7.5H7.5" />
+                        </svg>
+                    </button>
+
                     <button 
                         data-accion="quitar-asignatura" 
                         data-sigla="${sigla}" 
@@ -1,3 +1,1587 @@
-from django.test import TestCase
+import io
+import json
+import random
+import tempfile
+from contextlib import redirect_stdout
+from datetime import time
+from itertools import product
+from pathlib import Path
+from unittest.mock import patch
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Asignatura, Horario, HorarioGuardado, TrabajoGeneracion, VersionOferta
+from .signals import carga_masiva
+from .views.generador import generar_horarios_serializados
+from .views.generador_conflictos import MatrizConflictos, dominio_de, propagar
+from .views.generador_cache import estadisticas_cache, reiniciar_estadisticas_cache
+from .views.generador_componentes import BusquedaPorComponentes, componentes_siglas
+from .views.generador_conteo import contar_combinaciones, contar_por_sigla
+from .views.generador_diagnostico import diagnosticar_conflicto
+from .views.generador_factibles import (
+    CacheFactibles, bytes_por_combinacion, cache_factibles, conjunto_factible_acotado, construir_conjunto_factible
+)
+from .views.generador_heuristico import BusquedaHeuristica
+from .views.generador_intercambio import alternativas_para_sigla
+from .views.generador_mitades import (
+    MOTOR_CON_RESPALDO, BusquedaPorMitades, contar_pares, dividir_siglas, elegir_motor, preparar_mitades,
+)
+from .views.generador_multiperfil import generar_combinaciones_multiperfil
+from .views.generador_snapshot import (
+    abrir_snapshot,
+    cargar_snapshot,
+    con_modelos,
+    limpiar_snapshots,
+    nombre_base,
+    obtener_snapshot,
+    publicar_snapshot,
+)
+from .views.lotes import ConflictosCompartidos, generar_lote
+from .views.trabajos import ejecutar_trabajo, purgar_trabajos_vencidos, tomar_siguiente_trabajo
+from .views.generador_restricciones import cumple_restricciones, filtrar_secciones, normalizar_restricciones
+from .views.generador_paralelo import dividir_en_prefijos, paralelo_disponible
+from .views.generador_utils import (
+    calcular_metricas_horario,
+    calcular_puntuacion_normalizada,
+    EstadoMetricas,
+    calcular_puntuaciones_lote,
+    BusquedaHorarios,
+    SolicitudCompilada,
+    compilar_secciones,
+    detectar_rango_global,
+    generar_combinaciones_optimizado,
+    iterar_combinaciones,
+    metricas_a_arrays,
+)
+
+DIAS = ['Lu', 'Ma', 'Mi', 'Ju', 'Vi', 'Sa']
+
+
+def crear_oferta(semilla, num_siglas=4, max_secciones=4, sede='Sede Test'):
+    """
+    Crea una oferta pseudoaleatoria con módulos tipo Duoc (bloques de 40 minutos
+    que empiezan en :01 o :31, a veces contiguos y a veces solapados).
+    """
+    rng = random.Random(semilla)
+    for n in range(num_siglas):
+        sigla = f'TST{n:03d}'
+        for s in range(rng.randint(1, max_secciones)):
+            asig = Asignatura.objects.create(
+                sede=sede, carrera='Carrera', plan='1',
+                jornada=rng.choice(['Diurna', 'Diurna', 'Vespertina']),
+                nivel='1', sigla=sigla, nombre=f'Asignatura {n}',
+                seccion=f'{sigla}-{s:03d}', docente='Docente',
+                virtual_sincronica=rng.choice(['True', 'False']),
+            )
+            for _ in range(rng.randint(1, 3)):
+                inicio = rng.choice(range(8 * 60 + 1, 20 * 60, 30))
+                duracion = rng.choice([40, 80, 120])
+                Horario.objects.create(
+                    asignatura=asig, dia=rng.choice(DIAS[:5]),
+                    hora_inicio=time(inicio // 60, inicio % 60),
+                    hora_fin=time((inicio + duracion) // 60, (inicio + duracion) % 60),
+                )
+
+
+def crear_oferta_modular(semilla, num_siglas=6, max_secciones=8, sede='Sede Test'):
+    """
+    Oferta más cercana a la real: una jornada, secciones con dos bloques de 80
+    minutos en días distintos, siempre alineados a los módulos de la sede.
+    """
+    rng = random.Random(semilla)
+    inicios = [8 * 60 + 31, 10 * 60 + 1, 11 * 60 + 31, 13 * 60 + 1, 14 * 60 + 31, 16 * 60 + 1]
+    for n in range(num_siglas):
+        sigla = f'MOD{n:03d}'
+        for s in range(rng.randint(2, max_secciones)):
+            asig = Asignatura.objects.create(
+                sede=sede, carrera='Carrera', plan='1', jornada='Diurna', nivel='1',
+                sigla=sigla, nombre=f'Asignatura {n}', seccion=f'{sigla}-{s:03d}',
+                docente='Docente', virtual_sincronica=rng.choice(['True', 'False', 'False']),
+            )
+            for dia in rng.sample(DIAS[:5], 2):
+                inicio = rng.choice(inicios)
+                Horario.objects.create(
+                    asignatura=asig, dia=dia,
+                    hora_inicio=time(inicio // 60, inicio % 60),
+                    hora_fin=time((inicio + 80) // 60, (inicio + 80) % 60),
+                )
+
+
+def crear_oferta_por_grupos(semilla, grupos=2, por_grupo=3, max_secciones=6, sede='Sede Test'):
+    """
+    Oferta de siglas en grupos que nunca chocan entre sí: cada grupo usa su
+    propio par de días (Lu-Mi, Ma-Ju, Vi-Sa).
+    """
+    rng = random.Random(semilla)
+    inicios = [8 * 60 + 31, 10 * 60 + 1, 11 * 60 + 31, 13 * 60 + 1, 14 * 60 + 31, 16 * 60 + 1]
+    for g in range(grupos):
+        for n in range(por_grupo):
+            sigla = f'G{g}S{n}'
+            for s in range(rng.randint(2, max_secciones)):
+                asig = Asignatura.objects.create(
+                    sede=sede, carrera='Carrera', plan='1', jornada='Diurna', nivel='1',
+                    sigla=sigla, nombre=f'Asignatura {sigla}', seccion=f'{sigla}-{s:03d}',
+                    docente='Docente', virtual_sincronica=rng.choice(['True', 'False', 'False']),
+                )
+                for dia in (('Lu', 'Mi'), ('Ma', 'Ju'), ('Vi', 'Sa'))[g]:
+                    inicio = rng.choice(inicios)
+                    Horario.objects.create(
+                        asignatura=asig, dia=dia,
+                        hora_inicio=time(inicio // 60, inicio % 60),
+                        hora_fin=time((inicio + 80) // 60, (inicio + 80) % 60),
+                    )
+
+
+def duplicar_secciones(semilla, sede='Sede Test', max_copias=3):
+    """Agrega copias de secciones existentes: mismo horario, otra sección y docente."""
+    rng = random.Random(semilla)
+    for asig in list(Asignatura.objects.filter(sede=sede).order_by('id').prefetch_related('horarios')):
+        horarios = list(asig.horarios.all())
+        for copia in range(rng.randint(0, max_copias)):
+            otra = Asignatura.objects.create(
+                sede=sede, carrera=asig.carrera, plan=asig.plan, jornada=asig.jornada, nivel=asig.nivel,
+                sigla=asig.sigla, nombre=asig.nombre, seccion=f'{asig.seccion}-{copia}',
+                docente=f'Docente {copia}', virtual_sincronica=asig.virtual_sincronica,
+            )
+            for h in horarios:
+                Horario.objects.create(asignatura=otra, dia=h.dia, hora_inicio=h.hora_inicio, hora_fin=h.hora_fin)
+
+
+def cargar_por_sigla(sede='Sede Test'):
+    por_sigla = {}
+    for asig in Asignatura.objects.filter(sede=sede).order_by('id').prefetch_related('horarios'):
+        por_sigla.setdefault(asig.sigla, []).append(asig)
+    return por_sigla
+
+
+def combinaciones_referencia(por_sigla, preferencias):
+    """Enumeración por fuerza bruta con el chequeo de solapamiento original."""
+    validas = {}
+    preferencias['rango_inicio_min'], preferencias['rango_fin_max'] = detectar_rango_global(por_sigla)
+    siglas = sorted(por_sigla)
+    for combinacion in product(*(por_sigla[s] for s in siglas)):
+        if len({a.jornada for a in combinacion}) > 1:
+            continue
+        solapa = any(
+            h1.dia == h2.dia and h1.hora_inicio < h2.hora_fin and h1.hora_fin > h2.hora_inicio
+            for x, a in enumerate(combinacion) for b in combinacion[x + 1:]
+            for h1 in a.horarios.all() for h2 in b.horarios.all()
+        )
+        if not solapa:
+            metricas = calcular_metricas_horario(list(combinacion))
+            validas[tuple(a.id for a in combinacion)] = calcular_puntuacion_normalizada(metricas, preferencias)
+    return validas
+
+
+def aislar_snapshots(test):
+    """Snapshots en memoria vacíos y archivos en un directorio temporal propio del test."""
+    limpiar_snapshots()
+    directorio = tempfile.TemporaryDirectory()
+    test.addCleanup(directorio.cleanup)
+    ajuste = override_settings(GENERADOR_SNAPSHOTS_DIR=Path(directorio.name))
+    ajuste.enable()
+    test.addCleanup(ajuste.disable)
+    return Path(directorio.name)
+
+
+def generar(por_sigla, preferencias, max_resultados=100000, **kwargs):
+    with redirect_stdout(io.StringIO()):
+        return generar_combinaciones_optimizado(por_sigla, preferencias, max_resultados=max_resultados, **kwargs)
+
+
+class CompilacionSeccionesTests(TestCase):
+    def test_bloques_contiguos_no_se_solapan(self):
+        asig_a = Asignatura.objects.create(sede='S', carrera='C', plan='1', jornada='D', nivel='1',
+                                           sigla='A', nombre='A', seccion='A-1')
+        asig_b = Asignatura.objects.create(sede='S', carrera='C', plan='1', jornada='D', nivel='1',
+                                           sigla='B', nombre='B', seccion='B-1')
+        asig_c = Asignatura.objects.create(sede='S', carrera='C', plan='1', jornada='D', nivel='1',
+                                           sigla='C', nombre='C', seccion='C-1')
+        Horario.objects.create(asignatura=asig_a, dia='Lu', hora_inicio=time(8, 31), hora_fin=time(9, 10))
+        Horario.objects.create(asignatura=asig_b, dia='Lu', hora_inicio=time(9, 10), hora_fin=time(9, 50))
+        Horario.objects.create(asignatura=asig_c, dia='Lu', hora_inicio=time(9, 9), hora_fin=time(9, 11))
+
+        compiladas = compilar_secciones(cargar_por_sigla('S'))
+        a, b, c = compiladas['A'][0], compiladas['B'][0], compiladas['C'][0]
+        self.assertFalse(a.mascara & b.mascara)
+        self.assertTrue(a.mascara & c.mascara)
+        self.assertTrue(b.mascara & c.mascara)
+
+    def test_mismas_combinaciones_que_chequeo_original(self):
+        preferencias = {'preferencia_horario': 'entrar_temprano'}
+        for semilla in range(6):
+            sede = f'Sede {semilla}'
+            crear_oferta(semilla, sede=sede)
+            por_sigla = cargar_por_sigla(sede)
+            referencia = combinaciones_referencia(por_sigla, dict(preferencias))
+            resultado = generar(por_sigla, dict(preferencias))
+            obtenidas = {tuple(a.id for a in r['asignaturas']): r['puntuacion'] for r in resultado}
+            self.assertEqual(obtenidas, referencia)
+
+
+class MejoresKTests(TestCase):
+    def test_top_k_igual_a_ordenamiento_completo(self):
+        preferencias = {'preferencia_horario': 'salir_temprano', 'preferir_virtuales': 'si'}
+        for semilla in range(6):
+            sede = f'Sede {semilla}'
+            crear_oferta(semilla, num_siglas=5, sede=sede)
+            por_sigla = cargar_por_sigla(sede)
+            referencia = combinaciones_referencia(por_sigla, dict(preferencias))
+            # sort estable: a igual puntuación se mantiene el orden de enumeración
+            esperadas = sorted(referencia.items(), key=lambda item: item[1], reverse=True)[:3]
+
+            estadisticas = {}
+            resultado = generar(por_sigla, dict(preferencias), max_resultados=3, estadisticas=estadisticas)
+            obtenidas = [(tuple(a.id for a in r['asignaturas']), r['puntuacion']) for r in resultado]
+            self.assertEqual(obtenidas, esperadas)
+            self.assertEqual(estadisticas['validas'], len(referencia))
+
+
+PERFILES = [
+    {},
+    {'preferencia_horario': 'entrar_temprano', 'preferir_virtuales': 'si'},
+    {'preferencia_horario': 'entrar_tarde', 'preferir_virtuales': 'no'},
+    {'preferencia_horario': 'salir_temprano', 'minimizar_huecos': False},
+    {'preferencia_horario': 'salir_tarde', 'preferir_virtuales': 'si'},
+]
+
+
+class PodaPorCotaTests(TestCase):
+    def test_mismo_top_k_con_y_sin_cota(self):
+        for semilla in range(4):
+            sede = f'Sede {semilla}'
+            crear_oferta(semilla, num_siglas=5, max_secciones=5, sede=sede)
+            crear_oferta_modular(semilla, num_siglas=4, max_secciones=5, sede=f'Modular {semilla}')
+        for sede in [f'{prefijo} {semilla}' for prefijo in ('Sede', 'Modular') for semilla in range(4)]:
+            por_sigla = cargar_por_sigla(sede)
+            for preferencias in PERFILES:
+                referencia = combinaciones_referencia(por_sigla, dict(preferencias))
+                esperadas = sorted(referencia.items(), key=lambda item: item[1], reverse=True)[:4]
+                resultado = generar(por_sigla, dict(preferencias), max_resultados=4, poda_cota=True)
+                obtenidas = [(tuple(a.id for a in r['asignaturas']), r['puntuacion']) for r in resultado]
+                self.assertEqual(obtenidas, esperadas, (sede, preferencias))
+
+    def test_cota_poda_nodos(self):
+        crear_oferta_modular(1, num_siglas=5)
+        por_sigla = cargar_por_sigla()
+        preferencias = {'preferencia_horario': 'entrar_temprano'}
+        con_cota, sin_cota = {}, {}
+        generar(por_sigla, dict(preferencias), max_resultados=3, estadisticas=con_cota)
+        generar(por_sigla, dict(preferencias), max_resultados=3, estadisticas=sin_cota, poda_cota=False)
+        self.assertGreater(con_cota['podadas_cota'], 0)
+        self.assertLess(con_cota['exploradas'], sin_cota['exploradas'])
+
+
+class MatrizConflictosTests(TestCase):
+    def test_matriz_coincide_con_mascaras_y_jornada(self):
+        crear_oferta(3, num_siglas=6, max_secciones=5)
+        compiladas = compilar_secciones(cargar_por_sigla())
+        secciones = [s for sigla in sorted(compiladas) for s in compiladas[sigla]]
+        matriz = MatrizConflictos(secciones)
+        for a in secciones:
+            for b in secciones:
+                esperado = a is not b and (a.jornada != b.jornada or bool(a.mascara & b.mascara))
+                self.assertEqual(matriz.conflicto(a.indice, b.indice), esperado)
+                self.assertEqual(bool(matriz.compatibles[a.indice] >> b.indice & 1), not esperado)
+
+    def test_propagar_detecta_dominio_vacio(self):
+        crear_oferta_modular(2, num_siglas=3)
+        compiladas = compilar_secciones(cargar_por_sigla())
+        secciones = [s for sigla in sorted(compiladas) for s in compiladas[sigla]]
+        matriz = MatrizConflictos(secciones)
+        dominios = [dominio_de(compiladas[sigla]) for sigla in sorted(compiladas)]
+        for seccion in compiladas[sorted(compiladas)[0]]:
+            nuevos = propagar(dominios, [1, 2], matriz.compatibles[seccion.indice])
+            vacio = any(
+                all(matriz.conflicto(seccion.indice, otra.indice) for otra in compiladas[sigla])
+                for sigla in sorted(compiladas)[1:]
+            )
+            self.assertEqual(nuevos is None, vacio)
+
+
+class OrdenSiglasTests(TestCase):
+    def test_estrategias_dan_el_mismo_top_k(self):
+        crear_oferta_modular(4, num_siglas=5)
+        por_sigla = cargar_por_sigla()
+        preferencias = {'preferencia_horario': 'salir_temprano'}
+        resultados = {}
+        for estrategia in ('alfabetico', 'menos_secciones', 'mas_restringida'):
+            resultado = generar(por_sigla, dict(preferencias), max_resultados=5, orden_siglas=estrategia)
+            resultados[estrategia] = [
+                ([a.id for a in r['asignaturas']], r['puntuacion'], r['metricas']) for r in resultado
+            ]
+        self.assertEqual(resultados['alfabetico'], resultados['menos_secciones'])
+        self.assertEqual(resultados['alfabetico'], resultados['mas_restringida'])
+
+    def test_estrategia_desconocida(self):
+        with self.assertRaises(ValueError):
+            generar({}, {}, orden_siglas='al_azar')
+
+
+class EstadoMetricasTests(TestCase):
+    def test_metricas_identicas_byte_a_byte(self):
+        crear_oferta(5, num_siglas=5, max_secciones=4)
+        compiladas = compilar_secciones(cargar_por_sigla())
+        siglas = sorted(compiladas)
+        rng = random.Random(0)
+        estado = EstadoMetricas()
+        for _ in range(40):
+            # Orden de inserción arbitrario; las métricas siguen el orden alfabético
+            orden = rng.sample(range(len(siglas)), rng.randint(1, len(siglas)))
+            elegidas = {j: rng.choice(compiladas[siglas[j]]) for j in orden}
+            for j in orden:
+                estado.agregar(elegidas[j], j)
+            esperado = calcular_metricas_horario([elegidas[j].asignatura for j in sorted(elegidas)])
+            self.assertEqual(json.dumps(estado.metricas()), json.dumps(esperado))
+            for _ in orden:
+                estado.quitar()
+            self.assertEqual(estado.dias, {})
+            self.assertEqual(estado.total, 0)
+
+
+class PuntuacionLoteTests(TestCase):
+    def metricas_aleatorias(self, rng):
+        total = rng.randint(1, 8)
+        inicio = rng.choice([0, rng.uniform(8, 20), 8.5, 19 + rng.randint(0, 59) / 60])
+        return {
+            'total_huecos_minutos': rng.choice([0, float(rng.randint(1, 400)), 180.0]),
+            'max_hueco_dia': rng.choice([0, float(rng.randint(1, 200)), 120.0]),
+            'clases_virtuales': rng.randint(0, total),
+            'total_clases': total,
+            'hora_inicio_promedio': inicio,
+            'hora_fin_promedio': rng.choice([0, inicio + rng.uniform(0, 6), inicio + rng.randint(1, 9) / 3]),
+            'balance_carga': rng.choice([1.0, 0, rng.random()]),
+            'dias_usados': rng.randint(0, 6),
+        }
+
+    def test_lote_igual_a_escalar(self):
+        rng = random.Random(42)
+        for _ in range(300):
+            preferencias = {
+                'preferencia_horario': rng.choice(
+                    ['entrar_temprano', 'salir_temprano', 'entrar_tarde', 'salir_tarde', 'neutro']),
+                'preferir_virtuales': rng.choice(['si', 'no', 'neutro']),
+                'minimizar_huecos': rng.random() < 0.7,
+                'rango_inicio_min': rng.choice([8.0, 8.516666666666667, 10.0]),
+                'rango_fin_max': rng.choice([23.0, 22.5, 18.0]),
+            }
+            lista = [self.metricas_aleatorias(rng) for _ in range(50)]
+            esperadas = [calcular_puntuacion_normalizada(m, preferencias) for m in lista]
+            obtenidas = calcular_puntuaciones_lote(metricas_a_arrays(lista), preferencias).tolist()
+            self.assertEqual(obtenidas, esperadas)
+
+    def test_busqueda_por_lotes_igual_a_escalar(self):
+        crear_oferta_modular(6, num_siglas=5)
+        por_sigla = cargar_por_sigla()
+        preferencias = {'preferencia_horario': 'entrar_tarde', 'preferir_virtuales': 'no'}
+        escalar = generar(por_sigla, dict(preferencias), max_resultados=5)
+        lotes = generar(por_sigla, dict(preferencias), max_resultados=5, tamano_lote=16)
+        self.assertEqual(json.dumps([[r['puntuacion'], r['metricas']] for r in escalar]),
+                         json.dumps([[r['puntuacion'], r['metricas']] for r in lotes]))
+        self.assertEqual([[a.id for a in r['asignaturas']] for r in escalar],
+                         [[a.id for a in r['asignaturas']] for r in lotes])
+
+
+class BusquedaParalelaTests(TestCase):
+    def test_prefijos_cubren_todas_las_combinaciones(self):
+        crear_oferta_modular(8, num_siglas=5)
+        solicitud = SolicitudCompilada(cargar_por_sigla())
+        total = BusquedaHorarios(solicitud, {}, poda_cota=False)
+        total.explorar()
+        for minimo in (1, 4, 1000):
+            prefijos = dividir_en_prefijos(solicitud, 'menos_secciones', minimo)
+            self.assertTrue(all(len(p) <= 2 for p in prefijos))
+            validas = 0
+            for prefijo in prefijos:
+                busqueda = BusquedaHorarios(solicitud, {}, poda_cota=False)
+                busqueda.explorar(prefijo)
+                validas += busqueda.stats['validas']
+            self.assertEqual(validas, total.stats['validas'])
+
+    def test_paralelo_igual_a_serial(self):
+        if not paralelo_disponible():
+            self.skipTest('Sin método de arranque fork')
+        crear_oferta_modular(9, num_siglas=6)
+        por_sigla = cargar_por_sigla()
+        for perfil in PERFILES:
+            serial = generar(por_sigla, dict(perfil), max_resultados=7)
+            paralelo = generar(por_sigla, dict(perfil), max_resultados=7, procesos=3)
+            self.assertEqual(json.dumps([[r['puntuacion'], r['metricas']] for r in serial]),
+                             json.dumps([[r['puntuacion'], r['metricas']] for r in paralelo]))
+            self.assertEqual([[a.id for a in r['asignaturas']] for r in serial],
+                             [[a.id for a in r['asignaturas']] for r in paralelo])
+
+
+class BusquedaAnytimeTests(TestCase):
+    def test_avances_mejoran_y_final_igual_a_generar(self):
+        crear_oferta_modular(10, num_siglas=5)
+        por_sigla = cargar_por_sigla()
+        for perfil in PERFILES:
+            esperado = generar(por_sigla, dict(perfil), max_resultados=5)
+            avances = list(iterar_combinaciones(por_sigla, dict(perfil), max_resultados=5))
+            self.assertTrue(avances[-1]['final'])
+            self.assertFalse(any(a['final'] for a in avances[:-1]))
+            self.assertEqual([[a.id for a in r['asignaturas']] for r in avances[-1]['horarios']],
+                             [[a.id for a in r['asignaturas']] for r in esperado])
+            # La peor retenida nunca empeora de un avance al siguiente
+            peores = [a['horarios'][-1]['puntuacion'] for a in avances if len(a['horarios']) == 5]
+            self.assertEqual(peores, sorted(peores))
+
+    def test_corte_temprano_entrega_combinaciones_validas(self):
+        crear_oferta_modular(11, num_siglas=5)
+        por_sigla = cargar_por_sigla()
+        referencia = combinaciones_referencia(por_sigla, {})
+        avances = iterar_combinaciones(por_sigla, {}, max_resultados=3)
+        primero = next(avances)
+        avances.close()
+        self.assertFalse(primero['final'])
+        for horario in primero['horarios']:
+            clave = tuple(a.id for a in horario['asignaturas'])
+            self.assertEqual(horario['puntuacion'], referencia[clave])
+
+
+class GenerarStreamTests(TestCase):
+    def setUp(self):
+        caches['generador'].clear()
+        cache_factibles.limpiar()
+        aislar_snapshots(self)
+
+    def test_stream_termina_con_el_mismo_ranking(self):
+        crear_oferta_modular(12, num_siglas=4)
+        cuerpo = json.dumps({
+            'sede': 'Sede Test', 'siglas': sorted(cargar_por_sigla()),
+            'preferencias': {'preferencia_horario': 'entrar_tarde'},
+        })
+        with redirect_stdout(io.StringIO()):
+            normal = self.client.post('/api/generador/generar/', cuerpo, content_type='application/json')
+            stream = self.client.post('/api/generador/generar/stream/', cuerpo,
+                                      content_type='application/json')
+        self.assertEqual(stream['Content-Type'], 'application/x-ndjson')
+        lineas = [json.loads(linea) for linea in b''.join(stream.streaming_content).splitlines()]
+        self.assertEqual(lineas[-1]['tipo'], 'final')
+        self.assertTrue(all(linea['tipo'] == 'avance' for linea in lineas[:-1]))
+        self.assertEqual(lineas[-1]['horarios'], normal.json()['horarios'])
+
+    def test_stream_valida_la_solicitud(self):
+        respuesta = self.client.post('/api/generador/generar/stream/', json.dumps({'siglas': ['X']}),
+                                     content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        respuesta = self.client.post('/api/generador/generar/stream/',
+                                     json.dumps({'sede': 'Sede Test', 'siglas': [['X']]}),
+                                     content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_stream_repuntua_el_conjunto_factible_cacheado(self):
+        crear_oferta_modular(13, num_siglas=4)
+        siglas = sorted(cargar_por_sigla())
+        temprano = {'sede': 'Sede Test', 'siglas': siglas, 'preferencias': {'preferencia_horario': 'entrar_temprano'}}
+        tarde = dict(temprano, preferencias={'preferencia_horario': 'entrar_tarde'})
+        with redirect_stdout(io.StringIO()):
+            self.client.post('/api/generador/generar/', json.dumps(temprano), content_type='application/json')
+            stream = self.client.post('/api/generador/generar/stream/', json.dumps(tarde),
+                                      content_type='application/json')
+            lineas = [json.loads(linea) for linea in b''.join(stream.streaming_content).splitlines()]
+            caches['generador'].clear()
+            normal = self.client.post('/api/generador/generar/', json.dumps(tarde), content_type='application/json')
+        self.assertEqual(len(lineas), 1)
+        self.assertTrue(lineas[0]['progreso']['cache'])
+        self.assertEqual(lineas[0]['horarios'], normal.json()['horarios'])
+
+
+class TrabajosGeneracionTests(TestCase):
+    def setUp(self):
+        caches['generador'].clear()
+        cache_factibles.limpiar()
+        aislar_snapshots(self)
+        crear_oferta_modular(13, num_siglas=4)
+        self.cuerpo = {'sede': 'Sede Test', 'siglas': sorted(cargar_por_sigla()),
+                       'preferencias': {'preferencia_horario': 'entrar_temprano'}}
+
+    def crear(self, cuerpo):
+        return self.client.post('/api/generador/trabajos/', json.dumps(cuerpo),
+                                content_type='application/json')
+
+    def test_flujo_completo_y_deduplicacion(self):
+        creado = self.crear(self.cuerpo)
+        self.assertEqual(creado.status_code, 202)
+        self.assertEqual(creado.json()['estado'], TrabajoGeneracion.PENDIENTE)
+
+        # Misma solicitud con las siglas en otro orden: mismo trabajo
+        repetido = self.crear(dict(self.cuerpo, siglas=list(reversed(self.cuerpo['siglas']))))
+        self.assertEqual(repetido.status_code, 200)
+        self.assertEqual(repetido.json()['id'], creado.json()['id'])
+
+        trabajo = tomar_siguiente_trabajo('test')
+        self.assertIsNone(tomar_siguiente_trabajo('otro'))
+        with redirect_stdout(io.StringIO()):
+            ejecutar_trabajo(trabajo)
+            esperado = self.client.post('/api/generador/generar/', json.dumps(self.cuerpo),
+                                        content_type='application/json').json()
+
+        estado = self.client.get(creado.json()['url']).json()
+        self.assertEqual(estado['estado'], TrabajoGeneracion.COMPLETADO)
+        self.assertEqual(estado['horarios'], esperado['horarios'])
+
+        # Resultado vigente: se reutiliza; vencido: se purga y se crea otro
+        self.assertEqual(self.crear(self.cuerpo).json()['id'], creado.json()['id'])
+        TrabajoGeneracion.objects.update(expira_en=trabajo.creado_en)
+        self.assertEqual(purgar_trabajos_vencidos(), 1)
+        self.assertEqual(self.client.get(creado.json()['url']).status_code, 404)
+        self.assertEqual(self.crear(self.cuerpo).status_code, 202)
+
+    def test_perfiles_se_conservan(self):
+        perfiles = [{'preferencia_horario': 'entrar_temprano'}, {'preferencia_horario': 'salir_tarde'}]
+        creado = self.crear(dict(self.cuerpo, perfiles=perfiles))
+        self.assertEqual(creado.status_code, 202)
+        self.assertNotEqual(self.crear(self.cuerpo).json()['id'], creado.json()['id'])
+        self.assertEqual(self.crear(dict(self.cuerpo, perfiles='x')).status_code, 400)
+        with redirect_stdout(io.StringIO()):
+            ejecutar_trabajo(tomar_siguiente_trabajo())
+            esperado = self.client.post('/api/generador/generar/', json.dumps(dict(self.cuerpo, perfiles=perfiles)),
+                                        content_type='application/json').json()
+        estado = self.client.get(creado.json()['url']).json()
+        self.assertEqual(estado['estado'], TrabajoGeneracion.COMPLETADO)
+        self.assertEqual(estado['perfiles'], esperado['perfiles'])
+
+    def test_un_solo_trabajo_activo_por_clave(self):
+        creado = self.crear(self.cuerpo).json()
+        clave = TrabajoGeneracion.objects.get(pk=creado['id']).clave
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TrabajoGeneracion.objects.create(clave=clave, parametros={})
+        # Uno con error no impide encolar de nuevo
+        TrabajoGeneracion.objects.update(estado=TrabajoGeneracion.ERROR)
+        self.assertEqual(self.crear(self.cuerpo).status_code, 202)
+        # Un completado vencido se reemplaza aunque aún no se haya purgado
+        TrabajoGeneracion.objects.filter(estado=TrabajoGeneracion.PENDIENTE).update(
+            estado=TrabajoGeneracion.COMPLETADO, expira_en=timezone.now())
+        self.assertEqual(self.crear(self.cuerpo).status_code, 202)
+
+    def test_cuerpo_invalido_no_se_encola(self):
+        for cuerpo in ([], 'x', 3, dict(self.cuerpo, siglas='TST000'), dict(self.cuerpo, siglas=[['A']]),
+                       dict(self.cuerpo, preferencias=[]), dict(self.cuerpo, motor='otro'),
+                       dict(self.cuerpo, restricciones={'max_dias': 0})):
+            respuesta = self.crear(cuerpo)
+            self.assertEqual(respuesta.status_code, 400, cuerpo)
+            self.assertIn('error', respuesta.json())
+        self.assertFalse(TrabajoGeneracion.objects.exists())
+
+    def test_error_queda_registrado(self):
+        creado = self.crear(dict(self.cuerpo, siglas=['NOEXISTE']))
+        with redirect_stdout(io.StringIO()):
+            ejecutar_trabajo(tomar_siguiente_trabajo())
+        estado = self.client.get(creado.json()['url']).json()
+        self.assertEqual(estado['estado'], TrabajoGeneracion.ERROR)
+        self.assertIn('NOEXISTE', estado['error'])
+
+
+class CacheResultadosTests(TestCase):
+    def setUp(self):
+        caches['generador'].clear()
+        cache_factibles.limpiar()
+        aislar_snapshots(self)
+        reiniciar_estadisticas_cache()
+        crear_oferta_modular(14, num_siglas=4)
+        self.cuerpo = {'sede': 'Sede Test', 'siglas': sorted(cargar_por_sigla()),
+                       'preferencias': {'preferencia_horario': 'salir_temprano'}}
+
+    def generar(self, cuerpo):
+        with redirect_stdout(io.StringIO()):
+            return self.client.post('/api/generador/generar/', json.dumps(cuerpo),
+                                    content_type='application/json').json()
+
+    def test_acierto_con_preferencias_equivalentes(self):
+        primero = self.generar(self.cuerpo)
+        # Otro orden de siglas y una preferencia por defecto explícita: misma clave
+        equivalente = dict(self.cuerpo, siglas=list(reversed(self.cuerpo['siglas'])),
+                           preferencias={'preferencia_horario': 'salir_temprano', 'minimizar_huecos': True})
+        self.assertEqual(self.generar(equivalente), primero)
+        self.assertEqual(estadisticas_cache()['aciertos'], 1)
+        self.assertEqual(estadisticas_cache()['fallos'], 1)
+
+        self.generar(dict(self.cuerpo, preferencias={'preferencia_horario': 'salir_tarde'}))
+        self.assertEqual(estadisticas_cache()['fallos'], 2)
+
+    def test_recarga_de_oferta_invalida(self):
+        version = VersionOferta.actual('Sede Test')
+        self.generar(self.cuerpo)
+        VersionOferta.incrementar('Sede Test')
+        self.generar(self.cuerpo)
+        self.assertEqual(estadisticas_cache(), {'aciertos': 0, 'fallos': 2, 'tasa_aciertos': 0.0})
+        self.assertEqual(VersionOferta.actual('Sede Test'), version + 1)
+
+    def test_edicion_individual_invalida(self):
+        primero = self.generar(self.cuerpo)
+        id_asig = primero['horarios'][0]['asignaturas'][0]['id']
+        horario = Horario.objects.filter(asignatura_id=id_asig).first()
+        horario.dia = 'Sa'
+        horario.save()
+        self.generar(self.cuerpo)
+        self.assertEqual(estadisticas_cache()['aciertos'], 0)
+
+        Asignatura.objects.filter(pk=id_asig).delete()
+        tercero = self.generar(self.cuerpo)
+        self.assertEqual(estadisticas_cache()['aciertos'], 0)
+        self.assertNotIn(id_asig, {a['id'] for r in tercero['horarios'] for a in r['asignaturas']})
+
+
+class ConjuntoFactibleTests(TestCase):
+    def setUp(self):
+        caches['generador'].clear()
+        cache_factibles.limpiar()
+        aislar_snapshots(self)
+
+    def test_repuntuar_igual_a_buscar(self):
+        crear_oferta(15, num_siglas=4, max_secciones=5)
+        crear_oferta_modular(16, num_siglas=4, sede='Sede Modular')
+        for sede in ('Sede Test', 'Sede Modular'):
+            por_sigla = cargar_por_sigla(sede)
+            conjunto = construir_conjunto_factible(por_sigla)
+            for perfil in PERFILES:
+                esperado = generar(por_sigla, dict(perfil), max_resultados=6)
+                obtenido = conjunto.mejores(dict(perfil), max_resultados=6)
+                self.assertEqual(json.dumps([[r['puntuacion'], r['metricas']] for r in esperado]),
+                                 json.dumps([[r['puntuacion'], r['metricas']] for r in obtenido]))
+                self.assertEqual([[a.id for a in r['asignaturas']] for r in esperado],
+                                 [[a.id for a in r['asignaturas']] for r in obtenido])
+
+    def test_cambio_de_preferencias_reusa_el_conjunto(self):
+        crear_oferta_modular(17, num_siglas=4)
+        cuerpo = {'sede': 'Sede Test', 'siglas': sorted(cargar_por_sigla())}
+        with redirect_stdout(io.StringIO()):
+            for perfil in PERFILES:
+                self.client.post('/api/generador/generar/', json.dumps(dict(cuerpo, preferencias=perfil)),
+                                 content_type='application/json')
+        estadisticas = cache_factibles.estadisticas()
+        self.assertEqual(estadisticas['fallos'], 1)
+        self.assertEqual(estadisticas['aciertos'], len(PERFILES) - 1)
+
+    def test_tope_de_memoria(self):
+        crear_oferta_modular(18, num_siglas=5)
+        conjunto = construir_conjunto_factible(cargar_por_sigla())
+        cache = CacheFactibles(max_bytes=conjunto.nbytes * 4)
+        self.assertTrue(cache.guardar('a', conjunto))
+        self.assertTrue(cache.guardar('b', conjunto))
+        cache.obtener('a')
+        self.assertTrue(cache.guardar('c', conjunto))
+        self.assertTrue(cache.guardar('d', conjunto))
+        self.assertTrue(cache.guardar('e', conjunto))
+        # 'b' era el menos usado recientemente
+        self.assertIsNone(cache.obtener('b'))
+        self.assertIsNotNone(cache.obtener('a'))
+        self.assertLessEqual(cache.estadisticas()['bytes'], cache.max_bytes)
+        # Un conjunto mayor que la cuarta parte del presupuesto no se cachea
+        self.assertFalse(CacheFactibles(max_bytes=conjunto.nbytes).guardar('x', conjunto))
+
+
+    def test_solo_enumera_lo_que_cabe(self):
+        crear_oferta_modular(19, num_siglas=5)
+        por_sigla = cargar_por_sigla()
+        conjunto = conjunto_factible_acotado(por_sigla)
+        self.assertEqual(len(conjunto), contar_combinaciones(SolicitudCompilada(por_sigla), concretas=False))
+        self.assertEqual(conjunto.posiciones.dtype, np.int16)
+        self.assertTrue(all(valores.dtype == np.float64 for valores in conjunto.metricas.values()))
+
+        # Más combinaciones que el tope: ni siquiera se enumera
+        tope = len(conjunto) * bytes_por_combinacion(len(por_sigla)) * 4 - 1
+        with patch.object(cache_factibles, 'max_bytes', tope), \
+                patch.object(BusquedaHorarios, 'explorar') as explorar:
+            self.assertIsNone(conjunto_factible_acotado(por_sigla))
+        explorar.assert_not_called()
+
+        # Una enumeración que no terminó a tiempo no se entrega
+        self.assertIsNone(conjunto_factible_acotado(por_sigla, max_tiempo=-1))
+
+
+class ClasesEquivalentesTests(TestCase):
+    def setUp(self):
+        caches['generador'].clear()
+        cache_factibles.limpiar()
+        aislar_snapshots(self)
+
+    def test_mismo_top_k_con_menos_nodos(self):
+        crear_oferta_modular(24, num_siglas=5, max_secciones=5)
+        duplicar_secciones(24)
+        por_sigla = cargar_por_sigla()
+        for perfil in PERFILES:
+            sin_agrupar, agrupadas = {}, {}
+            esperado = generar(por_sigla, dict(perfil), max_resultados=8, estadisticas=sin_agrupar,
+                               agrupar=False)
+            obtenido = generar(por_sigla, dict(perfil), max_resultados=8, estadisticas=agrupadas)
+            self.assertEqual(json.dumps([[r['puntuacion'], r['metricas']] for r in esperado]),
+                             json.dumps([[r['puntuacion'], r['metricas']] for r in obtenido]))
+            self.assertEqual([[a.id for a in r['asignaturas']] for r in esperado],
+                             [[a.id for a in r['asignaturas']] for r in obtenido])
+            self.assertLess(agrupadas['clases'], agrupadas['secciones'])
+            self.assertLess(agrupadas['exploradas'], sin_agrupar['exploradas'])
+
+        todas, agrupadas = {}, {}
+        generar(por_sigla, {}, max_resultados=0, poda_cota=False, estadisticas=todas, agrupar=False)
+        generar(por_sigla, {}, max_resultados=0, poda_cota=False, estadisticas=agrupadas)
+        self.assertEqual(agrupadas['validas'], todas['validas'])
+
+    def test_alternativas(self):
+        crear_oferta_modular(25, num_siglas=4, max_secciones=5)
+        duplicar_secciones(25)
+        por_sigla = cargar_por_sigla()
+        resultado = generar(por_sigla, {}, max_resultados=6, alternativas=True)
+        horarios = {tuple(a.id for a in r['asignaturas']) for r in resultado}
+        self.assertEqual(len(horarios), len(resultado))
+        for r in resultado:
+            for asig, otras in zip(r['asignaturas'], r['alternativas']):
+                self.assertNotIn(asig, otras)
+                for otra in otras:
+                    self.assertEqual(otra.sigla, asig.sigla)
+                    self.assertEqual(
+                        [(h.dia, h.hora_inicio, h.hora_fin) for h in otra.horarios.all()],
+                        [(h.dia, h.hora_inicio, h.hora_fin) for h in asig.horarios.all()],
+                    )
+        self.assertTrue(any(otras for r in resultado for otras in r['alternativas']))
+
+        conjunto = construir_conjunto_factible(por_sigla)
+        desde_conjunto = conjunto.mejores({}, max_resultados=6, alternativas=True)
+        self.assertEqual(
+            [([a.id for a in r['asignaturas']], [[o.id for o in otras] for otras in r['alternativas']])
+             for r in resultado],
+            [([a.id for a in r['asignaturas']], [[o.id for o in otras] for otras in r['alternativas']])
+             for r in desde_conjunto],
+        )
+
+    def test_api_con_alternativas(self):
+        crear_oferta_modular(26, num_siglas=3, max_secciones=4)
+        duplicar_secciones(26)
+        cuerpo = {'sede': 'Sede Test', 'siglas': sorted(cargar_por_sigla()), 'alternativas': True}
+        with redirect_stdout(io.StringIO()):
+            respuesta = self.client.post('/api/generador/generar/', json.dumps(cuerpo),
+                                         content_type='application/json')
+            sin_alternativas = self.client.post('/api/generador/generar/',
+                                                json.dumps(dict(cuerpo, alternativas=False)),
+                                                content_type='application/json')
+        asignaturas = [a for h in respuesta.json()['horarios'] for a in h['asignaturas']]
+        self.assertTrue(all('alternativas' in a for a in asignaturas))
+        self.assertTrue(any(a['alternativas'] for a in asignaturas))
+        self.assertFalse(any('alternativas' in a for h in sin_alternativas.json()['horarios']
+                             for a in h['asignaturas']))
+
+
+class RestriccionesTests(TestCase):
+    def setUp(self):
+        caches['generador'].clear()
+        cache_factibles.limpiar()
+        aislar_snapshots(self)
+
+    def referencia_filtrada(self, por_sigla, cumple):
+        referencia = combinaciones_referencia(por_sigla, {})
+        return {clave for clave in referencia if cumple([Asignatura.objects.get(pk=i) for i in clave])}
+
+    def test_mismas_combinaciones_que_filtrar_despues(self):
+        crear_oferta_modular(27, num_siglas=4, max_secciones=6)
+        por_sigla = cargar_por_sigla()
+        casos = [
+            ({'hora_inicio_min': '10:00'},
+             lambda asigs: all(h.hora_inicio >= time(10, 0) for a in asigs for h in a.horarios.all())),
+            ({'hora_fin_max': '14:00'},
+             lambda asigs: all(h.hora_fin <= time(14, 0) for a in asigs for h in a.horarios.all())),
+            ({'dias_libres': ['Vi', 'Lu']},
+             lambda asigs: not {h.dia for a in asigs for h in a.horarios.all()} & {'Vi', 'Lu'}),
+            ({'max_dias': 3},
+             lambda asigs: len({h.dia for a in asigs for h in a.horarios.all()}) <= 3),
+        ]
+        for restricciones, cumple in casos:
+            normalizadas = normalizar_restricciones(restricciones)
+            filtrado, sin_secciones = filtrar_secciones(por_sigla, normalizadas)
+            esperado = self.referencia_filtrada(por_sigla, cumple)
+            if sin_secciones:
+                self.assertEqual(esperado, set())
+                continue
+            estadisticas = {}
+            resultado = generar(filtrado, {}, poda_cota=False, estadisticas=estadisticas,
+                                max_dias=normalizadas['max_dias'])
+            self.assertEqual({tuple(a.id for a in r['asignaturas']) for r in resultado}, esperado)
+            self.assertEqual(estadisticas['validas'], len(esperado))
+            conjunto = construir_conjunto_factible(filtrado, max_dias=normalizadas['max_dias'])
+            self.assertEqual(len(conjunto.mejores({}, max_resultados=10 ** 6)), len(esperado))
+
+    def test_validacion(self):
+        for invalida in ({'hora_inicio_min': '25:00'}, {'hora_fin_max': 'tarde'}, {'max_dias': 0},
+                         {'hora_inicio_min': '12:00', 'hora_fin_max': '10:00'}, {'dias_libres': 'Vi'}):
+            with self.assertRaises(ValueError):
+                normalizar_restricciones(invalida)
+
+    def test_api(self):
+        crear_oferta_modular(28, num_siglas=3)
+        por_sigla = cargar_por_sigla()
+        cuerpo = {'sede': 'Sede Test', 'siglas': sorted(por_sigla)}
+        # Un día que cada sigla puede dejar libre en alguna sección
+        libre = next(dia for dia in DIAS[:5] if all(
+            any(all(h.dia != dia for h in a.horarios.all()) for a in secciones)
+            for secciones in por_sigla.values()
+        ))
+        with redirect_stdout(io.StringIO()):
+            libres = self.client.post('/api/generador/generar/',
+                                      json.dumps(dict(cuerpo, restricciones={'dias_libres': [libre],
+                                                                             'max_dias': 4})),
+                                      content_type='application/json')
+            invalida = self.client.post('/api/generador/generar/',
+                                        json.dumps(dict(cuerpo, restricciones={'max_dias': 'dos'})),
+                                        content_type='application/json')
+            imposible = self.client.post('/api/generador/generar/',
+                                         json.dumps(dict(cuerpo, restricciones={'hora_fin_max': '08:00'})),
+                                         content_type='application/json')
+        self.assertEqual(libres.status_code, 200, libres.content)
+        for horario in libres.json()['horarios']:
+            dias = {h['dia'] for a in horario['asignaturas'] for h in a['horarios']}
+            self.assertNotIn(libre, dias)
+            self.assertLessEqual(len(dias), 4)
+        self.assertEqual(invalida.status_code, 400)
+        self.assertEqual(imposible.status_code, 400)
+        self.assertIn('cumple las restricciones', imposible.json()['error'])
+
+
+class DiagnosticoConflictoTests(TestCase):
+    def setUp(self):
+        caches['generador'].clear()
+        cache_factibles.limpiar()
+        aislar_snapshots(self)
+
+    def seccion(self, sigla, *bloques, jornada='Diurna'):
+        asig = Asignatura.objects.create(
+            sede='Sede Test', carrera='C', plan='1', jornada=jornada, nivel='1', sigla=sigla,
+            nombre=sigla, seccion=f'{sigla}-{Asignatura.objects.filter(sigla=sigla).count()}',
+        )
+        for dia, hora in bloques:
+            Horario.objects.create(asignatura=asig, dia=dia, hora_inicio=time(hora, 0), hora_fin=time(hora + 1, 0))
+
+    def test_par_que_siempre_choca(self):
+        self.seccion('AAA', ('Lu', 8))
+        self.seccion('AAA', ('Ma', 8))
+        self.seccion('BBB', ('Lu', 8), ('Ma', 8))
+        self.seccion('CCC', ('Mi', 8))
+        self.seccion('DDD', ('Ju', 8))
+        self.assertEqual(diagnosticar_conflicto(cargar_por_sigla()), ['AAA', 'BBB'])
+
+    def test_trio_sin_pares_en_conflicto(self):
+        # Tres siglas, dos módulos: cualquier par cabe, las tres no
+        for sigla in ('AAA', 'BBB', 'CCC'):
+            self.seccion(sigla, ('Lu', 8))
+            self.seccion(sigla, ('Lu', 9))
+        self.seccion('DDD', ('Lu', 8))
+        self.seccion('DDD', ('Ma', 8))
+        self.assertEqual(diagnosticar_conflicto(cargar_por_sigla()), ['AAA', 'BBB', 'CCC'])
+
+    def test_jornadas_y_maximo_de_dias(self):
+        self.seccion('AAA', ('Lu', 8))
+        self.seccion('BBB', ('Ma', 8))
+        self.seccion('CCC', ('Lu', 10))
+        por_sigla = cargar_por_sigla()
+        self.assertIsNone(diagnosticar_conflicto(por_sigla))
+        self.assertEqual(diagnosticar_conflicto(por_sigla, max_dias=1), ['AAA', 'BBB'])
+
+        self.seccion('DDD', ('Vi', 19), jornada='Vespertina')
+        self.assertEqual(diagnosticar_conflicto(cargar_por_sigla()), ['AAA', 'DDD'])
+
+    def test_oferta_con_combinaciones(self):
+        crear_oferta_modular(29, num_siglas=6)
+        por_sigla = cargar_por_sigla()
+        self.assertTrue(generar(por_sigla, {}, max_resultados=1))
+        self.assertIsNone(diagnosticar_conflicto(por_sigla))
+
+    def test_api_nombra_las_siglas(self):
+        self.seccion('AAA', ('Lu', 8))
+        self.seccion('BBB', ('Lu', 8))
+        self.seccion('CCC', ('Mi', 8))
+        respuesta = self.client.post(
+            '/api/generador/generar/',
+            json.dumps({'sede': 'Sede Test', 'siglas': ['AAA', 'BBB', 'CCC']}), content_type='application/json'
+        )
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertIn('AAA y BBB no se pueden combinar', respuesta.json()['error'])
+
+    def test_busqueda_vacia_nombra_las_siglas(self):
+        # Sin el chequeo previo, es la búsqueda completa la que no encuentra combinaciones
+        self.seccion('AAA', ('Lu', 8))
+        self.seccion('BBB', ('Lu', 8))
+        self.seccion('CCC', ('Mi', 8))
+        cuerpo = json.dumps({'sede': 'Sede Test', 'siglas': ['AAA', 'BBB', 'CCC']})
+        with patch('oferta.views.generador.diagnosticar_conflicto', return_value=None), \
+                redirect_stdout(io.StringIO()):
+            respuesta = self.client.post('/api/generador/generar/', cuerpo, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertIn('AAA y BBB no se pueden combinar', respuesta.json()['error'])
+
+    def test_matriz_de_conflictos_se_construye_una_vez(self):
+        crear_oferta_modular(30, num_siglas=4)
+        cuerpo = json.dumps({'sede': 'Sede Test', 'siglas': sorted(cargar_por_sigla())})
+        construir = MatrizConflictos._construir
+        with patch.object(MatrizConflictos, '_construir', autospec=True, side_effect=construir) as espia, \
+                redirect_stdout(io.StringIO()):
+            respuesta = self.client.post('/api/generador/generar/', cuerpo, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(espia.call_count, 1)
+
+
+class BusquedaPorMitadesTests(TestCase):
+    def claves(self, resultado):
+        return [[a.id for a in r['asignaturas']] for r in resultado]
+
+    def test_mismos_resultados_que_backtracking(self):
+        crear_oferta_modular(30, num_siglas=7, max_secciones=6)
+        duplicar_secciones(30, max_copias=1)
+        por_sigla = cargar_por_sigla()
+        for perfil in PERFILES:
+            esperado = generar(por_sigla, dict(perfil), max_resultados=6, motor='backtracking')
+            obtenido = generar(por_sigla, dict(perfil), max_resultados=6, motor='mitades')
+            self.assertEqual(self.claves(esperado), self.claves(obtenido))
+            self.assertEqual([r['puntuacion'] for r in esperado], [r['puntuacion'] for r in obtenido])
+
+        for kwargs in ({}, {'max_dias': 4}, {'alternativas': True}):
+            todas, por_mitades = {}, {}
+            esperado = generar(por_sigla, {}, max_resultados=0, poda_cota=False, estadisticas=todas,
+                               motor='backtracking', **kwargs)
+            obtenido = generar(por_sigla, {}, max_resultados=0, poda_cota=False, estadisticas=por_mitades,
+                               motor='mitades', **kwargs)
+            self.assertEqual(por_mitades['validas'], todas['validas'])
+            self.assertEqual(por_mitades['motor'], 'mitades')
+            self.assertEqual(self.claves(esperado), self.claves(obtenido))
+
+    def test_siglas_de_una_seccion(self):
+        # Dominios de tamaño 1 (o uno grande y el resto de 1): ninguna mitad queda vacía
+        for n, secciones in enumerate([1, 1, 1, 3]):
+            for s in range(secciones):
+                asig = Asignatura.objects.create(
+                    sede='Sede Test', carrera='C', plan='1', jornada='Diurna', nivel='1',
+                    sigla=f'UNA{n}', nombre=f'UNA{n}', seccion=f'UNA{n}-{s}',
+                )
+                Horario.objects.create(asignatura=asig, dia=DIAS[n], hora_inicio=time(8 + 2 * s, 1),
+                                       hora_fin=time(9 + 2 * s, 21))
+        todas = cargar_por_sigla()
+        for siglas in (['UNA0', 'UNA1', 'UNA2'], ['UNA0', 'UNA3'], sorted(todas)):
+            por_sigla = {sigla: todas[sigla] for sigla in siglas}
+            izquierda, derecha = dividir_siglas(SolicitudCompilada(por_sigla))
+            self.assertTrue(izquierda and derecha)
+            esperado = generar(por_sigla, {}, max_resultados=5, motor='backtracking')
+            obtenido = generar(por_sigla, {}, max_resultados=5, motor='mitades')
+            self.assertTrue(obtenido)
+            self.assertEqual(self.claves(esperado), self.claves(obtenido))
+
+    def test_elige_mitades_solo_con_ramas_muertas(self):
+        # Nueve siglas y ocho módulos: todos los pares caben, la combinación no
+        for n in range(9):
+            for s in range(8):
+                asig = Asignatura.objects.create(
+                    sede='Sede Test', carrera='C', plan='1', jornada='Diurna', nivel='1',
+                    sigla=f'PAL{n}', nombre=f'PAL{n}', seccion=f'PAL{n}-{s}',
+                )
+                Horario.objects.create(asignatura=asig, dia=DIAS[s % 4], hora_inicio=time(8 + s // 4 * 2, 0),
+                                       hora_fin=time(9 + s // 4 * 2, 0))
+        palomar = SolicitudCompilada(cargar_por_sigla())
+        self.assertEqual(elegir_motor(palomar), 'mitades')
+        self.assertEqual(generar(cargar_por_sigla(), {}, motor='mitades'), [])
+
+        crear_oferta_modular(31, num_siglas=4, sede='Otra')
+        self.assertEqual(elegir_motor(SolicitudCompilada(cargar_por_sigla('Otra'))), 'backtracking')
+        with self.assertRaises(ValueError):
+            elegir_motor(palomar, 'otro')
+
+    def test_no_admite_prefijos(self):
+        crear_oferta_modular(32, num_siglas=3)
+        solicitud = SolicitudCompilada(cargar_por_sigla())
+        busqueda = BusquedaPorMitades(solicitud, {})
+        with self.assertRaises(ValueError):
+            list(busqueda.iterar(prefijo=(0,)))
+
+
+class BusquedaPorComponentesTests(TestCase):
+    def claves(self, resultado):
+        return [[a.id for a in r['asignaturas']] for r in resultado]
+
+    def test_componentes(self):
+        crear_oferta_por_grupos(50, grupos=3, por_grupo=2)
+        crear_oferta_modular(50, num_siglas=2, sede='Otra')
+        solicitud = SolicitudCompilada(cargar_por_sigla())
+        siglas = sorted(cargar_por_sigla())
+        self.assertEqual([[siglas[j] for j in grupo] for grupo in componentes_siglas(solicitud)],
+                         [['G0S0', 'G0S1'], ['G1S0', 'G1S1'], ['G2S0', 'G2S1']])
+        # Siglas que comparten tramos: una sola componente
+        self.assertEqual(len(componentes_siglas(SolicitudCompilada(cargar_por_sigla('Otra')))), 1)
+
+    def test_mismos_resultados_que_backtracking(self):
+        crear_oferta_por_grupos(51, grupos=3, por_grupo=3, max_secciones=5)
+        duplicar_secciones(51, max_copias=1)
+        por_sigla = cargar_por_sigla()
+        for perfil in PERFILES:
+            esperado = generar(por_sigla, dict(perfil), max_resultados=6, motor='backtracking')
+            obtenido = generar(por_sigla, dict(perfil), max_resultados=6, motor='componentes')
+            self.assertEqual(self.claves(esperado), self.claves(obtenido))
+            self.assertEqual([r['puntuacion'] for r in esperado], [r['puntuacion'] for r in obtenido])
+
+        for kwargs in ({}, {'max_dias': 4}, {'alternativas': True}):
+            todas, por_componentes = {}, {}
+            esperado = generar(por_sigla, {}, max_resultados=0, poda_cota=False, estadisticas=todas,
+                               motor='backtracking', **kwargs)
+            obtenido = generar(por_sigla, {}, max_resultados=0, poda_cota=False, estadisticas=por_componentes,
+                               motor='componentes', **kwargs)
+            self.assertEqual(por_componentes['validas'], todas['validas'])
+            self.assertEqual(por_componentes['motor'], 'componentes')
+            self.assertEqual(self.claves(esperado), self.claves(obtenido))
+
+    def test_mezcla_k_best_no_recorre_el_producto(self):
+        class Contadora(BusquedaPorComponentes):
+            hojas = 0
+
+            def _registrar_hoja(self):
+                self.hojas += 1
+                super()._registrar_hoja()
+
+        crear_oferta_por_grupos(57, grupos=3, por_grupo=2, max_secciones=8)
+        por_sigla = cargar_por_sigla()
+        producto = Contadora(SolicitudCompilada(por_sigla), {}, max_resultados=0, poda_cota=False)
+        producto.explorar()
+        hojas = []
+        for perfil in PERFILES:
+            for max_dias in (None, 5):
+                exacta = BusquedaHorarios(SolicitudCompilada(por_sigla), dict(perfil), max_resultados=5,
+                                          max_dias=max_dias)
+                exacta.explorar()
+                mezcla = Contadora(SolicitudCompilada(por_sigla), dict(perfil), max_resultados=5, max_dias=max_dias)
+                mezcla.explorar()
+                self.assertEqual([(d['puntuacion'], d['clave']) for d in mezcla.mejores_k.ordenados()],
+                                 [(d['puntuacion'], d['clave']) for d in exacta.mejores_k.ordenados()])
+                if max_dias is None:
+                    hojas.append(mezcla.hojas)
+        # Con cotas que separan, la mezcla se detiene mucho antes del producto
+        self.assertLess(min(hojas) * 10, producto.hojas)
+        self.assertLessEqual(max(hojas), producto.hojas)
+
+    def test_eleccion_y_busqueda_conjunta(self):
+        crear_oferta_por_grupos(9, grupos=3, por_grupo=5, max_secciones=10)
+        self.assertEqual(elegir_motor(SolicitudCompilada(cargar_por_sigla())), 'componentes')
+        self.assertNotEqual(elegir_motor(SolicitudCompilada(cargar_por_sigla()), max_dias=4), 'componentes')
+
+        # Una sola componente: la búsqueda conjunta de siempre
+        crear_oferta_modular(52, num_siglas=4, sede='Otra')
+        por_sigla = cargar_por_sigla('Otra')
+        esperado = generar(por_sigla, {}, motor='backtracking')
+        self.assertEqual(self.claves(generar(por_sigla, {}, motor='componentes')), self.claves(esperado))
+        with self.assertRaises(ValueError):
+            list(BusquedaPorComponentes(SolicitudCompilada(por_sigla), {}).iterar(prefijo=(0,)))
+
+
+class BusquedaHeuristicaTests(TestCase):
+    def setUp(self):
+        caches['generador'].clear()
+        cache_factibles.limpiar()
+        aislar_snapshots(self)
+
+    def test_con_tiempo_termina_exacta(self):
+        crear_oferta_modular(33, num_siglas=5, max_secciones=5)
+        por_sigla = cargar_por_sigla()
+        for perfil in PERFILES:
+            estadisticas = {}
+            esperado = generar(por_sigla, dict(perfil), max_resultados=5, motor='backtracking')
+            with override_settings(GENERADOR_TIEMPO_HEURISTICO=10):
+                obtenido = generar(por_sigla, dict(perfil), max_resultados=5, motor='heuristico',
+                                   estadisticas=estadisticas)
+            self.assertFalse(estadisticas['heuristico'])
+            self.assertEqual([[a.id for a in r['asignaturas']] for r in esperado],
+                             [[a.id for a in r['asignaturas']] for r in obtenido])
+
+    def test_auto_resuelve_exacta_si_alcanza(self):
+        # La estimación sin poda supera el umbral, pero la búsqueda exacta termina a tiempo
+        crear_oferta_modular(37, num_siglas=5, max_secciones=5)
+        por_sigla = cargar_por_sigla()
+        with patch('oferta.views.generador_mitades.NODOS_POR_SEGUNDO', 0):
+            self.assertEqual(elegir_motor(SolicitudCompilada(por_sigla), max_dias=4), MOTOR_CON_RESPALDO)
+            for perfil in PERFILES:
+                estadisticas = {}
+                esperado = generar(por_sigla, dict(perfil), max_resultados=5, max_dias=4, motor='backtracking')
+                obtenido = generar(por_sigla, dict(perfil), max_resultados=5, max_dias=4,
+                                   estadisticas=estadisticas)
+                self.assertEqual(estadisticas['motor'], MOTOR_CON_RESPALDO)
+                self.assertFalse(estadisticas['heuristico'])
+                self.assertFalse(estadisticas['timeout'])
+                self.assertEqual([[a.id for a in r['asignaturas']] for r in esperado],
+                                 [[a.id for a in r['asignaturas']] for r in obtenido])
+                self.assertFalse(any(r.get('heuristico') for r in obtenido))
+
+    @override_settings(GENERADOR_TIEMPO_HEURISTICO=0)
+    def test_auto_sin_tiempo_sigue_con_la_heuristica(self):
+        crear_oferta_modular(38, num_siglas=5, max_secciones=5)
+        por_sigla = cargar_por_sigla()
+        referencia = combinaciones_referencia(por_sigla, {})
+        estadisticas = {}
+        with patch('oferta.views.generador_mitades.NODOS_POR_SEGUNDO', 0):
+            resultado = generar(por_sigla, {}, max_resultados=5, max_dias=None, estadisticas=estadisticas)
+        self.assertTrue(estadisticas['heuristico'])
+        self.assertFalse(estadisticas['timeout'])
+        self.assertTrue(resultado)
+        for r in resultado:
+            self.assertAlmostEqual(referencia[tuple(a.id for a in r['asignaturas'])], r['puntuacion'])
+
+    @override_settings(GENERADOR_TIEMPO_HEURISTICO=0)
+    def test_sin_tiempo_entrega_horarios_validos_del_haz(self):
+        crear_oferta(34, num_siglas=5, max_secciones=5)
+        por_sigla = cargar_por_sigla()
+        referencia = combinaciones_referencia(por_sigla, {})
+        estadisticas = {}
+        resultado = generar(por_sigla, {}, max_resultados=5, motor='heuristico', max_dias=None,
+                            estadisticas=estadisticas)
+        self.assertTrue(estadisticas['heuristico'])
+        self.assertFalse(estadisticas['timeout'])
+        self.assertTrue(resultado)
+        for r in resultado:
+            self.assertTrue(r['heuristico'])
+            clave = tuple(a.id for a in r['asignaturas'])
+            self.assertAlmostEqual(referencia[clave], r['puntuacion'])
+
+        # Los vecindarios no registran dos veces el mismo horario
+        busqueda = BusquedaHeuristica(SolicitudCompilada(por_sigla), {},
+                                      max_resultados=50, tiempo_limite=10)
+        busqueda.explorar()
+        claves = [datos['clave'] for datos in busqueda.mejores_k.ordenados()]
+        self.assertEqual(len(claves), len(set(claves)))
+
+    @override_settings(GENERADOR_TIEMPO_HEURISTICO=0)
+    def test_stream_indica_resultado_heuristico(self):
+        crear_oferta_modular(35, num_siglas=4)
+        cuerpo = {'sede': 'Sede Test', 'siglas': sorted(cargar_por_sigla()), 'motor': 'heuristico'}
+        with redirect_stdout(io.StringIO()):
+            stream = self.client.post('/api/generador/generar/stream/', json.dumps(cuerpo),
+                                      content_type='application/json')
+            invalido = self.client.post('/api/generador/generar/', json.dumps(dict(cuerpo, motor='otro')),
+                                        content_type='application/json')
+        final = json.loads(b''.join(stream.streaming_content).splitlines()[-1])
+        self.assertEqual(final['tipo'], 'final')
+        self.assertTrue(final['progreso']['heuristico'])
+        self.assertTrue(all(horario['heuristico'] for horario in final['horarios']))
+        self.assertEqual(invalido.status_code, 400)
+
+
+class MultiperfilTests(TestCase):
+    def setUp(self):
+        caches['generador'].clear()
+        cache_factibles.limpiar()
+        aislar_snapshots(self)
+        reiniciar_estadisticas_cache()
+
+    def test_una_busqueda_mismos_rankings(self):
+        crear_oferta_modular(36, num_siglas=6, max_secciones=6)
+        duplicar_secciones(36, max_copias=1)
+        por_sigla = cargar_por_sigla()
+        separadas, nodos = [], 0
+        for perfil in PERFILES:
+            estadisticas = {}
+            separadas.append(generar(por_sigla, dict(perfil), max_resultados=5, estadisticas=estadisticas,
+                                     motor='backtracking'))
+            nodos += estadisticas['exploradas']
+        for kwargs in ({}, {'alternativas': True}, {'max_dias': 4}):
+            estadisticas = {}
+            juntas = generar_combinaciones_multiperfil(por_sigla, [dict(p) for p in PERFILES], max_resultados=5,
+                                                       estadisticas=estadisticas, **kwargs)
+            if not kwargs:
+                self.assertEqual(
+                    [[([a.id for a in r['asignaturas']], r['puntuacion']) for r in ranking] for ranking in separadas],
+                    [[([a.id for a in r['asignaturas']], r['puntuacion']) for r in ranking] for ranking in juntas],
+                )
+                self.assertLess(estadisticas['exploradas'], nodos)
+            for perfil, ranking in zip(PERFILES, juntas):
+                esperado = generar(por_sigla, dict(perfil), max_resultados=5, motor='backtracking', **kwargs)
+                self.assertEqual([[a.id for a in r['asignaturas']] for r in esperado],
+                                 [[a.id for a in r['asignaturas']] for r in ranking])
+
+    def test_api_con_perfiles(self):
+        crear_oferta_modular(37, num_siglas=4)
+        # Sin conjunto factible cacheable: una sola búsqueda para todos los perfiles
+        self.addCleanup(setattr, cache_factibles, 'max_bytes', cache_factibles.max_bytes)
+        cache_factibles.max_bytes = 0
+        cuerpo = {'sede': 'Sede Test', 'siglas': sorted(cargar_por_sigla()), 'perfiles': PERFILES[1:3]}
+        with redirect_stdout(io.StringIO()):
+            respuesta = self.client.post('/api/generador/generar/', json.dumps(cuerpo),
+                                         content_type='application/json')
+            individuales = [
+                self.client.post('/api/generador/generar/',
+                                 json.dumps({'sede': 'Sede Test', 'siglas': cuerpo['siglas'], 'preferencias': perfil}),
+                                 content_type='application/json').json()
+                for perfil in cuerpo['perfiles']
+            ]
+            invalida = self.client.post('/api/generador/generar/', json.dumps(dict(cuerpo, perfiles=[])),
+                                        content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        perfiles = respuesta.json()['perfiles']
+        self.assertEqual([p['preferencias'] for p in perfiles], cuerpo['perfiles'])
+        self.assertEqual([p['horarios'] for p in perfiles], [r['horarios'] for r in individuales])
+        self.assertFalse(any(p['heuristico'] for p in perfiles))
+        # Cada perfil quedó en la caché con la clave de una solicitud normal
+        self.assertEqual(estadisticas_cache()['aciertos'], 2)
+        self.assertEqual(invalida.status_code, 400)
+
+
+class IntercambioSeccionTests(TestCase):
+    def setUp(self):
+        caches['generador'].clear()
+        cache_factibles.limpiar()
+        aislar_snapshots(self)
+
+    def referencia(self, por_sigla, fijas, sigla, preferencias):
+        """Alternativas por fuerza bruta: solapamiento con las fijas y métricas desde cero."""
+        preferencias = dict(preferencias)
+        preferencias['rango_inicio_min'], preferencias['rango_fin_max'] = detectar_rango_global(por_sigla)
+        alternativas = []
+        for candidata in por_sigla[sigla]:
+            if any(a.jornada != candidata.jornada for a in fijas):
+                continue
+            if any(h1.dia == h2.dia and h1.hora_inicio < h2.hora_fin and h1.hora_fin > h2.hora_inicio
+                   for a in fijas for h1 in a.horarios.all() for h2 in candidata.horarios.all()):
+                continue
+            metricas = calcular_metricas_horario(sorted(fijas + [candidata], key=lambda a: a.sigla))
+            alternativas.append((-calcular_puntuacion_normalizada(metricas, preferencias), candidata.id))
+        return [(id_seccion, -puntuacion) for puntuacion, id_seccion in sorted(alternativas)]
+
+    def test_igual_a_fuerza_bruta(self):
+        crear_oferta(38, num_siglas=5, max_secciones=6)
+        duplicar_secciones(38)
+        por_sigla = cargar_por_sigla()
+        snapshot = obtener_snapshot('Sede Test')
+        horario = generar(por_sigla, {}, max_resultados=1)[0]['asignaturas']
+        for perfil in PERFILES:
+            for asig in horario:
+                fijas = [a for a in horario if a.sigla != asig.sigla]
+                alternativas, error = alternativas_para_sigla(snapshot, [a.id for a in horario], asig.sigla,
+                                                              perfil)
+                self.assertIsNone(error)
+                esperado = self.referencia(por_sigla, fijas, asig.sigla, perfil)
+                self.assertEqual([a['seccion'].id for a in alternativas], [i for i, _ in esperado])
+                for alternativa, (_, puntuacion) in zip(alternativas, esperado):
+                    self.assertAlmostEqual(alternativa['puntuacion'], puntuacion)
+                # La sección actual siempre está entre las alternativas
+                self.assertIn(asig.id, [a['seccion'].id for a in alternativas])
+
+    def test_api_con_ids_y_con_horario_guardado(self):
+        crear_oferta_modular(39, num_siglas=4)
+        with redirect_stdout(io.StringIO()):
+            horario = self.client.post(
+                '/api/generador/generar/',
+                json.dumps({'sede': 'Sede Test', 'siglas': sorted(cargar_por_sigla())}),
+                content_type='application/json',
+            ).json()['horarios'][0]['asignaturas']
+        ids = [a['id'] for a in horario]
+        cuerpo = {'sede': 'Sede Test', 'secciones': ids, 'sigla': horario[0]['sigla'],
+                  'preferencias': PERFILES[1]}
+
+        def post(cuerpo):
+            return self.client.post('/api/generador/intercambiar/', json.dumps(cuerpo),
+                                    content_type='application/json')
+
+        respuesta = post(cuerpo)
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        alternativas = respuesta.json()['alternativas']
+        self.assertIn(ids[0], [a['id'] for a in alternativas])
+        puntuaciones = [a['puntuacion'] for a in alternativas]
+        self.assertEqual(puntuaciones, sorted(puntuaciones, reverse=True))
+
+        usuario = User.objects.create_user('estudiante', password='clave')
+        guardado = HorarioGuardado.objects.create(usuario=usuario, nombre='Mi horario')
+        guardado.asignaturas.add(*ids)
+        sin_sede = {'horario_id': guardado.id, 'sigla': cuerpo['sigla'], 'preferencias': PERFILES[1]}
+        self.assertEqual(post(sin_sede).status_code, 401)
+        self.client.force_login(usuario)
+        self.assertEqual(post(sin_sede).json(), respuesta.json())
+        self.assertEqual(post(dict(sin_sede, horario_id=guardado.id + 1)).status_code, 404)
+        self.assertEqual(post(dict(cuerpo, secciones=ids + [10 ** 6])).status_code, 400)
+        self.assertEqual(post([cuerpo]).status_code, 400)
+
+    def test_api_omite_secciones_eliminadas_despues_del_snapshot(self):
+        crear_oferta_modular(41, num_siglas=4)
+        with redirect_stdout(io.StringIO()):
+            horario = self.client.post(
+                '/api/generador/generar/',
+                json.dumps({'sede': 'Sede Test', 'siglas': sorted(cargar_por_sigla())}),
+                content_type='application/json',
+            ).json()['horarios'][0]['asignaturas']
+        ids = [a['id'] for a in horario]
+        cuerpo = {'sede': 'Sede Test', 'secciones': ids, 'sigla': horario[0]['sigla'],
+                  'preferencias': PERFILES[1]}
+
+        def post():
+            return self.client.post('/api/generador/intercambiar/', json.dumps(cuerpo),
+                                    content_type='application/json')
+
+        antes = [a['id'] for a in post().json()['alternativas']]
+        # La sección actual de la sigla también es alternativa: se la reemplaza
+        eliminada = ids[0]
+        self.assertIn(eliminada, antes)
+        # Sin publicar una versión nueva: el snapshot aún la tiene
+        with carga_masiva():
+            Asignatura.objects.filter(pk=eliminada).delete()
+        respuesta = post()
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual([a['id'] for a in respuesta.json()['alternativas']],
+                         [id_ for id_ in antes if id_ != eliminada])
+
+    def test_aplica_las_restricciones_de_la_generacion(self):
+        crear_oferta_modular(40, num_siglas=5)
+        restricciones = {'hora_fin_max': '18:00', 'max_dias': 4}
+        cuerpo = {'sede': 'Sede Test', 'siglas': sorted(cargar_por_sigla()), 'preferencias': PERFILES[2],
+                  'restricciones': restricciones}
+        with redirect_stdout(io.StringIO()):
+            generado = self.client.post('/api/generador/generar/', json.dumps(cuerpo),
+                                        content_type='application/json').json()['horarios'][0]
+        ids = [a['id'] for a in generado['asignaturas']]
+        normalizadas = normalizar_restricciones(restricciones)
+        snapshot = obtener_snapshot('Sede Test')
+        for asig in generado['asignaturas']:
+            alternativas, error = alternativas_para_sigla(snapshot, ids, asig['sigla'], PERFILES[2],
+                                                          restricciones=normalizadas)
+            self.assertIsNone(error)
+            # Mismo rango horario que la generación: la sección actual conserva su puntuación
+            actual = next(a for a in alternativas if a['seccion'].id == asig['id'])
+            self.assertAlmostEqual(actual['puntuacion'], generado['puntuacion'])
+            for alternativa in alternativas:
+                self.assertTrue(cumple_restricciones(alternativa['seccion'], normalizadas))
+                self.assertLessEqual(alternativa['metricas']['dias_usados'], 4)
+
+        respuesta = self.client.post('/api/generador/intercambiar/', json.dumps({
+            'sede': 'Sede Test', 'secciones': ids, 'sigla': generado['asignaturas'][0]['sigla'],
+            'restricciones': {'hora_fin_max': '25:00'},
+        }), content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class LotesTests(TestCase):
+    def setUp(self):
+        caches['generador'].clear()
+        cache_factibles.limpiar()
+        aislar_snapshots(self)
+
+    def solicitudes(self):
+        siglas = sorted(cargar_por_sigla())
+        return [
+            {'siglas': siglas[:4], 'preferencias': PERFILES[1], 'etiqueta': 'A'},
+            {'siglas': siglas[:4], 'preferencias': PERFILES[2]},
+            {'siglas': siglas[2:], 'preferencias': PERFILES[3], 'alternativas': True},
+            {'siglas': siglas[1:5], 'preferencias': PERFILES[4], 'restricciones': {'max_dias': 4}},
+            {'siglas': siglas[:2] + ['NOEXISTE'], 'preferencias': {}},
+        ]
+
+    def test_matriz_compartida_igual_a_la_propia(self):
+        crear_oferta(40, num_siglas=6, max_secciones=6)
+        snapshot = obtener_snapshot('Sede Test')
+        conflictos = ConflictosCompartidos(snapshot.por_sigla(snapshot.siglas))
+        for jornada in (None, 'Diurna'):
+            por_sigla = snapshot.por_sigla(snapshot.siglas[1:5], jornada)
+            propia = SolicitudCompilada(por_sigla)
+            compartida = SolicitudCompilada(por_sigla, conflictos=conflictos)
+            self.assertTrue((propia.matriz.matriz == compartida.matriz.matriz).all())
+            self.assertEqual(propia.matriz.compatibles, compartida.matriz.compatibles)
+
+    def test_igual_a_solicitudes_individuales(self):
+        crear_oferta_modular(41, num_siglas=6, max_secciones=6)
+        duplicar_secciones(41, max_copias=1)
+        solicitudes = self.solicitudes()
+        with redirect_stdout(io.StringIO()):
+            individuales = [generar_horarios_serializados(dict(s, sede='Sede Test')) for s in solicitudes]
+        procesos = (1, 2) if paralelo_disponible() else (1,)
+        for n in procesos:
+            caches['generador'].clear()
+            cache_factibles.limpiar()
+            with redirect_stdout(io.StringIO()):
+                resultados, estadisticas = generar_lote('Sede Test', solicitudes, procesos=n)
+            for resultado, (horarios, error) in zip(resultados, individuales):
+                if error:
+                    self.assertEqual(resultado, {'error': error})
+                else:
+                    self.assertEqual(resultado['horarios'], horarios)
+                    self.assertFalse(resultado['heuristico'])
+            self.assertEqual(resultados[0]['etiqueta'], 'A')
+            # Las dos primeras solo difieren en las preferencias: un solo cálculo
+            self.assertEqual(estadisticas['calculos'], len(solicitudes) - 1)
+            self.assertGreater(estadisticas['secciones_compartidas'], 0)
+        # Lo ya calculado sale de la caché
+        with redirect_stdout(io.StringIO()):
+            _, estadisticas = generar_lote('Sede Test', solicitudes[:4])
+        self.assertEqual((estadisticas['desde_cache'], estadisticas['calculos']), (4, 0))
+
+    def test_api_y_comando(self):
+        crear_oferta_modular(42, num_siglas=5)
+        cuerpo = json.dumps({'sede': 'Sede Test', 'solicitudes': self.solicitudes()[:2]})
+        anonimo = self.client.post('/api/generador/lote/', cuerpo, content_type='application/json')
+        self.assertEqual(anonimo.status_code, 403)
+
+        self.client.force_login(User.objects.create_user('coordinacion', password='clave', is_staff=True))
+        # La API solo encola: el lote lo calcula el proceso de la cola
+        encolado = self.client.post('/api/generador/lote/', cuerpo, content_type='application/json')
+        self.assertEqual(encolado.status_code, 202, encolado.content)
+        self.assertEqual(encolado.json()['estado'], TrabajoGeneracion.PENDIENTE)
+        repetido = self.client.post('/api/generador/lote/', cuerpo, content_type='application/json')
+        self.assertEqual((repetido.status_code, repetido.json()['id']), (200, encolado.json()['id']))
+        with redirect_stdout(io.StringIO()):
+            ejecutar_trabajo(tomar_siguiente_trabajo())
+            esperado, _ = generar_lote('Sede Test', self.solicitudes()[:2])
+        estado = self.client.get(encolado.json()['url']).json()
+        self.assertEqual(estado['estado'], TrabajoGeneracion.COMPLETADO)
+        self.assertEqual(estado['resultados'], json.loads(json.dumps(esperado)))
+        self.assertEqual(estado['estadisticas']['solicitudes'], 2)
+
+        invalido = self.client.post('/api/generador/lote/', json.dumps({'sede': 'Sede Test', 'solicitudes': []}),
+                                    content_type='application/json')
+        self.assertEqual(invalido.status_code, 400)
+        # En el peor caso tardaría más que el tope de un lote encolado
+        with override_settings(GENERADOR_PROCESOS=1):
+            demasiado = self.client.post('/api/generador/lote/', json.dumps({
+                'sede': 'Sede Test', 'solicitudes': self.solicitudes()[:1] * 10, 'tiempo_por_solicitud': 10,
+            }), content_type='application/json')
+        self.assertEqual(demasiado.status_code, 413)
+        self.assertEqual(TrabajoGeneracion.objects.count(), 1)
+
+        with tempfile.TemporaryDirectory() as directorio:
+            salida = Path(directorio) / 'lote.json'
+            call_command('generar_lote', sede='Sede Test', por_nivel=True, salida=str(salida),
+                         stdout=io.StringIO())
+            contenido = json.loads(salida.read_text(encoding='utf-8'))
+        # crear_oferta_modular: una carrera, un nivel y una jornada
+        self.assertEqual(len(contenido['resultados']), 1)
+        self.assertIn('horarios', contenido['resultados'][0])
+
+
+class ConteoCombinacionesTests(TestCase):
+    def setUp(self):
+        aislar_snapshots(self)
+
+    def test_igual_a_fuerza_bruta(self):
+        for semilla in range(6):
+            sede = f'Sede {semilla}'
+            (crear_oferta if semilla % 2 else crear_oferta_modular)(semilla, 5, 5, sede=sede)
+            duplicar_secciones(semilla, sede=sede)
+            por_sigla = cargar_por_sigla(sede)
+            self.assertEqual(contar_por_sigla(por_sigla), len(combinaciones_referencia(por_sigla, {})))
+
+            todas = {}
+            generar(por_sigla, {}, max_resultados=0, poda_cota=False, estadisticas=todas, max_dias=3)
+            self.assertEqual(contar_por_sigla(por_sigla, max_dias=3), todas['validas'])
+
+    def test_clases_y_presupuesto(self):
+        crear_oferta_modular(40, num_siglas=7, max_secciones=6)
+        duplicar_secciones(40, max_copias=1)
+        solicitud = SolicitudCompilada(cargar_por_sigla())
+        self.assertEqual(contar_combinaciones(solicitud, concretas=False),
+                         contar_pares(preparar_mitades(solicitud)))
+        self.assertIsNone(contar_combinaciones(solicitud, presupuesto=10))
+
+    def test_api(self):
+        crear_oferta_modular(41, num_siglas=4)
+        por_sigla = cargar_por_sigla()
+
+        def post(cuerpo):
+            return self.client.post('/api/generador/contar/', json.dumps(cuerpo), content_type='application/json')
+
+        cuerpo = {'sede': 'Sede Test', 'siglas': sorted(por_sigla)}
+        respuesta = post(cuerpo)
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(respuesta.json()['combinaciones'], len(combinaciones_referencia(por_sigla, {})))
+        self.assertEqual(post(dict(cuerpo, siglas=cuerpo['siglas'] + ['NOEXISTE']))
+                         .json()['combinaciones'], 0)
+        self.assertEqual(post(dict(cuerpo, siglas=[])).status_code, 400)
+        self.assertEqual(post({'siglas': cuerpo['siglas']}).status_code, 400)
+
+
+class SnapshotOfertaTests(TestCase):
+    def test_dos_consultas_y_mismos_resultados(self):
+        crear_oferta(19, num_siglas=5, max_secciones=5)
+        por_sigla_modelos = cargar_por_sigla()
+        with self.assertNumQueries(2):
+            snapshot = cargar_snapshot('Sede Test')
+        por_sigla = snapshot.por_sigla(sorted(por_sigla_modelos))
+        self.assertEqual(
+            {sigla: [s.id for s in secciones] for sigla, secciones in por_sigla.items()},
+            {sigla: [a.id for a in secciones] for sigla, secciones in por_sigla_modelos.items()},
+        )
+        for perfil in PERFILES:
+            esperado = generar(por_sigla_modelos, dict(perfil), max_resultados=5)
+            obtenido = generar(por_sigla, dict(perfil), max_resultados=5)
+            self.assertEqual(json.dumps([[r['puntuacion'], r['metricas']] for r in esperado]),
+                             json.dumps([[r['puntuacion'], r['metricas']] for r in obtenido]))
+            self.assertEqual([[a.id for a in r['asignaturas']] for r in esperado],
+                             [[s.id for s in r['asignaturas']] for r in obtenido])
+
+    def test_filtro_por_jornada(self):
+        crear_oferta(20, num_siglas=4)
+        snapshot = cargar_snapshot('Sede Test')
+        for jornada in ('Diurna', 'Vespertina'):
+            esperado = {
+                a.id for a in Asignatura.objects.filter(sede='Sede Test', jornada=jornada)
+            }
+            obtenido = {
+                s.id for secciones in snapshot.por_sigla(snapshot.siglas, jornada).values()
+                for s in secciones
+            }
+            self.assertEqual(obtenido, esperado)
+        self.assertEqual(snapshot.por_sigla(['TST000'], 'Nocturna'), {})
+
+    def test_archivo_mapeado_igual_al_de_la_base(self):
+        aislar_snapshots(self)
+        crear_oferta(21, num_siglas=5, max_secciones=5)
+        en_memoria = cargar_snapshot('Sede Test')
+        mapeado = abrir_snapshot(publicar_snapshot('Sede Test'))
+        self.assertIsNotNone(mapeado.origen)
+        self.assertEqual(len(mapeado), len(en_memoria))
+        for jornada in (None, 'Diurna', 'Vespertina'):
+            self.assertEqual(
+                {sigla: [(s.id, s.jornada, s.virtual, s.bloques) for s in secciones]
+                 for sigla, secciones in mapeado.por_sigla(en_memoria.siglas, jornada).items()},
+                {sigla: [(s.id, s.jornada, s.virtual, s.bloques) for s in secciones]
+                 for sigla, secciones in en_memoria.por_sigla(en_memoria.siglas, jornada).items()},
+            )
+
+    def test_edicion_posterior_a_publicar_se_ve(self):
+        directorio = aislar_snapshots(self)
+        with carga_masiva():
+            crear_oferta_modular(25, num_siglas=3)
+        anterior = obtener_snapshot('Sede Test')
+        horario = Horario.objects.filter(asignatura__sede='Sede Test').order_by('id').first()
+        horario.dia = 'Sa'
+        with self.captureOnCommitCallbacks(execute=True):
+            horario.save()
+
+        version = VersionOferta.actual('Sede Test')
+        self.assertEqual([p.name for p in directorio.iterdir()], [f'{nombre_base("Sede Test")}.v{version}.bin'])
+        actual = obtener_snapshot('Sede Test')
+        self.assertEqual(actual.version, version)
+        self.assertNotEqual(actual.version, anterior.version)
+        bloques = {s.id: s.bloques for secciones in actual.por_sigla(actual.siglas).values() for s in secciones}
+        self.assertIn('Sa', {dia for dia, _, _ in bloques[horario.asignatura_id]})
+
+    def test_secciones_eliminadas_se_descartan(self):
+        crear_oferta_modular(24, num_siglas=3)
+        por_sigla = cargar_snapshot('Sede Test').por_sigla(sorted(cargar_por_sigla()))
+        generados = generar(por_sigla, {}, max_resultados=5, alternativas=True)
+        eliminada = generados[0]['asignaturas'][0].id
+        Asignatura.objects.filter(pk=eliminada).delete()
+        horarios = con_modelos(generados)
+        self.assertEqual(len(horarios), len([g for g in generados
+                                             if eliminada not in {s.id for s in g['asignaturas']}]))
+        self.assertNotIn(eliminada, {a.id for h in horarios for a in h['asignaturas']})
+        self.assertNotIn(eliminada, {a.id for h in horarios for otras in h['alternativas'] for a in otras})
+
+    def test_nueva_version_reemplaza_el_archivo(self):
+        directorio = aislar_snapshots(self)
+        with carga_masiva():
+            crear_oferta(22, num_siglas=3)
+        anterior = obtener_snapshot('Sede Test')
+        self.assertEqual([p.name for p in directorio.iterdir()], [f'{nombre_base("Sede Test")}.v0.bin'])
+
+        with carga_masiva():
+            Asignatura.objects.filter(sede='Sede Test').delete()
+            crear_oferta(23, num_siglas=2)
+        VersionOferta.incrementar('Sede Test')
+        limpiar_snapshots()  # otro proceso: no tiene nada abierto
+        actual = obtener_snapshot('Sede Test')
+        self.assertEqual(actual.version, 1)
+        self.assertEqual([p.name for p in directorio.iterdir()], [f'{nombre_base("Sede Test")}.v1.bin'])
+        self.assertEqual(len(actual), Asignatura.objects.filter(sede='Sede Test').count())
+        # El proceso que tenía mapeada la versión anterior la sigue leyendo
+        self.assertTrue(anterior.por_sigla(anterior.siglas))
@@ -17,9 +17,20 @@ from .horarios_guardados import (
 
 from .generador import (
     api_asignaturas_generador,
-    api_generar_horarios
+    api_generar_horarios,
+    api_generar_horarios_stream,
+    api_intercambiar_seccion,
+    api_contar_combinaciones,
+    api_estadisticas_cache_generador
 )
 
+from .trabajos import (
+    api_crear_trabajo_generacion,
+    api_estado_trabajo_generacion
+)
+
+from .lotes import api_generar_lote
+
 from .auth import registro
 
 __all__ = [
@@ -37,6 +48,13 @@ __all__ = [
     'generador_horarios',
     'api_asignaturas_generador',
     'api_generar_horarios',
+    'api_generar_horarios_stream',
+    'api_intercambiar_seccion',
+    'api_contar_combinaciones',
+    'api_estadisticas_cache_generador',
+    'api_crear_trabajo_generacion',
+    'api_estado_trabajo_generacion',
+    'api_generar_lote',
     
     # Autenticación
     'registro',
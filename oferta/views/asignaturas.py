@@ -4,6 +4,7 @@ Vistas relacionadas con la gestión de asignaturas
 """
 
 from datetime import datetime
+from functools import partial
 import pandas as pd
 
 from django.db import transaction
@@ -13,7 +14,9 @@ from django.shortcuts import render, redirect
 from django.urls import reverse
 
 from ..forms import ExcelUploadForm
-from ..models import Asignatura, Horario
+from ..models import Asignatura, Horario, VersionOferta
+from ..signals import carga_masiva
+from .generador_snapshot import publicar_snapshot
 
 
 def seleccionar_sede(request):
@@ -58,7 +61,13 @@ def cargar_excel(request):
 
                 # --- Eliminar datos antiguos ---
                 print(f"Eliminando datos antiguos de la sede: {sede_a_cargar}")
-                Asignatura.objects.filter(sede=sede_a_cargar).delete()
+                with carga_masiva():
+                    Asignatura.objects.filter(sede=sede_a_cargar).delete()
+
+                # Nueva versión de la oferta: invalida los resultados cacheados del generador
+                VersionOferta.incrementar(sede_a_cargar)
+                # Tras el commit se publica el snapshot binario de la nueva versión
+                transaction.on_commit(partial(publicar_snapshot, sede_a_cargar), robust=True)
 
                 # --- Crear asignaturas ---
                 agrupadas = df.groupby('Sección')
@@ -124,7 +133,8 @@ def cargar_excel(request):
 
             except Exception as e:
                 mensaje_error = f"Error al procesar el archivo: {e}"
-                Asignatura.objects.filter(sede=sede_a_cargar).delete()
+                with carga_masiva():
+                    Asignatura.objects.filter(sede=sede_a_cargar).delete()
                 print(f"Error: {e}")
 
     else:
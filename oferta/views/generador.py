@@ -4,18 +4,63 @@ Vistas del generador automático de horarios
 """
 
 import json
+import time
 from collections import defaultdict
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 
-from ..models import Asignatura
+from ..models import Asignatura, HorarioGuardado
+from .generador_cache import (
+    clave_factibles, clave_resultados, estadisticas_cache, guardar_resultados, obtener_resultados
+)
+from .generador_conteo import contar_por_sigla
+from .generador_diagnostico import diagnosticar_conflicto, mensaje_conflicto, siglas_en_conflicto
+from .generador_factibles import cache_factibles, conjunto_factible_acotado
+from .generador_intercambio import alternativas_para_sigla
+from .generador_mitades import MOTORES
+from .generador_multiperfil import generar_combinaciones_multiperfil
+from .generador_restricciones import filtrar_secciones, normalizar_restricciones
+from .generador_snapshot import con_modelos, obtener_snapshot
 from .generador_utils import (
-    generar_combinaciones_optimizado,    calcular_puntuacion_normalizada
+    MAX_TIEMPO_GENERACION,
+    SolicitudCompilada,
+    generar_combinaciones_optimizado,    calcular_puntuacion_normalizada,
+    iterar_combinaciones
+)
+
+# Segundos mínimos entre avances del endpoint de streaming
+INTERVALO_STREAM = 0.3
+
+# Perfiles de preferencias que se pueden comparar en una solicitud
+MAX_PERFILES = 6
+
+MENSAJE_SIN_COMBINACIONES = (
+    'No se encontraron combinaciones válidas sin solapamientos. '
+    'Intenta con otra jornada o menos asignaturas.'
 )
 
+
+class SinCombinaciones(str):
+    """
+    Mensaje de error de una solicitud válida que no tiene combinaciones: la
+    API responde 404, igual que cuando la búsqueda no encuentra ninguna.
+    """
+
+
+def estado_de_error(error):
+    """Código HTTP de un error de `cargar_solicitud_generacion` o `calcular_rankings`."""
+    return 404 if isinstance(error, SinCombinaciones) else 400
+
+
+def sin_combinaciones(solicitud, max_dias):
+    """`SinCombinaciones` de una solicitud cuya búsqueda completa no encontró ninguna."""
+    return SinCombinaciones(mensaje_conflicto(siglas_en_conflicto(solicitud, max_dias), max_dias))
+
+
 @require_http_methods(["GET"])
 def api_asignaturas_generador(request):
     """
@@ -68,91 +113,560 @@ def api_asignaturas_generador(request):
     
     return JsonResponse({'asignaturas': result})
 
-@require_http_methods(["POST"])
-def api_generar_horarios(request):
+def validar_solicitud_generacion(data):
     """
-    Genera combinaciones de horarios óptimas usando backtracking
+    Valida la forma del cuerpo de una solicitud de generación, sin cargar la
+    oferta. Retorna (restricciones normalizadas, error); si hay error, es el
+    mensaje a mostrar y las restricciones son None.
     """
+    if not isinstance(data, dict):
+        return None, 'Datos inválidos'
+
+    siglas_seleccionadas = data.get('siglas', [])
+    preferencias = data.get('preferencias', {})
+
+    if not data.get('sede'):
+        return None, 'La sede es requerida'
+
+    if not siglas_seleccionadas:
+        return None, 'Debes seleccionar al menos una asignatura'
+
+    if not isinstance(siglas_seleccionadas, list) or not all(isinstance(s, str) for s in siglas_seleccionadas):
+        return None, "'siglas' debe ser una lista de siglas"
+
+    if not isinstance(preferencias, dict):
+        return None, "'preferencias' debe ser un objeto"
+
+    if data.get('motor', 'auto') not in MOTORES:
+        return None, f"'motor' debe ser uno de: {', '.join(MOTORES)}"
+
     try:
-        data = json.loads(request.body)
-        siglas_seleccionadas = data.get('siglas', [])
-        preferencias = data.get('preferencias', {})
-        sede = data.get('sede')
-        jornada = data.get('jornada')
+        return normalizar_restricciones(data.get('restricciones')), None
+    except ValueError as e:
+        return None, str(e)
 
-        if not sede:
-            return JsonResponse({'error': 'La sede es requerida'}, status=400)
-            
-        if not siglas_seleccionadas:
-            return JsonResponse({'error': 'Debes seleccionar al menos una asignatura'}, status=400)
-        
-        # Consulta base
-        asignaturas_query = Asignatura.objects.filter(
-            sigla__in=siglas_seleccionadas,
-            sede=sede
+
+def cargar_solicitud_generacion(data, snapshot=None, conflictos=None):
+    """
+    Valida el cuerpo de una solicitud de generación y carga sus secciones
+    (registros `SeccionOferta` del snapshot de la sede), sin las que violan
+    las restricciones duras. Retorna (por_sigla, preferencias, restricciones,
+    solicitud, error); si hay error, es el mensaje a mostrar y los otros
+    valores son None.
+
+    `solicitud` es la `SolicitudCompilada` de `por_sigla`, con su matriz de
+    conflictos: se compila una sola vez y la usan el diagnóstico, el conjunto
+    factible y la búsqueda. Si las siglas no se pueden combinar, el error es
+    un `SinCombinaciones` que nombra un conjunto mínimo de ellas (ver
+    `generador_diagnostico`).
+
+    Un lote de solicitudes (ver `lotes`) entrega el `snapshot` de la sede ya
+    abierto y su matriz de `conflictos` compartida.
+    """
+    restricciones, error = validar_solicitud_generacion(data)
+    if error:
+        return None, None, None, None, error
+    siglas_seleccionadas = data['siglas']
+    preferencias = data.get('preferencias', {})
+    sede = data['sede']
+    jornada = data.get('jornada')
+
+    # Secciones desde el snapshot compilado de la sede (sin instancias de modelo)
+    if snapshot is None:
+        snapshot = obtener_snapshot(sede)
+    por_sigla = snapshot.por_sigla(siglas_seleccionadas, jornada)
+
+    # Verificar que existan secciones
+    for sigla in siglas_seleccionadas:
+        if sigla not in por_sigla:
+            error_msg = f'No se encontraron secciones para {sigla} en la sede seleccionada'
+            if jornada:
+                error_msg += f' y jornada {jornada}'
+            return None, None, None, None, error_msg
+
+    por_sigla, sin_secciones = filtrar_secciones(por_sigla, restricciones)
+    if sin_secciones:
+        return None, None, None, None, (
+            f'Ninguna sección de {", ".join(sorted(sin_secciones))} cumple las restricciones indicadas'
         )
 
-        if jornada:
-            asignaturas_query = asignaturas_query.filter(jornada=jornada)
+    solicitud = SolicitudCompilada(por_sigla, conflictos=conflictos)
+    conflicto = diagnosticar_conflicto(por_sigla, max_dias=restricciones['max_dias'], solicitud=solicitud)
+    if conflicto:
+        return None, None, None, None, SinCombinaciones(mensaje_conflicto(conflicto, restricciones['max_dias']))
 
-        asignaturas = asignaturas_query.prefetch_related('horarios')
-        
-        # Agrupar por sigla
-        por_sigla = defaultdict(list)
-        for asig in asignaturas:
-            por_sigla[asig.sigla].append(asig)
-        
-        # Verificar que existan secciones
-        for sigla in siglas_seleccionadas:
-            if sigla not in por_sigla:
-                error_msg = f'No se encontraron secciones para {sigla} en la sede seleccionada'
-                if jornada:
-                    error_msg += f' y jornada {jornada}'
-                return JsonResponse({'error': error_msg}, status=400)
-        
-        # Generar combinaciones (OPTIMIZADO - Explora todas las opciones)
-        horarios_generados = generar_combinaciones_optimizado(
-            por_sigla, 
-            preferencias,
-            max_resultados=10  # Mostramos las 10 mejores
+    return por_sigla, preferencias, restricciones, solicitud, None
+
+
+def serializar_horarios(horarios_generados):
+    """
+    Convierte los horarios del generador al formato JSON de la API. Si traen
+    'alternativas', cada asignatura lista las secciones intercambiables (mismo
+    horario, otra sección o docente). Los de la búsqueda heurística conservan
+    'heuristico': True.
+    """
+    resultados = []
+    for horario in horarios_generados:
+        asignaturas_data = []
+        for j, asig in enumerate(horario['asignaturas']):
+            asignaturas_data.append({
+                'id': asig.id,
+                'sigla': asig.sigla,
+                'nombre': asig.nombre,
+                'seccion': asig.seccion,
+                'docente': asig.docente,
+                'virtual': asig.virtual_sincronica == 'True',
+                'horarios': [{
+                    'dia': h.dia,
+                    'inicio': h.hora_inicio.strftime('%H:%M'),
+                    'fin': h.hora_fin.strftime('%H:%M')
+                } for h in asig.horarios.all()]
+            })
+            if 'alternativas' in horario:
+                asignaturas_data[-1]['alternativas'] = [
+                    {'id': otra.id, 'seccion': otra.seccion, 'docente': otra.docente}
+                    for otra in horario['alternativas'][j]
+                ]
+
+        resultados.append({
+            'asignaturas': asignaturas_data,
+            'puntuacion': horario['puntuacion'],
+            'metricas': horario['metricas']
+        })
+        if horario.get('heuristico'):
+            resultados[-1]['heuristico'] = True
+    return resultados
+
+
+def son_heuristicos(horarios):
+    """Indica si los horarios serializados vienen de la búsqueda heurística."""
+    return any(horario.get('heuristico') for horario in horarios)
+
+
+def generar_horarios_serializados(data):
+    """
+    Horarios serializados de una solicitud: desde la caché de resultados si
+    están, o ejecutando la búsqueda (y cacheándolos si no hubo timeout).
+    Retorna (horarios, error); una lista vacía significa sin combinaciones.
+
+    Si solo cambiaron las preferencias respecto de una solicitud anterior, se
+    re-puntúa el conjunto factible cacheado en vez de buscar de nuevo. Con
+    'alternativas' en la solicitud, cada horario es distinto y lista las
+    secciones intercambiables de cada asignatura. 'motor' elige el motor de
+    búsqueda cuando el conjunto factible es demasiado grande; los resultados
+    heurísticos no se cachean, porque dependen del tiempo disponible.
+    """
+    rankings, error = generar_rankings_serializados(data, [data.get('preferencias', {})])
+    if error:
+        return None, error
+    return rankings[0], None
+
+
+def generar_rankings_serializados(data, perfiles):
+    """
+    Como `generar_horarios_serializados`, para varios perfiles de preferencias
+    sobre la misma oferta. Retorna (lista de horarios por perfil, error).
+
+    Cada perfil se cachea con la misma clave que una solicitud con esas
+    preferencias. Los que ya están en la caché no se recalculan. Los demás
+    salen del conjunto factible o, si es demasiado grande, de una sola
+    búsqueda que puntúa cada combinación con todos ellos (ver
+    `generador_multiperfil`).
+    """
+    claves = [clave_resultados(dict(data, preferencias=perfil)) for perfil in perfiles]
+    rankings = [obtener_resultados(clave) for clave in claves]
+    faltantes = [i for i, horarios in enumerate(rankings) if horarios is None]
+    if not faltantes:
+        return rankings, None
+
+    perfiles_faltantes = [perfiles[i] for i in faltantes]
+    clave_conjunto = clave_factibles(data)
+    conjunto = cache_factibles.obtener(clave_conjunto)
+    generados, timeout = None, False
+    if conjunto is None:
+        conjunto, generados, timeout, error = calcular_rankings(
+            data, perfiles_faltantes, procesos=settings.GENERADOR_PROCESOS
         )
-        
-        if not horarios_generados:
+        if error:
+            return None, error
+        if conjunto is not None:
+            cache_factibles.guardar(clave_conjunto, conjunto)
+
+    for i, horarios in zip(faltantes, serializar_rankings(data, perfiles_faltantes, conjunto, generados)):
+        rankings[i] = horarios
+        if not timeout:
+            guardar_resultados(claves[i], horarios)
+    return rankings, None
+
+
+def calcular_rankings(data, perfiles, snapshot=None, conflictos=None, procesos=1,
+                      max_tiempo=MAX_TIEMPO_GENERACION):
+    """
+    La parte de `generar_rankings_serializados` que no usa la base de datos
+    ni las cachés (así puede correr en un proceso aparte, ver `lotes`):
+    valida y carga la solicitud y calcula su conjunto factible o, si es
+    demasiado grande o no se alcanza a enumerar, busca las mejores
+    combinaciones de cada perfil, todo dentro de `max_tiempo` segundos.
+
+    Retorna (conjunto, generados, timeout, error): con un conjunto factible,
+    `generados` es None; si no, son los horarios de cada perfil con registros
+    del snapshot. `timeout` indica que el resultado no es completo y no debe
+    cachearse. Si la búsqueda completa no encuentra combinaciones, el error
+    es un `SinCombinaciones` con las siglas que chocan.
+    """
+    tiempo_inicio = time.time()
+    por_sigla, _, restricciones, solicitud, error = cargar_solicitud_generacion(data, snapshot, conflictos)
+    if error:
+        return None, None, False, error
+
+    max_dias = restricciones['max_dias']
+    conjunto = conjunto_factible_acotado(por_sigla, max_dias=max_dias, max_tiempo=max_tiempo, solicitud=solicitud)
+    if conjunto is not None:
+        if not len(conjunto):
+            return None, None, False, sin_combinaciones(solicitud, max_dias)
+        return conjunto, None, False, None
+
+    # Conjunto demasiado grande: búsqueda con branch-and-bound
+    restante = max(0.0, max_tiempo - (time.time() - tiempo_inicio))
+    alternativas = bool(data.get('alternativas'))
+    estadisticas = {}
+    if len(perfiles) == 1:
+        generados = [generar_combinaciones_optimizado(
+            por_sigla,
+            dict(perfiles[0]),
+            max_resultados=10,  # Mostramos las 10 mejores
+            estadisticas=estadisticas,
+            procesos=procesos,
+            alternativas=alternativas,
+            max_dias=max_dias,
+            motor=data.get('motor', 'auto'),
+            max_tiempo=restante,
+            solicitud=solicitud
+        )]
+        timeout = estadisticas['timeout'] or estadisticas['heuristico']
+    else:
+        generados = generar_combinaciones_multiperfil(
+            por_sigla, [dict(perfil) for perfil in perfiles], max_resultados=10, estadisticas=estadisticas,
+            alternativas=alternativas, max_dias=max_dias, max_tiempo=restante, solicitud=solicitud
+        )
+        timeout = estadisticas['timeout']
+    if not timeout and not any(generados):
+        return None, None, False, sin_combinaciones(solicitud, max_dias)
+    return None, generados, timeout, None
+
+
+def serializar_rankings(data, perfiles, conjunto, generados):
+    """
+    Horarios serializados de cada perfil, desde el `conjunto` factible o, si
+    es None, desde los `generados` por `calcular_rankings`.
+    """
+    if conjunto is not None:
+        alternativas = bool(data.get('alternativas'))
+        generados = [
+            conjunto.mejores(dict(perfil), max_resultados=10, alternativas=alternativas) for perfil in perfiles
+        ]
+    else:
+        generados = [con_modelos(horarios_generados) for horarios_generados in generados]
+    return [serializar_horarios(horarios_generados) for horarios_generados in generados]
+
+
+def perfiles_de_solicitud(data):
+    """
+    Perfiles de preferencias de `data['perfiles']`. Retorna (perfiles, error);
+    si no es una lista de entre 1 y MAX_PERFILES objetos, el error es el
+    mensaje a mostrar.
+    """
+    perfiles = data.get('perfiles')
+    if not isinstance(perfiles, list) or not perfiles or not all(isinstance(p, dict) for p in perfiles):
+        return None, "'perfiles' debe ser una lista de objetos de preferencias"
+    if len(perfiles) > MAX_PERFILES:
+        return None, f'Se pueden comparar hasta {MAX_PERFILES} perfiles a la vez'
+    return perfiles, None
+
+
+@require_http_methods(["POST"])
+def api_generar_horarios(request):
+    """
+    Genera combinaciones de horarios óptimas usando backtracking.
+
+    Con 'perfiles' (lista de objetos como 'preferencias') en vez de
+    'preferencias', responde {'perfiles': [{'preferencias', 'horarios',
+    'heuristico'}, ...]} con un ranking por perfil, calculados en una sola
+    búsqueda.
+    """
+    try:
+        data = json.loads(request.body)
+        if 'perfiles' in data:
+            return respuesta_multiperfil(data)
+        horarios, error = generar_horarios_serializados(data)
+        if error:
+            return JsonResponse({'error': error}, status=estado_de_error(error))
+
+        if not horarios:
             return JsonResponse({
-                'error': 'No se encontraron combinaciones válidas sin solapamientos. Intenta con otra jornada o menos asignaturas.'
+                'error': MENSAJE_SIN_COMBINACIONES
             }, status=404)
         
-        # Serializar resultados
-        resultados = []
-        for horario in horarios_generados:
-            asignaturas_data = []
-            for asig in horario['asignaturas']:
-                asignaturas_data.append({
-                    'id': asig.id,
-                    'sigla': asig.sigla,
-                    'nombre': asig.nombre,
-                    'seccion': asig.seccion,
-                    'docente': asig.docente,
-                    'virtual': asig.virtual_sincronica == 'True',
-                    'horarios': [{
-                        'dia': h.dia,
-                        'inicio': h.hora_inicio.strftime('%H:%M'),
-                        'fin': h.hora_fin.strftime('%H:%M')
-                    } for h in asig.horarios.all()]
-                })
-            
-            resultados.append({
-                'asignaturas': asignaturas_data,
-                'puntuacion': horario['puntuacion'],
-                'metricas': horario['metricas']
-            })
-        
         return JsonResponse({
             'success': True,
-            'horarios': resultados
+            'horarios': horarios,
+            'heuristico': son_heuristicos(horarios)
         })
         
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Datos inválidos'}, status=400)
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+def respuesta_multiperfil(data):
+    perfiles, error = perfiles_de_solicitud(data)
+    if not error:
+        rankings, error = generar_rankings_serializados(data, perfiles)
+    if error:
+        return JsonResponse({'error': error}, status=estado_de_error(error))
+    if not any(rankings):
+        return JsonResponse({'error': MENSAJE_SIN_COMBINACIONES}, status=404)
+    return JsonResponse({'success': True, 'perfiles': perfiles_serializados(perfiles, rankings)})
+
+
+def perfiles_serializados(perfiles, rankings):
+    """Cada perfil con su ranking, como en la respuesta de `respuesta_multiperfil`."""
+    return [
+        {'preferencias': perfil, 'horarios': horarios, 'heuristico': son_heuristicos(horarios)}
+        for perfil, horarios in zip(perfiles, rankings)
+    ]
+
+
+@require_http_methods(["POST"])
+def api_generar_horarios_stream(request):
+    """
+    Igual que `api_generar_horarios`, pero entrega resultados parciales a
+    medida que la búsqueda avanza, en NDJSON (un objeto JSON por línea):
+
+    - {"tipo": "avance", "horarios": [...], "progreso": {...}} cada
+      INTERVALO_STREAM segundos como máximo, con el top actual.
+    - {"tipo": "final", ...} con el ranking definitivo, o
+      {"tipo": "error", "error": ...} si no hay combinaciones válidas.
+
+    'progreso' indica con 'heuristico' si los horarios vienen de la búsqueda
+    heurística.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Datos inválidos'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Datos inválidos'}, status=400)
+
+    por_sigla, preferencias, restricciones, solicitud, error = cargar_solicitud_generacion(data)
+    if error:
+        return JsonResponse({'error': error}, status=estado_de_error(error))
+
+    clave = clave_resultados(data)
+    cacheados = obtener_resultados(clave)
+    if cacheados is None:
+        # Solo cambiaron las preferencias: se re-puntúa el conjunto factible cacheado
+        conjunto = cache_factibles.obtener(clave_factibles(data))
+        if conjunto is not None:
+            cacheados = serializar_rankings(data, [preferencias], conjunto, None)[0]
+            guardar_resultados(clave, cacheados)
+
+    def final(horarios, progreso):
+        if not horarios:
+            if progreso['timeout'] or progreso['heuristico']:
+                error = MENSAJE_SIN_COMBINACIONES
+            else:
+                error = sin_combinaciones(solicitud, restricciones['max_dias'])
+            return json.dumps({'tipo': 'error', 'error': error}) + '\n'
+        return json.dumps({'tipo': 'final', 'horarios': horarios, 'progreso': progreso}) + '\n'
+
+    def lineas():
+        if cacheados is not None:
+            yield final(cacheados, {'exploradas': 0, 'validas': 0, 'tiempo': 0, 'timeout': False,
+                                    'heuristico': False, 'cache': True})
+            return
+
+        ultimo_envio = None
+        try:
+            for avance in iterar_combinaciones(por_sigla, preferencias, max_resultados=10,
+                                               intervalo=INTERVALO_STREAM,
+                                               alternativas=bool(data.get('alternativas')),
+                                               max_dias=restricciones['max_dias'],
+                                               motor=data.get('motor', 'auto'),
+                                               solicitud=solicitud):
+                estadisticas = avance['estadisticas']
+                progreso = {
+                    'exploradas': estadisticas['exploradas'],
+                    'validas': estadisticas['validas'],
+                    'tiempo': round(estadisticas['tiempo'], 2),
+                    'timeout': estadisticas['timeout'],
+                    'heuristico': estadisticas['heuristico'],
+                }
+                if avance['final']:
+                    horarios = serializar_horarios(con_modelos(avance['horarios']))
+                    if not estadisticas['timeout'] and not estadisticas['heuristico']:
+                        guardar_resultados(clave, horarios)
+                    yield final(horarios, progreso)
+                    return
+
+                # Limitar la frecuencia de envío: las mejoras se acumulan hasta el siguiente
+                if ultimo_envio is not None and estadisticas['tiempo'] - ultimo_envio < INTERVALO_STREAM:
+                    continue
+                ultimo_envio = estadisticas['tiempo']
+                yield json.dumps({
+                    'tipo': 'avance',
+                    'horarios': serializar_horarios(con_modelos(avance['horarios'])),
+                    'progreso': progreso,
+                }) + '\n'
+        except Exception as e:
+            yield json.dumps({'tipo': 'error', 'error': str(e)}) + '\n'
+
+    response = StreamingHttpResponse(lineas(), content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Evitar que un proxy acumule la respuesta
+    return response
+
+
+def secciones_fijas_de_solicitud(request, data):
+    """
+    (ids de las secciones fijas, sede, error) de una solicitud de intercambio:
+    'secciones' (lista de ids) o 'horario_id', un horario guardado del
+    usuario. Si hay error, es un par (mensaje, status).
+    """
+    sede = data.get('sede')
+    if 'horario_id' in data:
+        if not request.user.is_authenticated:
+            return None, None, ('Debes iniciar sesión para usar un horario guardado', 401)
+        try:
+            horario = HorarioGuardado.objects.get(id=data['horario_id'], usuario=request.user)
+        except (HorarioGuardado.DoesNotExist, ValueError, TypeError):
+            return None, None, ('Horario no encontrado', 404)
+        asignaturas = list(horario.asignaturas.values_list('id', 'sede'))
+        ids = [id_seccion for id_seccion, _ in asignaturas]
+        if not sede and asignaturas:
+            sede = asignaturas[0][1]
+    else:
+        ids = data.get('secciones')
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return None, None, ("'secciones' debe ser una lista de ids de sección", 400)
+
+    if not sede:
+        return None, None, ('La sede es requerida', 400)
+    return ids, sede, None
+
+
+@require_http_methods(["POST"])
+def api_intercambiar_seccion(request):
+    """
+    Secciones de 'sigla' que caben en un horario ya armado, ordenadas por la
+    puntuación del horario resultante con 'preferencias'. El horario son las
+    secciones fijas ('secciones' o 'horario_id'); las de 'sigla' que haya
+    entre ellas son las que se reemplazan. Acepta las mismas 'restricciones'
+    que la generación. No ejecuta la búsqueda, solo prueba cada sección contra
+    las fijas (ver `generador_intercambio`).
+    """
+    try:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            return JsonResponse({'error': 'Datos inválidos'}, status=400)
+        sigla = data.get('sigla')
+        if not sigla:
+            return JsonResponse({'error': 'La sigla es requerida'}, status=400)
+
+        preferencias = data.get('preferencias', {})
+        if not isinstance(preferencias, dict):
+            return JsonResponse({'error': "'preferencias' debe ser un objeto"}, status=400)
+        try:
+            restricciones = normalizar_restricciones(data.get('restricciones'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        ids, sede, error = secciones_fijas_de_solicitud(request, data)
+        if error:
+            mensaje, status = error
+            return JsonResponse({'error': mensaje}, status=status)
+
+        alternativas, error = alternativas_para_sigla(
+            obtener_snapshot(sede), ids, sigla, preferencias, jornada=data.get('jornada'),
+            restricciones=restricciones,
+        )
+        if error:
+            return JsonResponse({'error': error}, status=400)
+
+        modelos = Asignatura.objects.prefetch_related('horarios').in_bulk(
+            [alternativa['seccion'].id for alternativa in alternativas]
+        )
+        resultados = []
+        for alternativa in alternativas:
+            asig = modelos.get(alternativa['seccion'].id)
+            if asig is None:
+                # Eliminada después de armar el snapshot (ver `con_modelos`)
+                continue
+            resultados.append({
+                'id': asig.id,
+                'seccion': asig.seccion,
+                'docente': asig.docente,
+                'virtual': asig.virtual_sincronica == 'True',
+                'horarios': [{
+                    'dia': h.dia,
+                    'inicio': h.hora_inicio.strftime('%H:%M'),
+                    'fin': h.hora_fin.strftime('%H:%M')
+                } for h in asig.horarios.all()],
+                'puntuacion': alternativa['puntuacion'],
+                'metricas': alternativa['metricas']
+            })
+
+        return JsonResponse({'success': True, 'sigla': sigla, 'alternativas': resultados})
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Datos inválidos'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["POST"])
+def api_contar_combinaciones(request):
+    """
+    Cantidad exacta de horarios sin choques que admiten 'siglas' (con
+    'jornada' y 'restricciones', como en la generación), sin generarlos: la
+    vista previa "N horarios posibles" del generador. Responde
+    {'combinaciones': N}, con N = null si la solicitud es demasiado grande
+    para contarla rápido (ver `generador_conteo`).
+    """
+    try:
+        data = json.loads(request.body)
+        siglas = data.get('siglas', [])
+        if not data.get('sede'):
+            return JsonResponse({'error': 'La sede es requerida'}, status=400)
+        if not siglas:
+            return JsonResponse({'error': 'Debes seleccionar al menos una asignatura'}, status=400)
+        try:
+            restricciones = normalizar_restricciones(data.get('restricciones'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        # Una sigla sin secciones (o sin ninguna que cumpla las restricciones) deja 0 horarios
+        por_sigla = obtener_snapshot(data['sede']).por_sigla(siglas, data.get('jornada'))
+        por_sigla, sin_secciones = filtrar_secciones(por_sigla, restricciones)
+        if sin_secciones or any(sigla not in por_sigla for sigla in siglas):
+            combinaciones = 0
+        else:
+            combinaciones = contar_por_sigla(por_sigla, max_dias=restricciones['max_dias'])
+        return JsonResponse({'success': True, 'combinaciones': combinaciones})
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Datos inválidos'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+def api_estadisticas_cache_generador(request):
+    """
+    Aciertos y fallos de la caché de resultados del generador (del proceso
+    que atiende la solicitud). Solo para superusuarios.
+    """
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    return JsonResponse(dict(estadisticas_cache(), factibles=cache_factibles.estadisticas()))
@@ -0,0 +1,105 @@
+# oferta/views/generador_cache.py
+"""
+Caché de resultados del generador de horarios
+---------------------------------------------
+Guarda la respuesta ya serializada de una solicitud, con una clave que incluye
+la sede, la jornada, las siglas ordenadas, las restricciones duras, las
+preferencias normalizadas, si se pidieron alternativas, el motor y la versión
+de la oferta de esa sede (`VersionOferta`, que se incrementa al recargarla o
+al editar una sección, ver `oferta.signals`). Un cambio deja las entradas
+anteriores inalcanzables y el desalojo LRU del backend se encarga de ellas.
+
+Usa el alias de caché 'generador' (ver CACHES en settings).
+"""
+
+import hashlib
+import json
+import threading
+
+from django.core.cache import caches
+
+from ..models import VersionOferta
+
+CACHE_ALIAS = 'generador'
+
+# Preferencias que influyen en la puntuación, con sus valores por defecto
+PREFERENCIAS_POR_DEFECTO = {
+    'preferencia_horario': 'neutro',
+    'minimizar_huecos': True,
+    'preferir_virtuales': 'neutro',
+}
+
+# Contadores del proceso actual
+_contadores = {'aciertos': 0, 'fallos': 0}
+_candado = threading.Lock()
+
+
+def normalizar_preferencias(preferencias):
+    """Solo las preferencias que usa la puntuación, con sus valores por defecto."""
+    normalizadas = {
+        clave: preferencias.get(clave, defecto)
+        for clave, defecto in PREFERENCIAS_POR_DEFECTO.items()
+    }
+    normalizadas['minimizar_huecos'] = bool(normalizadas['minimizar_huecos'])
+    return normalizadas
+
+
+def _resumen(contenido):
+    texto = json.dumps(contenido, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+def _oferta_solicitada(data):
+    return {
+        'sede': data.get('sede'),
+        'jornada': data.get('jornada') or None,
+        'siglas': sorted(set(data.get('siglas', []))),
+        # Cambian qué combinaciones son válidas, así que también van en la clave de factibles
+        'restricciones': data.get('restricciones') or {},
+    }
+
+
+def clave_resultados(data):
+    """Clave de caché de una solicitud de generación (cuerpo de la API)."""
+    contenido = dict(_oferta_solicitada(data),
+                     preferencias=normalizar_preferencias(data.get('preferencias', {})),
+                     alternativas=bool(data.get('alternativas')),
+                     motor=data.get('motor', 'auto'))
+    return f"resultados:v{VersionOferta.actual(data.get('sede'))}:{_resumen(contenido)}"
+
+
+def clave_factibles(data):
+    """Clave del conjunto factible: como `clave_resultados`, sin las preferencias."""
+    return f"factibles:v{VersionOferta.actual(data.get('sede'))}:{_resumen(_oferta_solicitada(data))}"
+
+
+def _contar(campo):
+    with _candado:
+        _contadores[campo] += 1
+
+
+def obtener_resultados(clave):
+    """Horarios serializados cacheados para `clave`, o None si no están."""
+    horarios = caches[CACHE_ALIAS].get(clave)
+    _contar('fallos' if horarios is None else 'aciertos')
+    return horarios
+
+
+def guardar_resultados(clave, horarios):
+    caches[CACHE_ALIAS].set(clave, horarios)
+
+
+def estadisticas_cache():
+    with _candado:
+        aciertos, fallos = _contadores['aciertos'], _contadores['fallos']
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': round(aciertos / total, 4) if total else 0.0,
+    }
+
+
+def reiniciar_estadisticas_cache():
+    with _candado:
+        _contadores.update(aciertos=0, fallos=0)
@@ -0,0 +1,310 @@
+# oferta/views/generador_componentes.py
+"""
+Búsqueda por componentes independientes
+---------------------------------------
+Es frecuente que las siglas elegidas formen grupos que nunca chocan entre sí
+(ramos de mañana y de tarde, o de lunes-miércoles y de martes-jueves). El
+backtracking igual recorre el producto de esos grupos, y repite la búsqueda
+de cada grupo (con sus ramas muertas) por cada asignación de los anteriores.
+
+1. Grafo de siglas: dos siglas son vecinas si alguna sección de una ocupa un
+   tramo de alguna sección de la otra (unión de máscaras). Sus componentes
+   conexas se resuelven por separado.
+2. Se enumeran una sola vez las asignaciones sin choques de cada componente,
+   con forward checking sobre todas las siglas (la jornada sí es común a toda
+   la combinación). El costo de esta enumeración es la suma de los árboles
+   de cada componente, no su producto.
+3. Se combinan una parcial por componente, de la misma jornada y siempre sin
+   choques entre ellas, con una mezcla k-best (ver abajo).
+
+La puntuación no es separable entre componentes: la curva de huecos, los
+días usados, los promedios por día, la varianza de la carga y el redondeo
+dependen del horario completo, así que no existe una puntuación por
+componente cuya suma (o cualquier función monótona) ordene las
+combinaciones. Lo que sí se reparte es la cota: cada parcial tiene la cota
+superior de `cota_superior_puntuacion` con las demás componentes
+pendientes, y una combinación no puede superar la menor de las cotas de sus
+parciales. Esa menor cota es monótona en la posición de cada parcial dentro
+de su lista (ordenadas de mayor a menor cota).
+
+La mezcla es un heap de tuplas de índices (una posición por componente).
+Se parte de la tupla de ceros de cada jornada; cada tupla sacada se puntúa
+como horario completo y agrega sus sucesoras: avanzar una componente, desde
+la última avanzada. Así cada tupla tiene un único antecesor (no hace falta
+recordar las vistas) y sus descendientes conservan las componentes
+anteriores a la avanzada, de modo que la cota de una tupla en el heap es la
+menor entre la de su antecesora, la de sus parciales y la de ese prefijo ya
+asignado con el resto pendiente. Cuando la mayor cota del heap queda bajo el
+umbral del top-K, ninguna combinación restante puede entrar y la mezcla
+termina.
+
+El resultado es el mismo que el del backtracking. El costo es el de las
+tuplas cuya cota alcanza el umbral: como la puntuación no es separable,
+con cotas parejas (por ejemplo, sin preferencias que distingan las
+parciales) puede llegar al producto, igual que la búsqueda conjunta.
+
+Sin poda por cota (por ejemplo, para contar todas las combinaciones) no hay
+orden que aprovechar y se recorre el producto completo, como en la búsqueda
+conjunta.
+
+Si la solicitud forma una sola componente o la enumeración no cabe en el
+presupuesto, se usa la búsqueda conjunta (`BusquedaHorarios`).
+"""
+
+import heapq
+import time
+
+from .generador_mitades import PresupuestoAgotado, enumerar_mitad
+from .generador_utils import MAX_TIEMPO_GENERACION, BusquedaHorarios
+
+# Con menos nodos estimados, el backtracking conjunto es barato y no conviene separar
+MIN_NODOS_COMPONENTES = 20_000
+
+
+def componentes_siglas(solicitud):
+    """
+    Componentes conexas del grafo de siglas de `solicitud` que comparten
+    tramos, como listas ordenadas de posiciones de sigla. La primera es la
+    que contiene la sigla 0; las demás siguen por su menor sigla.
+    """
+    uniones = []
+    for secciones in solicitud.secciones_por_sigla:
+        union = 0
+        for seccion in secciones:
+            union |= seccion.mascara
+        uniones.append(union)
+
+    pendientes = set(range(solicitud.total_siglas))
+    componentes = []
+    while pendientes:
+        inicial = min(pendientes)
+        pendientes.discard(inicial)
+        componente, ocupado = [inicial], uniones[inicial]
+        # Se agregan vecinas hasta que ninguna pendiente toque la unión del grupo
+        vecinas = [j for j in pendientes if uniones[j] & ocupado]
+        while vecinas:
+            for j in vecinas:
+                pendientes.discard(j)
+                componente.append(j)
+                ocupado |= uniones[j]
+            vecinas = [j for j in pendientes if uniones[j] & ocupado]
+        componentes.append(sorted(componente))
+    return componentes
+
+
+class PreparacionComponentes:
+    """
+    Parciales enumeradas de cada componente de una solicitud. Se calcula una
+    vez (al elegir el motor o al buscar) y queda en `solicitud.componentes`.
+    """
+
+    def __init__(self, componentes, parciales, nodos):
+        self.componentes = componentes
+        self.parciales = parciales  # por componente, lista de `ParcialMitad`
+        self.nodos = nodos
+
+
+def preparar_componentes(solicitud, componentes=None, presupuesto=None, tiempo_inicio=None,
+                         max_tiempo=MAX_TIEMPO_GENERACION):
+    """
+    `PreparacionComponentes` de `solicitud`, o None si tiene una sola
+    componente o si se agotó el presupuesto o el tiempo.
+    """
+    if componentes is None:
+        componentes = componentes_siglas(solicitud)
+    if len(componentes) < 2:
+        return None
+    contador = [0]
+    try:
+        parciales = [
+            enumerar_mitad(solicitud, siglas, contador, presupuesto, tiempo_inicio, max_tiempo)
+            for siglas in componentes
+        ]
+    except PresupuestoAgotado:
+        return None
+    return PreparacionComponentes(componentes, parciales, contador[0])
+
+
+def _cota_de(listas, tupla):
+    """Cota de las combinaciones de la tupla de índices: la menor de sus parciales."""
+    return min(lista[indice].cota for lista, indice in zip(listas, tupla))
+
+
+class BusquedaPorComponentes(BusquedaHorarios):
+    """
+    Misma interfaz y mismos resultados que `BusquedaHorarios`, resolviendo por
+    separado las componentes independientes (ver el módulo). No admite
+    prefijos (la búsqueda paralela usa siempre el backtracking).
+    """
+
+    def iterar(self, prefijo=(), intervalo=None):
+        if prefijo:
+            raise ValueError('La búsqueda por componentes no admite prefijos')
+        solicitud = self.solicitud
+        self.timeout = False
+
+        preparacion = solicitud.componentes
+        if preparacion is None:
+            preparacion = preparar_componentes(solicitud, tiempo_inicio=self.tiempo_inicio,
+                                               max_tiempo=self.max_tiempo)
+            if preparacion is None:
+                # Una sola componente, o demasiado grandes para enumerarlas: búsqueda conjunta
+                if time.time() - self.tiempo_inicio > self.max_tiempo:
+                    self.timeout = True
+                    return
+                yield from super().iterar(intervalo=intervalo)
+                return
+            solicitud.componentes = preparacion
+        self.stats['exploradas'] += preparacion.nodos
+
+        componentes = preparacion.componentes
+        # Parciales de cada componente por jornada, de mayor a menor cota por sí solas
+        self._por_jornada = []
+        for nivel, parciales in enumerate(preparacion.parciales):
+            otras = tuple(j for j in range(solicitud.total_siglas) if j not in componentes[nivel])
+            por_jornada = {}
+            for parcial in parciales:
+                if self.max_dias is not None and len(
+                    frozenset().union(*(solicitud.dias_de[s.indice] for s in parcial.secciones))
+                ) > self.max_dias:
+                    # Ocupa demasiados días por sí sola
+                    self.stats['podadas_restriccion'] += 1
+                    continue
+                if self.poda_cota:
+                    self._agregar(componentes[nivel], parcial.secciones)
+                    parcial.cota = self._cota_superior(otras)
+                    self._quitar(componentes[nivel])
+                por_jornada.setdefault(parcial.jornada, []).append(parcial)
+            if self.poda_cota:
+                for lista in por_jornada.values():
+                    lista.sort(key=lambda p: -p.cota)
+            self._por_jornada.append(por_jornada)
+
+        self._version_entregada = self.version
+        self._ultima_entrega = time.time()
+        try:
+            if self.poda_cota:
+                yield from self._mezclar(intervalo)
+            else:
+                for jornada in sorted(self._por_jornada[0]):
+                    if any(jornada not in por_jornada for por_jornada in self._por_jornada):
+                        continue
+                    yield from self._combinar(0, jornada, intervalo)
+                    if self.timeout:
+                        break
+
+            self._puntuar_hojas_pendientes()
+            if self.version != self._version_entregada:
+                yield self.mejores_k.ordenados()
+        finally:
+            self._deshacer_prefijo()
+
+    def _mezclar(self, intervalo):
+        """Mezcla k-best de las parciales de cada componente (ver el módulo)."""
+        componentes = self.solicitud.componentes.componentes
+        # Siglas de las componentes desde cada nivel, pendientes en la cota de un prefijo
+        self._desde_nivel = [
+            tuple(j for siglas in componentes[nivel:] for j in siglas) for nivel in range(len(componentes))
+        ]
+        self._cotas_prefijo = {}
+        listas_por_jornada = {}
+        heap = []  # (-cota, jornada, tupla de índices)
+        for jornada in sorted(self._por_jornada[0]):
+            listas = [por_jornada.get(jornada) for por_jornada in self._por_jornada]
+            if all(listas):
+                listas_por_jornada[jornada] = listas
+                inicial = (0,) * len(listas)
+                heapq.heappush(heap, (-_cota_de(listas, inicial), jornada, inicial))
+
+        while heap:
+            ahora = time.time()
+            if ahora - self.tiempo_inicio > self.max_tiempo:
+                self.timeout = True
+                return
+
+            # El umbral debe estar al día para cortar apenas se pueda
+            self._puntuar_hojas_pendientes()
+            menos_cota, jornada, tupla = heapq.heappop(heap)
+            umbral = self.umbral()
+            if umbral is not None and -menos_cota < umbral:
+                # Las que quedan (y sus sucesoras) tienen cota aún menor
+                self.stats['podadas_cota'] += 1
+                return
+
+            listas = listas_por_jornada[jornada]
+            for nivel, indice in enumerate(tupla):
+                self._agregar(componentes[nivel], listas[nivel][indice].secciones)
+            if self.max_dias is not None and len(self.estado.dias) > self.max_dias:
+                self.stats['podadas_restriccion'] += 1
+            else:
+                self.stats['exploradas'] += 1
+                self._registrar_hoja()
+            for nivel in reversed(range(len(tupla))):
+                self._quitar(componentes[nivel])
+
+            desde = max((nivel for nivel, indice in enumerate(tupla) if indice), default=0)
+            for nivel in range(desde, len(tupla)):
+                if tupla[nivel] + 1 < len(listas[nivel]):
+                    sucesora = tupla[:nivel] + (tupla[nivel] + 1,) + tupla[nivel + 1:]
+                    cota = min(-menos_cota, _cota_de(listas, sucesora),
+                               self._cota_prefijo(jornada, listas, sucesora, nivel))
+                    heapq.heappush(heap, (-cota, jornada, sucesora))
+
+            if self.version != self._version_entregada or (
+                intervalo is not None and ahora - self._ultima_entrega >= intervalo
+            ):
+                self._puntuar_hojas_pendientes()
+                self._version_entregada = self.version
+                self._ultima_entrega = ahora
+                yield self.mejores_k.ordenados()
+
+    def _cota_prefijo(self, jornada, listas, tupla, nivel):
+        """
+        Cota con las parciales de `tupla` asignadas en las componentes antes
+        de `nivel` y las demás pendientes. Las sucesoras de una tupla
+        avanzada en `nivel` conservan ese prefijo, así que también las acota.
+        """
+        if not nivel:
+            return float('inf')
+        clave = (jornada, tupla[:nivel])
+        cota = self._cotas_prefijo.get(clave)
+        if cota is None:
+            componentes = self.solicitud.componentes.componentes
+            for anterior in range(nivel):
+                self._agregar(componentes[anterior], listas[anterior][tupla[anterior]].secciones)
+            cota = self._cotas_prefijo[clave] = self._cota_superior(self._desde_nivel[nivel])
+            for anterior in reversed(range(nivel)):
+                self._quitar(componentes[anterior])
+        return cota
+
+    def _combinar(self, nivel, jornada, intervalo):
+        """
+        Agrega a la asignación cada parcial de la componente `nivel` y sigue
+        con la próxima (producto completo, para la búsqueda sin poda por cota).
+        """
+        siglas = self.solicitud.componentes.componentes[nivel]
+        ultimo = nivel == len(self._por_jornada) - 1
+        for parcial in self._por_jornada[nivel][jornada]:
+            ahora = time.time()
+            if ahora - self.tiempo_inicio > self.max_tiempo:
+                self.timeout = True
+                return
+
+            self._agregar(siglas, parcial.secciones)
+            if self.max_dias is not None and len(self.estado.dias) > self.max_dias:
+                self.stats['podadas_restriccion'] += 1
+            elif ultimo:
+                self.stats['exploradas'] += 1
+                self._registrar_hoja()
+            else:
+                yield from self._combinar(nivel + 1, jornada, intervalo)
+            self._quitar(siglas)
+            if self.timeout:
+                return
+
+            if self.version != self._version_entregada or (
+                intervalo is not None and ahora - self._ultima_entrega >= intervalo
+            ):
+                self._version_entregada = self.version
+                self._ultima_entrega = ahora
+                yield self.mejores_k.ordenados()
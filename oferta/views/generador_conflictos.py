@@ -0,0 +1,121 @@
+# oferta/views/generador_conflictos.py
+"""
+Matriz de conflictos entre secciones candidatas
+-----------------------------------------------
+Se construye una sola vez por solicitud, comparando todos los bloques horarios
+de forma vectorizada con NumPy. Dos secciones están en conflicto si no pueden
+ir juntas en un horario: tienen jornadas distintas o algún bloque solapado.
+Los solapes se calculan entre bloques y se reducen a nivel sección con
+`np.logical_or.reduceat` sobre los bloques ordenados por sección.
+
+Además de la matriz booleana, cada fila se guarda como un entero (bitset sobre
+los índices de sección) para que filtrar un dominio sea un AND.
+"""
+
+import numpy as np
+
+
+class MatrizConflictos:
+    """
+    Conflictos por pares entre secciones compiladas (ver `SeccionCompilada`).
+    Las secciones se identifican por su `indice` global dentro de la solicitud.
+    Con `compartidos` (ver `lotes.ConflictosCompartidos`), las filas se toman
+    de una matriz ya construida para un conjunto mayor de secciones.
+    """
+
+    def __init__(self, secciones, compartidos=None):
+        self.total = len(secciones)
+        matriz = compartidos.submatriz(secciones) if compartidos is not None else None
+        self.matriz = self._construir(secciones) if matriz is None else matriz
+        self.compatibles = self._filas_como_bits(~self.matriz)
+
+    def _construir(self, secciones):
+        n = self.total
+        if n == 0:
+            return np.zeros((0, 0), dtype=bool)
+
+        # Jornadas distintas → conflicto
+        codigos = {}
+        jornadas = np.empty(n, dtype=np.int32)
+        for s in secciones:
+            jornadas[s.indice] = codigos.setdefault(s.jornada, len(codigos))
+        matriz = jornadas[:, None] != jornadas[None, :]
+
+        # Bloques aplanados: (sección, día, inicio, fin)
+        dias = {}
+        filas = [
+            (s.indice, dias.setdefault(dia, len(dias)), inicio, fin)
+            for s in secciones
+            for dia, inicio, fin in s.bloques
+            if fin > inicio
+        ]
+        if filas:
+            bloques = np.array(filas, dtype=np.int32)
+            seccion, dia, inicio, fin = bloques.T
+            # Bloques agrupados por sección: los solapes se llevan a nivel sección
+            # con un OR por tramos de filas y de columnas
+            orden = np.argsort(seccion, kind='stable')
+            seccion, dia, inicio, fin = seccion[orden], dia[orden], inicio[orden], fin[orden]
+            solapa = (
+                (dia[:, None] == dia[None, :])
+                & (inicio[:, None] < fin[None, :])
+                & (inicio[None, :] < fin[:, None])
+            )
+            con_bloques, desde = np.unique(seccion, return_index=True)
+            solapa = np.logical_or.reduceat(solapa, desde, axis=0)
+            solapa = np.logical_or.reduceat(solapa, desde, axis=1)
+            matriz[np.ix_(con_bloques, con_bloques)] |= solapa
+
+        np.fill_diagonal(matriz, False)
+        return matriz
+
+    @staticmethod
+    def _filas_como_bits(matriz):
+        if matriz.size == 0:
+            return []
+        empaquetadas = np.packbits(matriz, axis=1, bitorder='little')
+        return [int.from_bytes(fila.tobytes(), 'little') for fila in empaquetadas]
+
+    def conflicto(self, i, j):
+        return bool(self.matriz[i, j])
+
+    def densidad_siglas(self, secciones_por_sigla):
+        """
+        Fracción de pares de secciones en conflicto entre cada par de siglas de
+        `secciones_por_sigla` (lista de listas). 0 significa que esas dos siglas
+        nunca chocan; 1, que ninguna combinación de ambas es posible.
+        """
+        grupos = [[s.indice for s in secciones] for secciones in secciones_por_sigla]
+        densidad = [[0.0] * len(grupos) for _ in grupos]
+        for a, filas in enumerate(grupos):
+            for b in range(a + 1, len(grupos)):
+                if filas and grupos[b]:
+                    valor = float(self.matriz[np.ix_(filas, grupos[b])].mean())
+                    densidad[a][b] = densidad[b][a] = valor
+        return densidad
+
+    def filtrar(self, dominio, indice):
+        """Secciones de `dominio` (bitset) compatibles con la sección `indice`."""
+        return dominio & self.compatibles[indice]
+
+
+def dominio_de(secciones):
+    """Bitset con los índices globales de una lista de secciones."""
+    dominio = 0
+    for seccion in secciones:
+        dominio |= 1 << seccion.indice
+    return dominio
+
+
+def propagar(dominios, pendientes, compatibles):
+    """
+    Forward checking: filtra los dominios (bitsets) de las siglas `pendientes`
+    con el bitset `compatibles` de la sección recién elegida. Retorna la nueva
+    lista de dominios, o None si alguno queda vacío.
+    """
+    nuevos = list(dominios)
+    for j in pendientes:
+        nuevos[j] = dominios[j] & compatibles
+        if not nuevos[j]:
+            return None
+    return nuevos
@@ -0,0 +1,155 @@
+# oferta/views/generador_conteo.py
+"""
+Conteo de combinaciones válidas sin enumerarlas
+-----------------------------------------------
+Cuántos horarios sin choques admite un conjunto de siglas, calculado de forma
+exacta sin recorrerlos uno por uno:
+
+1. Por jornada: la jornada es común a toda la combinación, así que se cuenta
+   cada una por separado y se suman.
+2. Por componentes: dos siglas cuyas secciones nunca ocupan los mismos tramos
+   no se restringen entre sí. El conteo es el producto de los conteos de cada
+   grupo conectado (con `max_dias` no se separa, porque los días acoplan a
+   todas las siglas).
+3. Dentro de un componente, programación dinámica sobre la ocupación: se
+   asignan las siglas de a una y se cuenta cuántas asignaciones parciales
+   llegan a cada máscara de ocupación. De la máscara solo se conservan los
+   bits que aún pueden chocar con las siglas que faltan, así que parciales
+   distintas que dejan el mismo estado se cuentan juntas.
+
+Las secciones equivalentes (mismos bloques, ver `agrupar_equivalentes`) pesan
+por la cantidad de secciones de su clase, o 1 si se cuentan clases. El costo
+se acota con `PRESUPUESTO_TRANSICIONES`; si se supera, el conteo es None.
+"""
+
+from .generador_utils import SolicitudCompilada
+
+# Transiciones (estado × sección) máximas por conteo: unos 100 ms
+PRESUPUESTO_TRANSICIONES = 500_000
+
+
+class PresupuestoAgotado(Exception):
+    """El conteo superó `PRESUPUESTO_TRANSICIONES` sin terminar."""
+
+
+def componentes_de(opciones):
+    """
+    Grupos de posiciones de `opciones` (una lista de {(máscara, días): peso}
+    por sigla) conectados por tramos compartidos, con el orden de asignación
+    de cada grupo. Se empieza por la sigla con menos opciones y se sigue por
+    la que deja menos tramos ocupados que aún chocan con las pendientes: esa
+    frontera es la que distingue los estados del conteo.
+    """
+    uniones = []
+    for por_sigla in opciones:
+        union = 0
+        for mascara, _ in por_sigla:
+            union |= mascara
+        uniones.append(union)
+
+    def resto(excluidas):
+        union = 0
+        for j in pendientes - excluidas:
+            union |= uniones[j]
+        return union
+
+    pendientes = set(range(len(opciones)))
+    componentes = []
+    while pendientes:
+        actual = min(pendientes, key=lambda j: (len(opciones[j]), j))
+        pendientes.discard(actual)
+        orden, ocupado = [actual], uniones[actual]
+        while True:
+            vecinas = [j for j in pendientes if uniones[j] & ocupado]
+            if not vecinas:
+                break
+            siguiente = min(vecinas, key=lambda j: (
+                ((ocupado | uniones[j]) & resto({j})).bit_count(), len(opciones[j]), j
+            ))
+            pendientes.discard(siguiente)
+            orden.append(siguiente)
+            ocupado |= uniones[siguiente]
+        componentes.append(orden)
+    return componentes
+
+
+def contar_componente(opciones, max_dias, presupuesto):
+    """
+    Combinaciones de las siglas `opciones` (en orden de asignación). Cada
+    estado es (ocupación proyectada, días usados); `presupuesto` es una lista
+    de un elemento con las transiciones que quedan.
+    """
+    futuras = [0] * (len(opciones) + 1)
+    for k in reversed(range(len(opciones))):
+        futuras[k] = futuras[k + 1]
+        for mascara, _ in opciones[k]:
+            futuras[k] |= mascara
+
+    estados = {(0, 0): 1}
+    for k, por_sigla in enumerate(opciones):
+        presupuesto[0] -= len(estados) * len(por_sigla)
+        if presupuesto[0] < 0:
+            raise PresupuestoAgotado()
+        relevante = futuras[k + 1]
+        siguientes = {}
+        for (ocupado, dias), cuenta in estados.items():
+            for (mascara, dias_seccion), peso in por_sigla.items():
+                if mascara & ocupado:
+                    continue
+                if max_dias is None:
+                    nuevos_dias = 0
+                else:
+                    nuevos_dias = dias | dias_seccion
+                    if nuevos_dias.bit_count() > max_dias:
+                        continue
+                clave = ((ocupado | mascara) & relevante, nuevos_dias)
+                siguientes[clave] = siguientes.get(clave, 0) + cuenta * peso
+        if not siguientes:
+            return 0
+        estados = siguientes
+    return sum(estados.values())
+
+
+def contar_combinaciones(solicitud, max_dias=None, concretas=True, presupuesto=PRESUPUESTO_TRANSICIONES):
+    """
+    Número exacto de combinaciones sin choques y de una sola jornada de
+    `solicitud` (una `SolicitudCompilada`), que no ocupen más de `max_dias`
+    días si se indica. Con `concretas`, cuenta secciones; si no, clases de
+    secciones equivalentes (las hojas del backtracking). Retorna None si el
+    conteo no termina dentro del `presupuesto` de transiciones.
+    """
+    codigos_dia = {}
+    por_jornada = {}
+    for seccion in solicitud.secciones:
+        dias = 0
+        if max_dias is not None:
+            for dia in solicitud.dias_de[seccion.indice]:
+                dias |= 1 << codigos_dia.setdefault(dia, len(codigos_dia))
+        opciones = por_jornada.setdefault(seccion.jornada, [{} for _ in range(solicitud.total_siglas)])
+        por_sigla = opciones[solicitud.sigla_de[seccion.indice]]
+        clave = (seccion.mascara, dias)
+        por_sigla[clave] = por_sigla.get(clave, 0) + (len(seccion.equivalentes) if concretas else 1)
+
+    restante = [presupuesto]
+    total = 0
+    try:
+        for opciones in por_jornada.values():
+            if not all(opciones):
+                continue
+            grupos = [list(range(len(opciones)))] if max_dias is not None else componentes_de(opciones)
+            producto = 1
+            for grupo in grupos:
+                producto *= contar_componente([opciones[j] for j in grupo], max_dias, restante)
+                if not producto:
+                    break
+            total += producto
+    except PresupuestoAgotado:
+        return None
+    return total
+
+
+def contar_por_sigla(por_sigla, max_dias=None, conflictos=None):
+    """`contar_combinaciones` (de secciones concretas) de una solicitud `por_sigla`."""
+    if not por_sigla:
+        return 0
+    return contar_combinaciones(SolicitudCompilada(por_sigla, conflictos=conflictos), max_dias=max_dias)
@@ -0,0 +1,172 @@
+# oferta/views/generador_diagnostico.py
+"""
+Detección temprana de solicitudes sin combinaciones
+---------------------------------------------------
+Antes de la búsqueda se comprueba que las siglas pedidas puedan ir juntas:
+
+- Consistencia de arcos (AC-3) entre siglas sobre la matriz de conflictos.
+  Se quitan las secciones que chocan con todas las de otra sigla; si una
+  sigla queda sin secciones, no hay combinación.
+- Búsqueda de una sola solución con forward checking, con un presupuesto de
+  nodos para que el chequeo tome milisegundos. Si se agota el presupuesto, no
+  se concluye nada y sigue la búsqueda normal.
+
+Si no hay combinación, se busca un conjunto mínimo de siglas que no se puede
+combinar. Primero se prueban pares y tríos; si ninguno falla, se quitan siglas
+mientras el resto siga sin combinación. Así el estudiante sabe qué asignatura
+quitar.
+"""
+
+from collections import deque
+from itertools import combinations
+
+from .generador_conflictos import propagar
+from .generador_utils import SolicitudCompilada
+
+# Nodos máximos por chequeo de factibilidad (se aborta sin concluir al superarlos)
+PRESUPUESTO_NODOS = 5000
+
+
+class PresupuestoAgotado(Exception):
+    """El chequeo superó `PRESUPUESTO_NODOS` sin concluir."""
+
+
+def _bits(dominio):
+    while dominio:
+        bajo = dominio & -dominio
+        yield bajo.bit_length() - 1
+        dominio ^= bajo
+
+
+def consistencia_de_arcos(compatibles, siglas, dominios):
+    """
+    AC-3 sobre las siglas `siglas` (posiciones en `dominios`). Retorna los
+    dominios reducidos, o None si alguno queda vacío.
+    """
+    dominios = list(dominios)
+    cola = deque((a, b) for a in siglas for b in siglas if a != b)
+    while cola:
+        a, b = cola.popleft()
+        dominio = dominios[a]
+        con_soporte = dominio
+        for indice in _bits(dominio):
+            if not compatibles[indice] & dominios[b]:
+                con_soporte &= ~(1 << indice)
+        if con_soporte != dominio:
+            if not con_soporte:
+                return None
+            dominios[a] = con_soporte
+            cola.extend((c, a) for c in siglas if c != a and c != b)
+    return dominios
+
+
+class VerificadorFactibilidad:
+    """Decide si un subconjunto de siglas de una `SolicitudCompilada` tiene combinación."""
+
+    def __init__(self, solicitud, max_dias=None, presupuesto=PRESUPUESTO_NODOS):
+        self.solicitud = solicitud
+        self.max_dias = max_dias
+        self.presupuesto = presupuesto
+        codigos = {}
+        self.dias_de = [
+            sum(1 << codigos.setdefault(dia, len(codigos)) for dia in dias)
+            for dias in solicitud.dias_de
+        ]
+
+    def factible(self, siglas):
+        """
+        True si las siglas `siglas` (posiciones) tienen al menos una
+        combinación, False si no tienen. Lanza `PresupuestoAgotado` si no se
+        pudo decidir a tiempo.
+        """
+        compatibles = self.solicitud.matriz.compatibles
+        dominios = consistencia_de_arcos(compatibles, siglas, self.solicitud.dominios)
+        if dominios is None:
+            return False
+        self._nodos = 0
+        return self._buscar(tuple(siglas), dominios, 0)
+
+    def _buscar(self, pendientes, dominios, dias):
+        if not pendientes:
+            return True
+        self._nodos += 1
+        if self._nodos > self.presupuesto:
+            raise PresupuestoAgotado()
+
+        sigla = min(pendientes, key=lambda j: dominios[j].bit_count())
+        resto = tuple(j for j in pendientes if j != sigla)
+        compatibles = self.solicitud.matriz.compatibles
+        for indice in _bits(dominios[sigla]):
+            nuevos_dias = dias | self.dias_de[indice]
+            if self.max_dias is not None and nuevos_dias.bit_count() > self.max_dias:
+                continue
+            nuevos = propagar(dominios, resto, compatibles[indice])
+            if nuevos is not None and self._buscar(resto, nuevos, nuevos_dias):
+                return True
+        return False
+
+    def conjunto_minimo(self, siglas):
+        """
+        Subconjunto de `siglas` sin combinación y que deja de serlo al quitar
+        cualquiera de ellas (o lo más cercano, si algún chequeo no concluye).
+        """
+        for tamano in (2, 3):
+            for subconjunto in combinations(siglas, tamano):
+                try:
+                    if not self.factible(subconjunto):
+                        return list(subconjunto)
+                except PresupuestoAgotado:
+                    continue
+
+        conflicto = list(siglas)
+        for sigla in list(siglas):
+            resto = [j for j in conflicto if j != sigla]
+            try:
+                if not self.factible(resto):
+                    conflicto = resto
+            except PresupuestoAgotado:
+                pass
+        return conflicto
+
+
+def diagnosticar_conflicto(por_sigla, max_dias=None, conflictos=None, solicitud=None):
+    """
+    Siglas (ordenadas) de un conjunto mínimo que no se puede combinar, si la
+    solicitud `por_sigla` no tiene ninguna combinación. Retorna None si la
+    tiene o si no se pudo decidir dentro del presupuesto. `conflictos` es una
+    matriz compartida y `solicitud`, la `SolicitudCompilada` de `por_sigla`
+    si el llamador ya la tiene.
+    """
+    if solicitud is None:
+        solicitud = SolicitudCompilada(por_sigla, conflictos=conflictos)
+    verificador = VerificadorFactibilidad(solicitud, max_dias=max_dias)
+    try:
+        if verificador.factible(list(range(solicitud.total_siglas))):
+            return None
+    except PresupuestoAgotado:
+        return None
+    return siglas_en_conflicto(solicitud, max_dias, verificador)
+
+
+def siglas_en_conflicto(solicitud, max_dias=None, verificador=None):
+    """
+    Siglas (ordenadas) de un conjunto mínimo sin combinación de `solicitud`,
+    que ya se sabe que no tiene ninguna (por ejemplo, porque la búsqueda
+    completa no encontró combinaciones).
+    """
+    if verificador is None:
+        verificador = VerificadorFactibilidad(solicitud, max_dias=max_dias)
+    minimo = verificador.conjunto_minimo(list(range(solicitud.total_siglas)))
+    return sorted(solicitud.siglas[j] for j in minimo)
+
+
+def mensaje_conflicto(siglas, max_dias=None):
+    """Mensaje para el estudiante con las siglas que no se pueden combinar."""
+    if len(siglas) > 1:
+        nombres = f"{', '.join(siglas[:-1])} y {siglas[-1]}"
+    else:
+        nombres = siglas[0]
+    mensaje = f'Las asignaturas {nombres} no se pueden combinar: sus secciones siempre chocan entre sí'
+    if max_dias is not None:
+        mensaje += f' o superan el máximo de {max_dias} días'
+    return mensaje + '. Quita una de ellas para generar horarios.'
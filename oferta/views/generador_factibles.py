@@ -0,0 +1,266 @@
+# oferta/views/generador_factibles.py
+"""
+Conjunto factible cacheado del generador de horarios
+----------------------------------------------------
+Qué combinaciones no tienen choques depende solo de la sede, la jornada y las
+siglas; las preferencias solo cambian la puntuación. Por eso, la primera vez
+se enumeran todas las combinaciones válidas y se guardan en forma compacta:
+
+- Una matriz de posiciones de sección (una columna por sigla).
+- Los campos de métricas que usa la puntuación, como arrays.
+
+Si después solo cambian las preferencias, basta con puntuar ese conjunto con
+`calcular_puntuaciones_lote` y reordenarlo. Las métricas completas se calculan
+solo para las K mejores. Como en la búsqueda, las filas son combinaciones de
+clases de secciones equivalentes y se expanden al armar el top-K.
+
+Los conjuntos viven en memoria del proceso con un presupuesto de bytes y
+desalojo LRU. Antes de enumerar se cuentan las combinaciones sin recorrerlas
+(`contar_combinaciones`), y los arrays se reservan de una vez con ese tamaño.
+Un conjunto que no cabe no se enumera, y en su lugar se usa la búsqueda normal
+con branch-and-bound.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from ..models import Asignatura
+from .generador_utils import (
+    CAMPOS_PUNTUACION,
+    MAX_TIEMPO_GENERACION,
+    BusquedaHorarios,
+    SolicitudCompilada,
+    calcular_metricas_horario,
+    calcular_puntuaciones_lote,
+    detectar_rango_global,
+    expandir_mejores,
+)
+from .generador_conteo import contar_combinaciones
+
+
+class LimiteFactiblesExcedido(Exception):
+    """El conjunto factible supera el tamaño máximo cacheable."""
+
+
+class TiempoFactiblesAgotado(Exception):
+    """La enumeración del conjunto factible no terminó a tiempo."""
+
+
+class ConjuntoFactible:
+    """Combinaciones válidas (de clases) de una solicitud, sin puntuar."""
+    __slots__ = ('ids_por_sigla', 'equivalentes', 'posiciones', 'metricas', 'rango')
+
+    def __init__(self, ids_por_sigla, equivalentes, posiciones, metricas, rango):
+        self.ids_por_sigla = ids_por_sigla  # ids de Asignatura por sigla (orden alfabético)
+        self.equivalentes = equivalentes    # por sigla, {posición de la clase: posiciones}
+        self.posiciones = posiciones        # np.ndarray (combinaciones × siglas)
+        self.metricas = metricas            # {campo: np.ndarray}
+        self.rango = rango                  # (rango_inicio_min, rango_fin_max)
+
+    def __len__(self):
+        return len(self.posiciones)
+
+    @property
+    def nbytes(self):
+        return (
+            self.posiciones.nbytes
+            + sum(valores.nbytes for valores in self.metricas.values())
+            + sum(ids.nbytes for ids in self.ids_por_sigla)
+        )
+
+    def mejores(self, preferencias, max_resultados=10, alternativas=False):
+        """
+        Las `max_resultados` mejores combinaciones para `preferencias`, en el
+        mismo formato, orden y desempate que `generar_combinaciones_optimizado`
+        (también con `alternativas`).
+        """
+        preferencias['rango_inicio_min'], preferencias['rango_fin_max'] = self.rango
+        k = min(max_resultados, len(self))
+        if k <= 0:
+            return []
+
+        # Puntuación aproximada (±0.01) de todas; exacta solo de las que aún
+        # pueden quedar en el top-K: a menos de 0.02 de la K-ésima aproximada.
+        aproximadas = calcular_puntuaciones_lote(self.metricas, preferencias, exactas=False)
+        umbral = np.partition(aproximadas, len(aproximadas) - k)[len(aproximadas) - k]
+        candidatas = np.flatnonzero(aproximadas >= umbral - 0.021)
+        puntuaciones = calcular_puntuaciones_lote(
+            {campo: valores[candidatas] for campo, valores in self.metricas.items()}, preferencias
+        )
+
+        # Mayor puntuación primero; a igual puntuación, menor tupla de posiciones
+        posiciones = self.posiciones[candidatas]
+        columnas = tuple(posiciones[:, j] for j in reversed(range(posiciones.shape[1])))
+        orden = np.lexsort(columnas + (-puntuaciones,))[:k]
+        elegidas = [(puntuaciones[i].item(), tuple(posiciones[i].tolist())) for i in orden]
+        if alternativas:
+            concretas = list(enumerate(clave for _, clave in elegidas))
+        else:
+            concretas = expandir_mejores(elegidas, self.equivalentes, max_resultados)
+
+        combinaciones = [
+            [int(self.ids_por_sigla[j][p]) for j, p in enumerate(clave)] for _, clave in concretas
+        ]
+        otras = [
+            [self.ids_por_sigla[j][list(self.equivalentes[j][p][1:])].tolist() for j, p in enumerate(clave)]
+            if alternativas else []
+            for _, clave in concretas
+        ]
+        modelos = Asignatura.objects.prefetch_related('horarios').in_bulk(
+            {id_asig for ids in combinaciones for id_asig in ids}
+            | {id_asig for por_slot in otras for ids in por_slot for id_asig in ids}
+        )
+        resultados = []
+        for (i, _), ids, por_slot in zip(concretas, combinaciones, otras):
+            if any(id_asig not in modelos for id_asig in ids):
+                # Sección eliminada mientras tanto (ver `con_modelos`)
+                continue
+            asignaturas = [modelos[id_asig] for id_asig in ids]
+            resultado = {
+                'asignaturas': asignaturas,
+                'puntuacion': elegidas[i][0],
+                'metricas': calcular_metricas_horario(asignaturas)
+            }
+            if alternativas:
+                resultado['alternativas'] = [
+                    [modelos[id_asig] for id_asig in ids if id_asig in modelos] for ids in por_slot
+                ]
+            resultados.append(resultado)
+        return resultados
+
+
+def construir_conjunto_factible(por_sigla, max_combinaciones=None, max_dias=None, conflictos=None,
+                                max_tiempo=MAX_TIEMPO_GENERACION, solicitud=None, total=None):
+    """
+    Enumera todas las combinaciones válidas de `por_sigla` (que no ocupen más
+    de `max_dias` días, si se indica) en arrays reservados de antemano para
+    `total` combinaciones de clases (si no se indica, se cuentan aquí).
+
+    Lanza `LimiteFactiblesExcedido` si hay más de `max_combinaciones` o si no
+    se pudieron contar, y `TiempoFactiblesAgotado` si la enumeración pasa de
+    `max_tiempo` segundos: un conjunto incompleto no sirve para re-puntuar.
+    """
+    if solicitud is None:
+        solicitud = SolicitudCompilada(por_sigla, conflictos=conflictos)
+    if total is None:
+        total = contar_combinaciones(solicitud, max_dias=max_dias, concretas=False)
+    if total is None or (max_combinaciones is not None and total > max_combinaciones):
+        raise LimiteFactiblesExcedido()
+
+    posiciones = np.empty((total, solicitud.total_siglas), dtype=np.int16)
+    # Una fila por campo: cada una es un array contiguo
+    valores = np.empty((len(CAMPOS_PUNTUACION), total), dtype=np.float64)
+    llenas = 0
+
+    def recolectar(clave, metricas):
+        nonlocal llenas
+        if llenas >= total:
+            raise LimiteFactiblesExcedido()
+        posiciones[llenas] = clave
+        valores[:, llenas] = [metricas[campo] for campo in CAMPOS_PUNTUACION]
+        llenas += 1
+
+    busqueda = BusquedaHorarios(solicitud, {}, max_resultados=0, poda_cota=False, recolector=recolectar,
+                                max_dias=max_dias, max_tiempo=max_tiempo)
+    if busqueda.explorar():
+        raise TiempoFactiblesAgotado()
+
+    return ConjuntoFactible(
+        ids_por_sigla=[np.array([a.id for a in entrada], dtype=np.int64) for entrada in solicitud.entrada],
+        equivalentes=solicitud.equivalentes,
+        posiciones=posiciones[:llenas],
+        metricas={campo: valores[k, :llenas] for k, campo in enumerate(CAMPOS_PUNTUACION)},
+        rango=detectar_rango_global(por_sigla),
+    )
+
+
+def bytes_por_combinacion(total_siglas):
+    return 2 * total_siglas + 8 * len(CAMPOS_PUNTUACION)
+
+
+class CacheFactibles:
+    """
+    Caché LRU de `ConjuntoFactible` acotada por bytes. Un conjunto no puede
+    ocupar más de la cuarta parte del presupuesto, para que uno solo no
+    desaloje a todos los demás.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes_usados = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self._conjuntos = OrderedDict()
+        self._candado = threading.Lock()
+
+    @property
+    def max_bytes_por_conjunto(self):
+        return self.max_bytes // 4
+
+    def obtener(self, clave):
+        with self._candado:
+            conjunto = self._conjuntos.get(clave)
+            if conjunto is None:
+                self.fallos += 1
+                return None
+            self._conjuntos.move_to_end(clave)
+            self.aciertos += 1
+            return conjunto
+
+    def guardar(self, clave, conjunto):
+        if conjunto.nbytes > self.max_bytes_por_conjunto:
+            return False
+        with self._candado:
+            anterior = self._conjuntos.pop(clave, None)
+            if anterior is not None:
+                self.bytes_usados -= anterior.nbytes
+            while self._conjuntos and self.bytes_usados + conjunto.nbytes > self.max_bytes:
+                _, desalojado = self._conjuntos.popitem(last=False)
+                self.bytes_usados -= desalojado.nbytes
+            self._conjuntos[clave] = conjunto
+            self.bytes_usados += conjunto.nbytes
+        return True
+
+    def limpiar(self):
+        with self._candado:
+            self._conjuntos.clear()
+            self.bytes_usados = 0
+            self.aciertos = self.fallos = 0
+
+    def estadisticas(self):
+        with self._candado:
+            return {
+                'conjuntos': len(self._conjuntos),
+                'bytes': self.bytes_usados,
+                'max_bytes': self.max_bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+            }
+
+
+cache_factibles = CacheFactibles(settings.GENERADOR_FACTIBLES_MAX_MB * 1024 * 1024)
+
+
+def conjunto_factible_acotado(por_sigla, max_dias=None, conflictos=None, max_tiempo=MAX_TIEMPO_GENERACION,
+                              solicitud=None):
+    """
+    `construir_conjunto_factible` con el tope de `cache_factibles`. Retorna
+    None si el conjunto es demasiado grande para cachearlo (o no se pudo
+    contar) o si no se alcanzó a enumerar en `max_tiempo`; entonces el
+    llamador debe usar la búsqueda normal.
+    """
+    if solicitud is None:
+        solicitud = SolicitudCompilada(por_sigla, conflictos=conflictos)
+    max_combinaciones = cache_factibles.max_bytes_por_conjunto // bytes_por_combinacion(len(por_sigla))
+    # El conteo es mucho más barato que la enumeración: solo se enumera lo que cabe
+    total = contar_combinaciones(solicitud, max_dias=max_dias, concretas=False)
+    if total is None or total > max_combinaciones:
+        return None
+    try:
+        return construir_conjunto_factible(por_sigla, max_dias=max_dias, max_tiempo=max_tiempo,
+                                           solicitud=solicitud, total=total)
+    except (LimiteFactiblesExcedido, TiempoFactiblesAgotado):
+        return None
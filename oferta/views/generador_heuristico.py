@@ -0,0 +1,200 @@
+# oferta/views/generador_heuristico.py
+"""
+Búsqueda heurística (anytime) para solicitudes demasiado grandes
+----------------------------------------------------------------
+Cuando ni la búsqueda exacta con poda alcanza a terminar dentro del límite de
+tiempo, lo que se tiene al cortarla son las primeras ramas en el orden de
+exploración, no las mejores. Este motor reparte el tiempo disponible así:
+
+1. Construcción por haz (beam search): se asignan las siglas de a una (las de
+   menos secciones primero) y en cada nivel se conservan los `ANCHO_HAZ`
+   estados con mayor cota superior de puntuación. Cada hijo pasa por forward
+   checking, así que un estado del haz nunca tiene una sigla sin secciones.
+   Su costo es acotado (siglas × `ANCHO_HAZ` × secciones), así que siempre se
+   completa, aunque se haya agotado el tiempo.
+2. Búsqueda por vecindarios grandes (LNS): se toma un horario del top-K, se
+   liberan algunas siglas al azar y se re-optimizan de forma exacta con el
+   backtracking con poda, dejando las demás fijas. Si varios vecindarios
+   seguidos no mejoran el top-K, se liberan más siglas.
+
+Si un vecindario con todas las siglas libres termina dentro del tiempo, la
+búsqueda fue completa y el resultado es exacto (`heuristica` queda en False).
+El tiempo total lo fija `settings.GENERADOR_TIEMPO_HEURISTICO`.
+
+Con el motor 'auto', la estimación del árbol no cuenta la poda por cota, así
+que una solicitud de árbol estimado grande bien puede resolverse exacta a
+tiempo. `BusquedaExactaConRespaldo` corre primero la búsqueda exacta con ese
+mismo tiempo y solo si no termina sigue con el haz y los vecindarios,
+partiendo del top-K que ya encontró.
+"""
+
+import random
+import time
+
+from django.conf import settings
+
+from .generador_conflictos import propagar
+from .generador_utils import BusquedaHorarios
+
+# Estados que conserva la construcción por haz en cada nivel
+ANCHO_HAZ = 16
+
+# Siglas que se liberan en el primer vecindario
+SIGLAS_LIBRES_INICIALES = 2
+
+
+class BusquedaHeuristica(BusquedaHorarios):
+    """
+    Misma interfaz que `BusquedaHorarios` (top-K en `mejores_k`, contadores
+    en `stats`), pero con resultados aproximados dentro de `tiempo_limite`
+    segundos (sin pasar de `max_tiempo`). `semilla` fija la elección de
+    vecindarios. No admite prefijos.
+    """
+
+    def __init__(self, solicitud, preferencias, tiempo_limite=None, ancho_haz=ANCHO_HAZ, semilla=0,
+                 **opciones):
+        super().__init__(solicitud, preferencias, **opciones)
+        if tiempo_limite is None:
+            tiempo_limite = settings.GENERADOR_TIEMPO_HEURISTICO
+        self.tiempo_limite = tiempo_limite
+        self.max_tiempo_total = self.max_tiempo
+        self.max_tiempo = min(tiempo_limite, self.max_tiempo)
+        self.ancho_haz = ancho_haz
+        self.rng = random.Random(semilla)
+        self.heuristica = True
+        self.vistas = set()  # claves ya registradas (los vecindarios se repiten)
+        # por_posicion[j]: {posición: SeccionCompilada} de la sigla j
+        self.por_posicion = [
+            {seccion.posicion: seccion for seccion in secciones} for secciones in solicitud.secciones_por_sigla
+        ]
+
+    def iterar(self, prefijo=(), intervalo=None):
+        if prefijo:
+            raise ValueError('La búsqueda heurística no admite prefijos')
+        self.construir_haz()
+        if not len(self.mejores_k):
+            # El haz se quedó sin estados: búsqueda exacta con el tiempo que queda
+            yield from super().iterar(intervalo=intervalo)
+            self.heuristica = self.timeout
+            self.timeout = False
+            return
+        yield self.mejores_k.ordenados()
+
+        total = self.solicitud.total_siglas
+        libres = min(SIGLAS_LIBRES_INICIALES, total)
+        sin_mejora = 0
+        while not self._sin_tiempo():
+            version = self.version
+            base = self.rng.choice(self.mejores_k.ordenados())['clave']
+            liberadas = set(self.rng.sample(range(total), libres))
+            fijas = [self.por_posicion[j][base[j]].indice for j in range(total) if j not in liberadas]
+            yield from super().iterar(prefijo=fijas, intervalo=intervalo)
+
+            if libres == total and not self.timeout:
+                self.heuristica = False  # el último vecindario fue la búsqueda completa
+                break
+            if self.version != version:
+                sin_mejora = 0
+                libres = min(SIGLAS_LIBRES_INICIALES, total)
+            else:
+                sin_mejora += 1
+                if sin_mejora >= total:
+                    sin_mejora = 0
+                    libres = min(libres + 1, total)
+        # Agotar el tiempo es lo esperado en este motor, no un corte anómalo
+        self.timeout = False
+
+    def construir_haz(self):
+        """Registra los horarios completos que deja la construcción por haz."""
+        solicitud = self.solicitud
+        compatibles = solicitud.matriz.compatibles
+        dias_de = solicitud.dias_de
+        orden = sorted(range(solicitud.total_siglas), key=lambda j: (solicitud.dominios[j].bit_count(), j))
+
+        haz = [((), solicitud.dominios)]  # (secciones elegidas en `orden`, dominios)
+        for nivel, j in enumerate(orden):
+            resto = tuple(orden[nivel + 1:])
+            hijos = []
+            for elegidas, dominios in haz:
+                self._fijar(orden, elegidas)
+                for seccion in solicitud.secciones_por_sigla[j]:
+                    if not (dominios[j] >> seccion.indice) & 1:
+                        continue
+                    if self.max_dias is not None and len(self.estado.dias.keys() | dias_de[seccion.indice]) > self.max_dias:
+                        self.stats['podadas_restriccion'] += 1
+                        continue
+                    nuevos = propagar(dominios, resto, compatibles[seccion.indice])
+                    if nuevos is None:
+                        self.stats['podadas_forward'] += 1
+                        continue
+                    self.stats['exploradas'] += 1
+                    self.estado.agregar(seccion, j)
+                    cota = self._cota_superior(resto)
+                    self.estado.quitar()
+                    hijos.append((-cota, tuple(s.indice for s in elegidas) + (seccion.indice,),
+                                  elegidas + (seccion,), nuevos))
+                self._deshacer_prefijo()
+            hijos.sort(key=lambda hijo: hijo[:2])
+            haz = [(elegidas, nuevos) for _, _, elegidas, nuevos in hijos[:self.ancho_haz]]
+            if not haz:
+                return
+
+        for elegidas, _ in haz:
+            self._fijar(orden, elegidas)
+            self._registrar_hoja()
+            self._deshacer_prefijo()
+        self._puntuar_hojas_pendientes()
+
+    def _fijar(self, orden, elegidas):
+        for j, seccion in zip(orden, elegidas):
+            self.asignadas[j] = seccion
+            self.estado.agregar(seccion, j)
+
+    def _sin_tiempo(self):
+        return time.time() - self.tiempo_inicio > self.max_tiempo
+
+    def _registrar_hoja(self):
+        # Los vecindarios vuelven a recorrer horarios ya vistos: se registran una vez
+        clave = tuple(seccion.posicion for seccion in self.asignadas)
+        if clave in self.vistas:
+            return
+        self.vistas.add(clave)
+        super()._registrar_hoja()
+
+
+class BusquedaExactaConRespaldo(BusquedaHeuristica):
+    """
+    Búsqueda exacta (el backtracking con poda) que, si no termina dentro de
+    `tiempo_limite`, sigue como `BusquedaHeuristica` por otro `tiempo_limite`
+    (sin pasar de `max_tiempo`). Es la que elige `elegir_motor` con 'auto'
+    cuando el árbol estimado es grande.
+    """
+
+    def __init__(self, solicitud, preferencias, **opciones):
+        super().__init__(solicitud, preferencias, **opciones)
+        self.fase_exacta = False
+
+    def iterar(self, prefijo=(), intervalo=None):
+        if prefijo:
+            raise ValueError('La búsqueda heurística no admite prefijos')
+        self.fase_exacta = True
+        try:
+            yield from BusquedaHorarios.iterar(self, intervalo=intervalo)
+        finally:
+            self.fase_exacta = False
+        if not self.timeout:
+            self.heuristica = False
+            return
+
+        # No terminó: el top-K parcial es el punto de partida de los vecindarios
+        self.timeout = False
+        self.vistas.update(datos['clave'] for datos in self.mejores_k.ordenados())
+        self.max_tiempo = min(time.time() - self.tiempo_inicio + self.tiempo_limite, self.max_tiempo_total)
+        yield from super().iterar(intervalo=intervalo)
+
+    def _registrar_hoja(self):
+        if self.fase_exacta:
+            # El backtracking no repite hojas: no hace falta recordarlas
+            BusquedaHorarios._registrar_hoja(self)
+        else:
+            super()._registrar_hoja()
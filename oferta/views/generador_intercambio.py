@@ -0,0 +1,104 @@
+# oferta/views/generador_intercambio.py
+"""
+Cambiar una sección de un horario ya armado
+-------------------------------------------
+Al editar un horario a mano (arrastrar una asignatura a otra sección) no hace
+falta volver a buscar: las demás secciones quedan fijas y solo varía una
+sigla. Las fijas y las candidatas se compilan juntas (`compilar_secciones`)
+con su `MatrizConflictos`, la misma de la búsqueda: una candidata es
+compatible si sus bits de compatibles incluyen a todas las fijas (misma
+jornada y ningún tramo de la máscara en común). Se puntúa agregándola a un
+`EstadoMetricas` que ya tiene las fijas y quitándola después.
+
+Se aplican las mismas restricciones duras que en la generación (ver
+`generador_restricciones`): se descartan las candidatas que no las cumplen,
+las fijas deben cumplirlas y 'max_dias' se verifica con los días del horario
+completo. El rango horario de la puntuación es el de la generación (las
+secciones de las siglas del horario que cumplen las restricciones), así que
+las puntuaciones son comparables con las del horario generado.
+"""
+
+from .generador_conflictos import MatrizConflictos
+from .generador_restricciones import cumple_restricciones, filtrar_secciones, normalizar_restricciones
+from .generador_utils import (
+    EstadoMetricas,
+    calcular_puntuacion_normalizada,
+    compilar_secciones,
+    detectar_rango_global,
+)
+
+
+def alternativas_para_sigla(snapshot, ids_fijos, sigla, preferencias, jornada=None, restricciones=None):
+    """
+    Secciones de `sigla` compatibles con las secciones `ids_fijos` del
+    `snapshot`, de mayor a menor puntuación del horario resultante (a igual
+    puntuación, por id). Las fijas que sean de `sigla` se ignoran: son las que
+    se reemplazan. `restricciones` son las ya normalizadas (ver
+    `normalizar_restricciones`). Retorna (alternativas, error), donde cada
+    alternativa es un dict {'seccion', 'puntuacion', 'metricas'}; si hay
+    error, es el mensaje a mostrar.
+    """
+    if restricciones is None:
+        restricciones = normalizar_restricciones(None)
+
+    fijas = []
+    for id_seccion in ids_fijos:
+        seccion = snapshot.seccion(id_seccion)
+        if seccion is None:
+            return None, f'La sección {id_seccion} no existe en la sede {snapshot.sede}'
+        if seccion.sigla != sigla:
+            if not cumple_restricciones(seccion, restricciones):
+                return None, f'La sección {id_seccion} de {seccion.sigla} no cumple las restricciones indicadas'
+            fijas.append(seccion)
+
+    if len({seccion.jornada for seccion in fijas}) > 1:
+        return None, 'Las secciones fijas son de jornadas distintas'
+
+    siglas = sorted({seccion.sigla for seccion in fijas} | {sigla})
+    todas = snapshot.por_sigla(siglas, jornada)
+    if sigla not in todas:
+        return None, f'No se encontraron secciones para {sigla} en la sede seleccionada'
+    por_sigla, sin_secciones = filtrar_secciones(todas, restricciones)
+    if sigla in sin_secciones:
+        return None, f'Ninguna sección de {sigla} cumple las restricciones indicadas'
+
+    # Mismo rango horario y mismo orden alfabético de siglas que la generación,
+    # para que las puntuaciones sean comparables
+    orden = {s: k for k, s in enumerate(siglas)}
+    preferencias = dict(preferencias)
+    preferencias['rango_inicio_min'], preferencias['rango_fin_max'] = detectar_rango_global(por_sigla)
+
+    por_sigla_fijas = {}
+    for seccion in fijas:
+        por_sigla_fijas.setdefault(seccion.sigla, []).append(seccion)
+    compiladas = compilar_secciones({**por_sigla_fijas, sigla: por_sigla[sigla]})
+    matriz = MatrizConflictos([s for secciones in compiladas.values() for s in secciones])
+
+    estado = EstadoMetricas()
+    ocupadas = 0  # bits de las fijas en la matriz
+    dias_fijos = set()
+    for otra, secciones in compiladas.items():
+        if otra == sigla:
+            continue
+        for seccion in secciones:
+            estado.agregar(seccion, orden[otra])
+            ocupadas |= 1 << seccion.indice
+            dias_fijos.update(dia for dia, _, _ in seccion.bloques)
+
+    max_dias = restricciones['max_dias']
+    alternativas = []
+    for seccion in compiladas[sigla]:
+        if matriz.compatibles[seccion.indice] & ocupadas != ocupadas:
+            continue
+        if max_dias is not None and len(dias_fijos.union(dia for dia, _, _ in seccion.bloques)) > max_dias:
+            continue
+        estado.agregar(seccion, orden[sigla])
+        metricas = estado.metricas()
+        estado.quitar()
+        alternativas.append({
+            'seccion': seccion.asignatura,
+            'puntuacion': calcular_puntuacion_normalizada(metricas, preferencias),
+            'metricas': metricas,
+        })
+    alternativas.sort(key=lambda alternativa: (-alternativa['puntuacion'], alternativa['seccion'].id))
+    return alternativas, None
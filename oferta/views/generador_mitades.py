@@ -0,0 +1,414 @@
+# oferta/views/generador_mitades.py
+"""
+Búsqueda por mitades (meet-in-the-middle)
+-----------------------------------------
+Alternativa al backtracking de un solo árbol para solicitudes con muchas
+siglas:
+
+1. Las siglas se reparten en dos mitades de tamaño de dominio parecido.
+2. Se enumeran las asignaciones parciales sin choques de cada mitad. Se hace
+   con forward checking sobre todas las siglas, así que una parcial que deja
+   sin secciones a una sigla de la otra mitad se descarta de inmediato.
+3. Las parciales derechas se agrupan por jornada y máscara de ocupación. Un
+   índice invertido guarda, por cada bit de la máscara, el bitset de los
+   grupos que lo ocupan. Los grupos compatibles con una máscara izquierda son
+   los que no están en ninguno de sus bits (un OR por bit, sin recorrer pares).
+4. Las parciales izquierdas se recorren de mayor a menor cota superior de
+   puntuación. Apenas la cota de una no alcanza al top-K, se detiene todo.
+
+Las hojas se registran con la misma maquinaria que `BusquedaHorarios`
+(top-K, lotes, recolector, conteo de clases equivalentes), así que el
+resultado es idéntico.
+
+Cada par cuesta más que una hoja del backtracking, y la cota solo poda a nivel
+de la mitad izquierda. Por eso conviene cuando el árbol del backtracking está
+lleno de ramas que mueren cerca de las hojas, es decir, cuando hay muchas
+menos combinaciones válidas que las que predicen los dominios. `elegir_motor`
+lo detecta con una estimación sobre los dominios y un conteo exacto (ver
+`generador_conteo`), sin enumerar nada si el conteo descarta las mitades.
+"""
+
+import math
+import time
+
+import numpy as np
+
+from .generador_conflictos import propagar
+from .generador_conteo import contar_combinaciones
+from .generador_utils import MAX_TIEMPO_GENERACION, BusquedaHorarios
+
+# Motores disponibles para `generar_combinaciones_optimizado`
+MOTORES = ('auto', 'backtracking', 'mitades', 'componentes', 'heuristico')
+
+# Motor que 'auto' elige para árboles estimados grandes (no se pide por nombre):
+# el backtracking, con la heurística de respaldo si no termina a tiempo
+MOTOR_CON_RESPALDO = 'exacto_con_respaldo'
+
+# Nodos por segundo del backtracking. Con 'auto', si el árbol estimado (sin
+# contar la poda por cota) no se alcanza a recorrer en MAX_TIEMPO_GENERACION,
+# la búsqueda exacta se corta antes y sigue la heurística (MOTOR_CON_RESPALDO)
+NODOS_POR_SEGUNDO = 25_000
+
+# Siglas mínimas para considerar la búsqueda por mitades
+MIN_SIGLAS_MITADES = 6
+
+# Por debajo de estos nodos estimados el backtracking es instantáneo y no se sondea
+MIN_NODOS_MITADES = 50_000
+
+# Nodos máximos al enumerar las mitades para decidir (si se superan, no se usan)
+PRESUPUESTO_SONDEO = 50_000
+
+# Se usa la búsqueda por mitades si las combinaciones válidas son menos que esta
+# fracción de las que predice la estimación por pares: el árbol del backtracking
+# está lleno de ramas muertas que el forward checking no ve a tiempo
+FRACCION_HOJAS = 0.05
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# ESTIMACIÓN DE COSTO
+# ════════════════════════════════════════════════════════════════════════════════
+def dividir_siglas(solicitud):
+    """
+    Reparte las siglas en dos mitades con producto de dominios parecido
+    (greedy: de mayor a menor dominio, a la mitad con menor producto; a igual
+    producto, a la que tiene menos siglas). Con dos siglas o más, ninguna
+    mitad queda vacía: las siglas de una sola sección no suben el producto.
+    """
+    tamanos = [dominio.bit_count() for dominio in solicitud.dominios]
+    izquierda, derecha = [], []
+    log_izquierda = log_derecha = 0.0
+    for j in sorted(range(solicitud.total_siglas), key=lambda j: (-tamanos[j], j)):
+        if (log_izquierda, len(izquierda)) <= (log_derecha, len(derecha)):
+            izquierda.append(j)
+            log_izquierda += math.log(max(tamanos[j], 1))
+        else:
+            derecha.append(j)
+            log_derecha += math.log(max(tamanos[j], 1))
+    return sorted(izquierda), sorted(derecha)
+
+
+def estimar_backtracking(solicitud):
+    """
+    (nodos, hojas) esperados del backtracking según los tamaños de dominio y
+    la fracción de pares de secciones compatibles entre cada par de siglas,
+    suponiendo pares independientes. Se estima por jornada, porque la jornada
+    es común a toda la combinación y no un conflicto independiente por par.
+    """
+    matriz = solicitud.matriz.matriz
+    por_jornada = {}
+    for seccion in solicitud.secciones:
+        grupos = por_jornada.setdefault(seccion.jornada, [[] for _ in range(solicitud.total_siglas)])
+        grupos[solicitud.sigla_de[seccion.indice]].append(seccion.indice)
+
+    nodos = hojas = 0.0
+    for grupos in por_jornada.values():
+        if not all(grupos):
+            continue
+        orden = sorted(range(len(grupos)), key=lambda j: (len(grupos[j]), j))
+        nivel = 1.0
+        for d, j in enumerate(orden):
+            nivel *= len(grupos[j])
+            for k in orden[:d]:
+                nivel *= 1.0 - float(matriz[np.ix_(grupos[j], grupos[k])].mean())
+            nodos += nivel
+        hojas += nivel
+    return nodos, hojas
+
+
+def elegir_motor(solicitud, motor='auto', max_dias=None):
+    """
+    Motor para `solicitud`. Con 'auto', si la estimación por pares predice un
+    árbol grande y las siglas forman grupos que no comparten tramos, se
+    enumeran los grupos por separado (con presupuesto) y se usa la búsqueda
+    por componentes (ver `generador_componentes`), salvo con `max_dias`, que
+    acopla a todos los grupos por los días ocupados. Si no, se cuentan
+    exactamente las combinaciones válidas (de clases). Si son muchas menos
+    que las predichas, conviene la búsqueda por mitades y se enumeran (con
+    presupuesto) para reutilizarlas; si el conteo no termina, decide el conteo
+    con el índice de las mitades. Si no, y el árbol estimado no se alcanza a
+    recorrer en `MAX_TIEMPO_GENERACION`, se usa `MOTOR_CON_RESPALDO`: la
+    estimación no cuenta la poda, así que primero se intenta la búsqueda
+    exacta y solo si no termina a tiempo se pasa a la heurística (ver
+    `generador_heuristico`).
+    """
+    if motor not in MOTORES:
+        raise ValueError(f'Motor de búsqueda desconocido: {motor}')
+    if motor != 'auto':
+        return motor
+    from .generador_componentes import MIN_NODOS_COMPONENTES, preparar_componentes
+
+    nodos, hojas = estimar_backtracking(solicitud)
+    if max_dias is None and nodos >= MIN_NODOS_COMPONENTES:
+        preparacion = preparar_componentes(solicitud, presupuesto=PRESUPUESTO_SONDEO)
+        if preparacion is not None:
+            solicitud.componentes = preparacion
+            return 'componentes'
+    if solicitud.total_siglas >= MIN_SIGLAS_MITADES and nodos >= MIN_NODOS_MITADES:
+        validas = contar_combinaciones(solicitud, concretas=False)
+        if validas is None or validas < FRACCION_HOJAS * hojas:
+            preparacion = preparar_mitades(solicitud, presupuesto=PRESUPUESTO_SONDEO)
+            if preparacion is not None and (
+                validas is not None or contar_pares(preparacion) < FRACCION_HOJAS * hojas
+            ):
+                solicitud.mitades = preparacion
+                return 'mitades'
+    if nodos > NODOS_POR_SEGUNDO * MAX_TIEMPO_GENERACION:
+        return MOTOR_CON_RESPALDO
+    return 'backtracking'
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# ENUMERACIÓN E ÍNDICE DE LAS MITADES
+# ════════════════════════════════════════════════════════════════════════════════
+class ParcialMitad:
+    """Asignación sin choques de las siglas de una mitad."""
+    __slots__ = ('secciones', 'mascara', 'jornada', 'cota')
+
+    def __init__(self, secciones, mascara, jornada):
+        self.secciones = secciones  # SeccionCompilada, en el orden de las siglas de la mitad
+        self.mascara = mascara
+        self.jornada = jornada
+        self.cota = None
+
+
+class PresupuestoAgotado(Exception):
+    """Se superó el presupuesto de nodos o el tiempo al enumerar una mitad."""
+
+
+class PreparacionMitades:
+    """
+    Mitades enumeradas de una solicitud y el índice de la derecha. Se calcula
+    una vez (al elegir el motor o al buscar) y queda en `solicitud.mitades`.
+    """
+
+    def __init__(self, izquierda, derecha, parciales_izquierda, parciales_derecha, nodos):
+        self.izquierda = izquierda
+        self.derecha = derecha
+        self.parciales_izquierda = parciales_izquierda
+        self.parciales_derecha = parciales_derecha
+        self.nodos = nodos
+        self.grupos, self.indice_bits = indexar(parciales_derecha)
+        # Por jornada, {cantidad de parciales: bitset de los grupos de ese tamaño}
+        self.por_tamano = {}
+        for jornada, lista in self.grupos.items():
+            tamanos = self.por_tamano.setdefault(jornada, {})
+            for numero, miembros in enumerate(lista):
+                tamanos[len(miembros)] = tamanos.get(len(miembros), 0) | (1 << numero)
+
+
+def enumerar_mitad(solicitud, siglas, contador, presupuesto=None, tiempo_inicio=None,
+                   max_tiempo=MAX_TIEMPO_GENERACION):
+    """
+    Parciales sin choques de `siglas`, con forward checking sobre todas las
+    siglas de la solicitud (también las de la otra mitad). `contador` es una
+    lista de un elemento con los nodos visitados; lanza `PresupuestoAgotado`
+    si supera `presupuesto` o `max_tiempo` segundos desde `tiempo_inicio`.
+    """
+    compatibles = solicitud.matriz.compatibles
+    secciones_por_sigla = solicitud.secciones_por_sigla
+    parciales = []
+    elegidas = []
+
+    def recorrer(nivel, dominios, pendientes):
+        contador[0] += 1
+        if presupuesto is not None and contador[0] > presupuesto:
+            raise PresupuestoAgotado()
+        if tiempo_inicio is not None and time.time() - tiempo_inicio > max_tiempo:
+            raise PresupuestoAgotado()
+        if nivel == len(siglas):
+            mascara = 0
+            for seccion in elegidas:
+                mascara |= seccion.mascara
+            parciales.append(ParcialMitad(tuple(elegidas), mascara, elegidas[0].jornada))
+            return
+        j = siglas[nivel]
+        resto = tuple(k for k in pendientes if k != j)
+        dominio = dominios[j]
+        for seccion in secciones_por_sigla[j]:
+            if not (dominio >> seccion.indice) & 1:
+                continue
+            nuevos = propagar(dominios, resto, compatibles[seccion.indice])
+            if nuevos is None:
+                continue
+            elegidas.append(seccion)
+            recorrer(nivel + 1, nuevos, resto)
+            elegidas.pop()
+
+    recorrer(0, solicitud.dominios, tuple(range(solicitud.total_siglas)))
+    return parciales
+
+
+def preparar_mitades(solicitud, presupuesto=None, tiempo_inicio=None, max_tiempo=MAX_TIEMPO_GENERACION):
+    """`PreparacionMitades` de `solicitud`, o None si se agotó el presupuesto o el tiempo."""
+    izquierda, derecha = dividir_siglas(solicitud)
+    contador = [0]
+    try:
+        parciales_izquierda = enumerar_mitad(solicitud, izquierda, contador, presupuesto, tiempo_inicio, max_tiempo)
+        parciales_derecha = enumerar_mitad(solicitud, derecha, contador, presupuesto, tiempo_inicio, max_tiempo)
+    except PresupuestoAgotado:
+        return None
+    return PreparacionMitades(izquierda, derecha, parciales_izquierda, parciales_derecha, contador[0])
+
+
+def indexar(parciales):
+    """
+    Agrupa las parciales por (jornada, máscara) y arma, por jornada, el
+    índice invertido {bit: bitset de grupos que lo ocupan}.
+    """
+    por_clave = {}
+    for parcial in parciales:
+        por_clave.setdefault((parcial.jornada, parcial.mascara), []).append(parcial)
+
+    grupos = {}       # jornada: [lista de parciales por grupo]
+    indice_bits = {}  # jornada: {bit: bitset de grupos}
+    for (jornada, mascara), miembros in por_clave.items():
+        lista = grupos.setdefault(jornada, [])
+        bits = indice_bits.setdefault(jornada, {})
+        numero = len(lista)
+        lista.append(miembros)
+        resto = mascara
+        while resto:
+            bajo = resto & -resto
+            bit = bajo.bit_length() - 1
+            bits[bit] = bits.get(bit, 0) | (1 << numero)
+            resto ^= bajo
+    return grupos, indice_bits
+
+
+def grupos_libres(preparacion, jornada, mascara):
+    """Bitset de los grupos derechos de la jornada que no ocupan ningún bit de `mascara`."""
+    lista = preparacion.grupos.get(jornada)
+    if not lista:
+        return 0
+    bits = preparacion.indice_bits[jornada]
+    ocupados = 0
+    resto = mascara
+    while resto:
+        bajo = resto & -resto
+        ocupados |= bits.get(bajo.bit_length() - 1, 0)
+        resto ^= bajo
+    return ((1 << len(lista)) - 1) & ~ocupados
+
+
+def grupos_compatibles(preparacion, jornada, mascara):
+    """Grupos derechos de la misma jornada que no ocupan ningún bit de `mascara`."""
+    lista = preparacion.grupos.get(jornada)
+    libres = grupos_libres(preparacion, jornada, mascara)
+    compatibles = []
+    while libres:
+        bajo = libres & -libres
+        compatibles.append(lista[bajo.bit_length() - 1])
+        libres ^= bajo
+    return compatibles
+
+
+def contar_pares(preparacion):
+    """Combinaciones válidas (de clases) que une el índice, sin puntuarlas."""
+    por_mascara = {}
+    for parcial in preparacion.parciales_izquierda:
+        clave = (parcial.jornada, parcial.mascara)
+        por_mascara[clave] = por_mascara.get(clave, 0) + 1
+    total = 0
+    for (jornada, mascara), cantidad in por_mascara.items():
+        libres = grupos_libres(preparacion, jornada, mascara)
+        if libres:
+            total += cantidad * sum(
+                tamano * (libres & grupos).bit_count()
+                for tamano, grupos in preparacion.por_tamano[jornada].items()
+            )
+    return total
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# MOTOR
+# ════════════════════════════════════════════════════════════════════════════════
+class BusquedaPorMitades(BusquedaHorarios):
+    """
+    Misma interfaz y mismos resultados que `BusquedaHorarios`, con la
+    estrategia de meet-in-the-middle descrita en el módulo. No admite
+    prefijos (la búsqueda paralela usa siempre el backtracking).
+    """
+
+    def iterar(self, prefijo=(), intervalo=None):
+        if prefijo:
+            raise ValueError('La búsqueda por mitades no admite prefijos')
+        solicitud = self.solicitud
+        self.timeout = False
+        if solicitud.total_siglas < 2:
+            yield from super().iterar(intervalo=intervalo)
+            return
+
+        preparacion = solicitud.mitades
+        if preparacion is None:
+            preparacion = preparar_mitades(solicitud, tiempo_inicio=self.tiempo_inicio, max_tiempo=self.max_tiempo)
+            if preparacion is None:
+                self.timeout = True
+                return
+            solicitud.mitades = preparacion
+        self.stats['exploradas'] += preparacion.nodos
+        izquierda, derecha = preparacion.izquierda, preparacion.derecha
+
+        version_entregada = self.version
+        ultima_entrega = time.time()
+        try:
+            parciales_izquierda = list(preparacion.parciales_izquierda)
+            if self.poda_cota:
+                for parcial in parciales_izquierda:
+                    self._agregar(izquierda, parcial.secciones)
+                    parcial.cota = self._cota_superior(derecha)
+                    self._quitar(izquierda)
+                parciales_izquierda.sort(key=lambda p: -p.cota)
+
+            compatibles_por_mascara = {}
+            for parcial in parciales_izquierda:
+                umbral = self.umbral() if self.poda_cota else None
+                if umbral is not None and parcial.cota < umbral:
+                    # Las que siguen tienen cota aún menor
+                    self.stats['podadas_cota'] += 1
+                    break
+
+                clave_grupo = (parcial.jornada, parcial.mascara)
+                candidatos = compatibles_por_mascara.get(clave_grupo)
+                if candidatos is None:
+                    candidatos = grupos_compatibles(preparacion, *clave_grupo)
+                    compatibles_por_mascara[clave_grupo] = candidatos
+
+                self._agregar(izquierda, parcial.secciones)
+                if self.max_dias is not None and len(self.estado.dias) > self.max_dias:
+                    self.stats['podadas_restriccion'] += 1
+                    self._quitar(izquierda)
+                    continue
+                for grupo in candidatos:
+                    for otra in grupo:
+                        self._evaluar_par(derecha, otra)
+                self._quitar(izquierda)
+
+                ahora = time.time()
+                if ahora - self.tiempo_inicio > self.max_tiempo:
+                    self.timeout = True
+                    break
+                if self.version != version_entregada or (
+                    intervalo is not None and ahora - ultima_entrega >= intervalo
+                ):
+                    version_entregada = self.version
+                    ultima_entrega = ahora
+                    yield self.mejores_k.ordenados()
+
+            self._puntuar_hojas_pendientes()
+            if self.version != version_entregada:
+                yield self.mejores_k.ordenados()
+        finally:
+            self._deshacer_prefijo()
+
+    def _evaluar_par(self, derecha, parcial):
+        self.stats['exploradas'] += 1
+        if self.max_dias is not None:
+            dias = set(self.estado.dias)
+            for seccion in parcial.secciones:
+                dias |= self.solicitud.dias_de[seccion.indice]
+            if len(dias) > self.max_dias:
+                self.stats['podadas_restriccion'] += 1
+                return
+        self._agregar(derecha, parcial.secciones)
+        self._registrar_hoja()
+        self._quitar(derecha)
@@ -0,0 +1,99 @@
+# oferta/views/generador_multiperfil.py
+"""
+Varios perfiles de preferencias en una sola búsqueda
+----------------------------------------------------
+Qué combinaciones son válidas no depende de las preferencias, así que para
+comparar perfiles (por ejemplo 'entrar_temprano' contra 'salir_temprano') basta
+con recorrer el árbol una vez. Cada hoja se puntúa con todos los perfiles y
+cada uno conserva su propio top-K.
+
+La poda por cota se adapta: un subárbol se descarta solo si su cota no alcanza
+al top-K de ningún perfil. Con N perfiles el recorrido es uno solo, y lo único
+que se multiplica es la puntuación de las hojas.
+"""
+
+import time
+
+from .generador_utils import (
+    MAX_TIEMPO_GENERACION,
+    BusquedaHorarios,
+    MejoresK,
+    SolicitudCompilada,
+    calcular_puntuacion_normalizada,
+    cota_superior_puntuacion,
+    detectar_rango_global,
+)
+
+
+class BusquedaMultiperfil(BusquedaHorarios):
+    """
+    Backtracking de `BusquedaHorarios` con un top-K por perfil de preferencias
+    (`mejores_por_perfil`, en el orden de `perfiles`).
+    """
+
+    def __init__(self, solicitud, perfiles, max_resultados=10, **opciones):
+        super().__init__(solicitud, perfiles[0], max_resultados=max_resultados, recolector=self._puntuar,
+                         **opciones)
+        self.perfiles = perfiles
+        self.mejores_por_perfil = [MejoresK(max_resultados) for _ in perfiles]
+
+    def _puntuar(self, clave, metricas):
+        for perfil, mejores in zip(self.perfiles, self.mejores_por_perfil):
+            puntuacion = calcular_puntuacion_normalizada(metricas, perfil)
+            if mejores.admite(puntuacion, clave):
+                mejores.agregar(puntuacion, clave, {
+                    'clave': clave,
+                    'puntuacion': puntuacion,
+                    'metricas': metricas
+                })
+                self.version += 1
+
+    def _podar_por_cota(self, pendientes):
+        """PODA 1 con varios perfiles: solo si el subárbol no sirve para ninguno."""
+        if not self.poda_cota or not self.estado.total:
+            return False
+        parcial = self.estado.parcial()
+        restante = self.solicitud.resumen_de(pendientes)
+        for perfil, mejores in zip(self.perfiles, self.mejores_por_perfil):
+            umbral = mejores.umbral()
+            if umbral is None:
+                return False
+            if cota_superior_puntuacion(parcial, restante, perfil, self.solicitud.total_siglas) >= umbral:
+                return False
+        self.stats['podadas_cota'] += 1
+        return True
+
+
+def generar_combinaciones_multiperfil(por_sigla, perfiles, max_resultados=10, estadisticas=None,
+                                      poda_cota=True, orden_siglas='menos_secciones', alternativas=False,
+                                      max_dias=None, conflictos=None, max_tiempo=MAX_TIEMPO_GENERACION,
+                                      solicitud=None):
+    """
+    Las mejores combinaciones para cada perfil de `perfiles` (dicts de
+    preferencias), con una sola búsqueda. Retorna una lista de resultados por
+    perfil, cada una igual a la que daría `generar_combinaciones_optimizado`
+    con ese perfil y el backtracking. `conflictos`, `max_tiempo` y `solicitud`
+    son como en `generar_combinaciones_optimizado`. Si se entrega el dict
+    `estadisticas`, se actualiza con los contadores.
+    """
+    tiempo_inicio = time.time()
+    if solicitud is None:
+        solicitud = SolicitudCompilada(por_sigla, conflictos=conflictos)
+    rango = detectar_rango_global(por_sigla)
+    for perfil in perfiles:
+        perfil['rango_inicio_min'], perfil['rango_fin_max'] = rango
+
+    busqueda = BusquedaMultiperfil(
+        solicitud, perfiles, max_resultados=max_resultados, poda_cota=poda_cota,
+        orden_siglas=orden_siglas, tiempo_inicio=tiempo_inicio, max_dias=max_dias,
+        max_tiempo=min(max_tiempo, MAX_TIEMPO_GENERACION),
+    )
+    timeout_alcanzado = busqueda.explorar()
+    if estadisticas is not None:
+        estadisticas.update(busqueda.stats, tiempo=time.time() - tiempo_inicio, timeout=timeout_alcanzado,
+                            perfiles=len(perfiles))
+
+    return [
+        solicitud.horarios_de(mejores.ordenados(), max_resultados, alternativas)
+        for mejores in busqueda.mejores_por_perfil
+    ]
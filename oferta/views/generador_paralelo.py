@@ -0,0 +1,112 @@
+# oferta/views/generador_paralelo.py
+"""
+Búsqueda paralela del generador de horarios
+-------------------------------------------
+El árbol de búsqueda se parte en las primeras una o dos siglas (elegidas con
+el mismo orden dinámico que la búsqueda serial): cada prefijo de secciones es
+una tarea independiente que un proceso del pool explora con su propio top-K.
+
+Los procesos comparten:
+- El instante de inicio, de modo que el límite de tiempo es el mismo para todos.
+- La peor puntuación de los top-K ya llenos (`multiprocessing.Value`), que sirve
+  como umbral de poda global para el branch-and-bound.
+
+Al final los top-K parciales se fusionan con el mismo desempate que usa el
+motor serial, por lo que el resultado es idéntico.
+
+Requiere el método de arranque `fork`: los procesos heredan la solicitud ya
+compilada sin serializarla. Donde no existe, se usa la búsqueda serial.
+"""
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .generador_conflictos import propagar
+from .generador_utils import ESTRATEGIAS_ORDEN, BusquedaHorarios, MejoresK, nuevas_estadisticas
+
+# Tareas por proceso a partir de las cuales basta con partir en una sigla
+TAREAS_POR_PROCESO = 2
+
+# Estado de cada proceso del pool (lo fija `_inicializar_proceso`)
+_contexto = {}
+
+
+def paralelo_disponible():
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+def dividir_en_prefijos(solicitud, orden_siglas, minimo_tareas):
+    """
+    Prefijos de una o dos secciones que cubren todo el árbol. Se baja al
+    segundo nivel solo si el primero deja menos de `minimo_tareas` ramas.
+    Los prefijos cuya propagación vacía algún dominio se omiten.
+    """
+    elegir_sigla = ESTRATEGIAS_ORDEN[orden_siglas]
+    prefijos = [((), tuple(range(solicitud.total_siglas)), solicitud.dominios)]
+
+    for _ in range(min(2, solicitud.total_siglas)):
+        if len(prefijos) >= minimo_tareas:
+            break
+        siguientes = []
+        for prefijo, pendientes, dominios in prefijos:
+            if not pendientes:
+                siguientes.append((prefijo, pendientes, dominios))
+                continue
+            indice = elegir_sigla(pendientes, dominios, solicitud.densidad)
+            resto = tuple(j for j in pendientes if j != indice)
+            for seccion in solicitud.secciones_por_sigla[indice]:
+                if not (dominios[indice] >> seccion.indice) & 1:
+                    continue
+                nuevos = propagar(dominios, resto, solicitud.matriz.compatibles[seccion.indice])
+                if nuevos is not None:
+                    siguientes.append((prefijo + (seccion.indice,), resto, nuevos))
+        prefijos = siguientes
+
+    return [prefijo for prefijo, _, _ in prefijos]
+
+
+def _inicializar_proceso(solicitud, preferencias, opciones, tiempo_inicio, umbral):
+    _contexto.update(
+        solicitud=solicitud, preferencias=preferencias, opciones=opciones,
+        tiempo_inicio=tiempo_inicio, umbral=umbral,
+    )
+
+
+def _explorar_prefijo(prefijo):
+    busqueda = BusquedaHorarios(
+        _contexto['solicitud'], _contexto['preferencias'],
+        tiempo_inicio=_contexto['tiempo_inicio'], umbral_compartido=_contexto['umbral'],
+        **_contexto['opciones']
+    )
+    timeout = busqueda.explorar(prefijo)
+    return busqueda.mejores_k.items(), busqueda.stats, timeout
+
+
+def buscar_en_paralelo(solicitud, preferencias, procesos, tiempo_inicio, **opciones):
+    """
+    Reparte la búsqueda de `solicitud` en `procesos` procesos. Retorna
+    (mejores_k fusionado, estadísticas sumadas, timeout alcanzado).
+    """
+    prefijos = dividir_en_prefijos(
+        solicitud, opciones.get('orden_siglas', 'menos_secciones'), procesos * TAREAS_POR_PROCESO
+    )
+    mejores_k = MejoresK(opciones.get('max_resultados', 10))
+    stats = nuevas_estadisticas()
+    timeout_alcanzado = False
+    if not prefijos:
+        return mejores_k, stats, timeout_alcanzado
+
+    contexto = multiprocessing.get_context('fork')
+    umbral = contexto.Value('d', float('-inf'))
+    with ProcessPoolExecutor(
+        max_workers=min(procesos, len(prefijos)), mp_context=contexto,
+        initializer=_inicializar_proceso,
+        initargs=(solicitud, preferencias, opciones, tiempo_inicio, umbral),
+    ) as pool:
+        for items, parciales, timeout in pool.map(_explorar_prefijo, prefijos):
+            mejores_k.fusionar(items)
+            for campo, valor in parciales.items():
+                stats[campo] += valor
+            timeout_alcanzado = timeout_alcanzado or timeout
+
+    return mejores_k, stats, timeout_alcanzado
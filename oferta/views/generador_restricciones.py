@@ -0,0 +1,97 @@
+# oferta/views/generador_restricciones.py
+"""
+Restricciones duras del generador de horarios
+---------------------------------------------
+A diferencia de las preferencias, que solo cambian la puntuación, una
+restricción descarta combinaciones. Se piden en `restricciones` dentro del
+cuerpo de la solicitud:
+
+- 'hora_inicio_min': "HH:MM". Ninguna clase empieza antes.
+- 'hora_fin_max': "HH:MM". Ninguna clase termina después.
+- 'dias_libres': días sin clases (mismos nombres que en la oferta).
+- 'max_dias': máximo de días con clases.
+
+Las tres primeras dependen de cada sección por separado, así que se aplican
+quitando secciones antes de compilar la solicitud (`filtrar_secciones`).
+'max_dias' depende de la combinación y se verifica dentro de la búsqueda con
+los días ya ocupados (ver `BusquedaHorarios`).
+"""
+
+from .generador_utils import datos_de_seccion
+
+
+def _minutos(texto, campo):
+    try:
+        horas, minutos = str(texto).split(':')
+        horas, minutos = int(horas), int(minutos)
+    except ValueError:
+        raise ValueError(f"'{campo}' debe tener el formato HH:MM")
+    if not (0 <= horas < 24 and 0 <= minutos < 60):
+        raise ValueError(f"'{campo}' no es una hora válida")
+    return horas * 60 + minutos
+
+
+def normalizar_restricciones(restricciones):
+    """
+    Valida `restricciones` (dict del cuerpo de la solicitud) y las retorna con
+    horas en minutos y días como conjunto. Lanza ValueError con un mensaje
+    para el usuario si alguna es inválida.
+    """
+    restricciones = restricciones or {}
+    if not isinstance(restricciones, dict):
+        raise ValueError('Las restricciones deben ser un objeto')
+
+    normalizadas = {'inicio_min': None, 'fin_max': None, 'dias_libres': frozenset(), 'max_dias': None}
+    if restricciones.get('hora_inicio_min'):
+        normalizadas['inicio_min'] = _minutos(restricciones['hora_inicio_min'], 'hora_inicio_min')
+    if restricciones.get('hora_fin_max'):
+        normalizadas['fin_max'] = _minutos(restricciones['hora_fin_max'], 'hora_fin_max')
+    if (normalizadas['inicio_min'] is not None and normalizadas['fin_max'] is not None
+            and normalizadas['inicio_min'] >= normalizadas['fin_max']):
+        raise ValueError("'hora_inicio_min' debe ser anterior a 'hora_fin_max'")
+
+    dias_libres = restricciones.get('dias_libres') or []
+    if not isinstance(dias_libres, list):
+        raise ValueError("'dias_libres' debe ser una lista de días")
+    normalizadas['dias_libres'] = frozenset(dias_libres)
+
+    max_dias = restricciones.get('max_dias')
+    if max_dias is not None:
+        if isinstance(max_dias, bool) or not isinstance(max_dias, int) or max_dias < 1:
+            raise ValueError("'max_dias' debe ser un entero mayor que cero")
+        normalizadas['max_dias'] = max_dias
+    return normalizadas
+
+
+def cumple_restricciones(seccion, restricciones):
+    """Indica si una sección respeta las restricciones que no dependen del resto."""
+    inicio_min = restricciones['inicio_min']
+    fin_max = restricciones['fin_max']
+    dias_libres = restricciones['dias_libres']
+    _, _, bloques = datos_de_seccion(seccion)
+    for dia, inicio, fin in bloques:
+        if dia in dias_libres:
+            return False
+        if inicio_min is not None and inicio < inicio_min:
+            return False
+        if fin_max is not None and fin > fin_max:
+            return False
+    if restricciones['max_dias'] is not None and len({dia for dia, _, _ in bloques}) > restricciones['max_dias']:
+        return False
+    return True
+
+
+def filtrar_secciones(por_sigla, restricciones):
+    """
+    `por_sigla` sin las secciones que violan alguna restricción. Retorna
+    (por_sigla filtrado, siglas que quedaron sin secciones).
+    """
+    filtrado = {}
+    sin_secciones = []
+    for sigla, secciones in por_sigla.items():
+        validas = [s for s in secciones if cumple_restricciones(s, restricciones)]
+        if validas:
+            filtrado[sigla] = validas
+        else:
+            sin_secciones.append(sigla)
+    return filtrado, sin_secciones
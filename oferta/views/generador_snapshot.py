@@ -0,0 +1,402 @@
+# oferta/views/generador_snapshot.py
+"""
+Snapshot compilado de la oferta de una sede
+-------------------------------------------
+El generador no necesita instancias de modelo: le basta con la sigla, la
+jornada, si la sección es virtual y sus bloques en minutos. El snapshot se
+arma con dos consultas `values_list` (secciones y horarios) y guarda todo en
+arrays planos:
+
+- Secciones ordenadas por sigla y luego por id.
+- Bloques horarios indexados por sección.
+
+Los registros `SeccionOferta` (`__slots__`) se crean solo para las siglas de
+cada solicitud.
+
+Para que los procesos de gunicorn compartan una sola copia, el snapshot se
+publica como un archivo binario versionado por sede (`publicar_snapshot`).
+Cada proceso lo abre con mmap de solo lectura, sin copiarlo. El archivo se
+escribe en uno temporal y se renombra, así que un lector nunca ve uno a
+medio escribir. Al cambiar la versión de la oferta (`VersionOferta`, al
+recargarla o al editar una sección), se publica el archivo de la nueva
+versión tras el commit; como el nombre cambia, los procesos abren el nuevo en
+su próxima solicitud.
+
+La búsqueda corre sobre los registros; los modelos `Asignatura` se cargan
+solo para serializar el top-K final (ver `con_modelos`).
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils.text import slugify
+
+from ..models import Asignatura, Horario, VersionOferta
+from .generador_utils import minutos_del_dia
+
+# Sedes cuyo snapshot se mantiene abierto por proceso
+MAX_SNAPSHOTS = 8
+
+# Formato de archivo: MAGIA, largo del encabezado (uint32), encabezado JSON y
+# los arrays, cada uno alineado a ALINEACION bytes
+MAGIA = b'MHSNAP01'
+ALINEACION = 8
+
+ARRAYS = {
+    'ids': np.int64,            # id de Asignatura por sección
+    'jornada': np.int16,        # código de jornada por sección
+    'virtual': np.uint8,        # 1 si la sección es virtual sincrónica
+    'sigla_desde': np.int32,    # secciones de la sigla k: [sigla_desde[k], sigla_desde[k+1])
+    'bloques_desde': np.int32,  # bloques de la sección i: [bloques_desde[i], bloques_desde[i+1])
+    'bloque_dia': np.int16,     # código de día por bloque
+    'bloque_inicio': np.int16,  # minutos desde la medianoche
+    'bloque_fin': np.int16,
+}
+
+
+class SeccionOferta:
+    """Sección de la oferta compilada para el generador (sin ORM)."""
+    __slots__ = ('id', 'sigla', 'jornada', 'virtual', 'bloques')
+
+    def __init__(self, id, sigla, jornada, virtual, bloques=()):
+        self.id = id
+        self.sigla = sigla
+        self.jornada = jornada    # código entero (ver `SnapshotOferta.jornadas`)
+        self.virtual = virtual
+        self.bloques = bloques    # ((dia, inicio_min, fin_min), ...)
+
+
+class SnapshotOferta:
+    """
+    Oferta de una sede en arrays (en memoria o mapeados desde archivo). Las
+    siglas, jornadas y días se guardan como listas de nombres indexadas por
+    código.
+    """
+
+    def __init__(self, sede, version, siglas, jornadas, dias, arrays, origen=None):
+        self.sede = sede
+        self.version = version
+        self.siglas = siglas
+        self.jornadas = jornadas
+        self.dias = dias
+        self.arrays = arrays
+        self.origen = origen  # mmap del archivo, si viene de uno (se mantiene abierto)
+        self._indice_sigla = {sigla: k for k, sigla in enumerate(siglas)}
+        self._registros = {}
+        self._sigla_de_id = None
+        self._candado = threading.Lock()
+
+    def __len__(self):
+        return len(self.arrays['ids'])
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+    def secciones_de(self, sigla):
+        """Registros `SeccionOferta` de una sigla (se crean una vez y se reutilizan)."""
+        registros = self._registros.get(sigla)
+        if registros is not None:
+            return registros
+
+        k = self._indice_sigla.get(sigla)
+        registros = []
+        if k is not None:
+            a = self.arrays
+            desde, hasta = int(a['sigla_desde'][k]), int(a['sigla_desde'][k + 1])
+            inicio_bloques = a['bloques_desde'][desde:hasta + 1].tolist()
+            ids = a['ids'][desde:hasta].tolist()
+            jornadas = a['jornada'][desde:hasta].tolist()
+            virtuales = a['virtual'][desde:hasta].tolist()
+            b0, b1 = inicio_bloques[0], inicio_bloques[-1]
+            dias = [self.dias[d] for d in a['bloque_dia'][b0:b1].tolist()]
+            inicios = a['bloque_inicio'][b0:b1].tolist()
+            fines = a['bloque_fin'][b0:b1].tolist()
+            for i in range(hasta - desde):
+                bloques = tuple(
+                    (dias[b - b0], inicios[b - b0], fines[b - b0])
+                    for b in range(inicio_bloques[i], inicio_bloques[i + 1])
+                )
+                registros.append(SeccionOferta(ids[i], sigla, jornadas[i], bool(virtuales[i]), bloques))
+
+        with self._candado:
+            self._registros[sigla] = registros
+        return registros
+
+    def seccion(self, id_seccion):
+        """Registro `SeccionOferta` con ese id de `Asignatura`, o None si no está."""
+        if self._sigla_de_id is None:
+            desde = self.arrays['sigla_desde'].tolist()
+            ids = self.arrays['ids'].tolist()
+            sigla_de_id = {
+                id_asig: sigla
+                for k, sigla in enumerate(self.siglas)
+                for id_asig in ids[desde[k]:desde[k + 1]]
+            }
+            with self._candado:
+                self._sigla_de_id = sigla_de_id
+        sigla = self._sigla_de_id.get(id_seccion)
+        if sigla is None:
+            return None
+        return next(s for s in self.secciones_de(sigla) if s.id == id_seccion)
+
+    def por_sigla(self, siglas, jornada=None):
+        """
+        {sigla: [SeccionOferta]} de las siglas pedidas (y de la jornada, si
+        se indica). Las siglas sin secciones no aparecen.
+        """
+        codigo = None
+        if jornada:
+            if jornada not in self.jornadas:
+                return {}
+            codigo = self.jornadas.index(jornada)
+
+        resultado = {}
+        for sigla in siglas:
+            secciones = [
+                s for s in self.secciones_de(sigla)
+                if codigo is None or s.jornada == codigo
+            ]
+            if secciones:
+                resultado[sigla] = secciones
+        return resultado
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# CONSTRUCCIÓN DESDE LA BASE DE DATOS
+# ════════════════════════════════════════════════════════════════════════════════
+def cargar_snapshot(sede, version=None):
+    """Arma el snapshot de `sede` con dos consultas a la base de datos."""
+    codigos_jornada = {}
+    filas = sorted(
+        Asignatura.objects.filter(sede=sede)
+        .values_list('sigla', 'id', 'jornada', 'virtual_sincronica')
+    )
+    siglas = sorted({fila[0] for fila in filas})
+    posicion = {id_asig: i for i, (_, id_asig, _, _) in enumerate(filas)}
+
+    conteo = Counter(fila[0] for fila in filas)
+    sigla_desde = np.zeros(len(siglas) + 1, dtype=np.int32)
+    np.cumsum([conteo[sigla] for sigla in siglas], out=sigla_desde[1:])
+
+    bloques_por_seccion = [[] for _ in filas]
+    codigos_dia = {}
+    horarios = (
+        Horario.objects.filter(asignatura__sede=sede)
+        .order_by('id')
+        .values_list('asignatura_id', 'dia', 'hora_inicio', 'hora_fin')
+    )
+    for id_asig, dia, inicio, fin in horarios:
+        codigo_dia = codigos_dia.setdefault(dia, len(codigos_dia))
+        bloques_por_seccion[posicion[id_asig]].append(
+            (codigo_dia, minutos_del_dia(inicio), minutos_del_dia(fin))
+        )
+
+    bloques = [bloque for lista in bloques_por_seccion for bloque in lista]
+    bloques_desde = np.zeros(len(filas) + 1, dtype=np.int32)
+    np.cumsum([len(lista) for lista in bloques_por_seccion], out=bloques_desde[1:])
+    bloques_array = np.array(bloques, dtype=np.int16).reshape(len(bloques), 3)
+
+    arrays = {
+        'ids': np.array([fila[1] for fila in filas], dtype=np.int64),
+        'jornada': np.array(
+            [codigos_jornada.setdefault(fila[2], len(codigos_jornada)) for fila in filas], dtype=np.int16
+        ),
+        'virtual': np.array([fila[3] == 'True' for fila in filas], dtype=np.uint8),
+        'sigla_desde': sigla_desde,
+        'bloques_desde': bloques_desde,
+        'bloque_dia': np.ascontiguousarray(bloques_array[:, 0]),
+        'bloque_inicio': np.ascontiguousarray(bloques_array[:, 1]),
+        'bloque_fin': np.ascontiguousarray(bloques_array[:, 2]),
+    }
+    return SnapshotOferta(
+        sede, version,
+        siglas=[sys.intern(sigla) for sigla in siglas],
+        jornadas=list(codigos_jornada),
+        dias=[sys.intern(dia) for dia in codigos_dia],
+        arrays=arrays,
+    )
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# ARCHIVOS VERSIONADOS Y MMAP
+# ════════════════════════════════════════════════════════════════════════════════
+def nombre_base(sede):
+    """Prefijo de archivo seguro para la sede (slug + hash corto, sin colisiones)."""
+    resumen = hashlib.sha1(sede.encode('utf-8')).hexdigest()[:10]
+    return f"{slugify(sede) or 'sede'}-{resumen}"
+
+
+def ruta_snapshot(sede, version):
+    return Path(settings.GENERADOR_SNAPSHOTS_DIR) / f'{nombre_base(sede)}.v{version}.bin'
+
+
+def _alinear(n):
+    return -n % ALINEACION
+
+
+def escribir_snapshot(snapshot, ruta):
+    """Escribe `snapshot` en `ruta` de forma atómica (temporal + rename)."""
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+
+    descriptores = {}
+    desplazamiento = 0
+    for nombre, tipo in ARRAYS.items():
+        array = np.ascontiguousarray(snapshot.arrays[nombre], dtype=tipo)
+        descriptores[nombre] = {
+            'dtype': np.dtype(tipo).newbyteorder('<').str,
+            'largo': len(array),
+            'desplazamiento': desplazamiento,
+        }
+        desplazamiento += array.nbytes + _alinear(array.nbytes)
+    encabezado = json.dumps({
+        'sede': snapshot.sede, 'version': snapshot.version, 'siglas': snapshot.siglas,
+        'jornadas': snapshot.jornadas, 'dias': snapshot.dias, 'arrays': descriptores,
+    }, ensure_ascii=False).encode('utf-8')
+    inicio_datos = len(MAGIA) + 4 + len(encabezado)
+    relleno_encabezado = _alinear(inicio_datos)
+
+    descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, prefix=ruta.name, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(MAGIA)
+            archivo.write(struct.pack('<I', len(encabezado) + relleno_encabezado))
+            archivo.write(encabezado + b' ' * relleno_encabezado)
+            for nombre, tipo in ARRAYS.items():
+                datos = np.ascontiguousarray(snapshot.arrays[nombre], dtype=np.dtype(tipo).newbyteorder('<'))
+                archivo.write(datos.tobytes())
+                archivo.write(b'\0' * _alinear(datos.nbytes))
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.unlink(temporal)
+        raise
+
+
+def abrir_snapshot(ruta):
+    """Mapea el archivo `ruta` en memoria (solo lectura, sin copiar los arrays)."""
+    with open(ruta, 'rb') as archivo:
+        mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapa[:len(MAGIA)] != MAGIA:
+        mapa.close()
+        raise ValueError(f'{ruta} no es un snapshot de oferta')
+    (largo,) = struct.unpack_from('<I', mapa, len(MAGIA))
+    inicio_encabezado = len(MAGIA) + 4
+    encabezado = json.loads(bytes(mapa[inicio_encabezado:inicio_encabezado + largo]).decode('utf-8'))
+    inicio_datos = inicio_encabezado + largo
+
+    arrays = {
+        nombre: np.frombuffer(
+            mapa, dtype=np.dtype(d['dtype']), count=d['largo'], offset=inicio_datos + d['desplazamiento']
+        )
+        for nombre, d in encabezado['arrays'].items()
+    }
+    return SnapshotOferta(
+        encabezado['sede'], encabezado['version'],
+        siglas=[sys.intern(sigla) for sigla in encabezado['siglas']],
+        jornadas=encabezado['jornadas'],
+        dias=[sys.intern(dia) for dia in encabezado['dias']],
+        arrays=arrays,
+        origen=mapa,
+    )
+
+
+def publicar_snapshot(sede):
+    """
+    Compila la oferta vigente de `sede`, la escribe como archivo versionado y
+    borra los archivos de versiones anteriores. Retorna la ruta escrita.
+    """
+    version = VersionOferta.actual(sede)
+    ruta = ruta_snapshot(sede, version)
+    escribir_snapshot(cargar_snapshot(sede, version), ruta)
+    for anterior in ruta.parent.glob(f'{nombre_base(sede)}.v*.bin'):
+        if anterior != ruta:
+            # Los procesos que aún lo tengan mapeado siguen leyéndolo sin problema
+            anterior.unlink(missing_ok=True)
+    return ruta
+
+
+def publicar_si_falta(sede):
+    """
+    Publica el snapshot de la versión vigente de `sede` si aún no existe su
+    archivo (tras una edición, ver `oferta.signals`). Varias ediciones en una
+    misma transacción publican una sola vez.
+    """
+    if not ruta_snapshot(sede, VersionOferta.actual(sede)).exists():
+        publicar_snapshot(sede)
+
+
+_snapshots = OrderedDict()
+_candado = threading.Lock()
+
+
+def obtener_snapshot(sede):
+    """
+    Snapshot vigente de `sede`. Se abre por mmap el archivo de la versión
+    actual; si aún no existe, se publica. Si el directorio no se puede
+    escribir, se usa un snapshot en memoria del proceso.
+    """
+    clave = (sede, VersionOferta.actual(sede))
+    with _candado:
+        snapshot = _snapshots.get(clave)
+        if snapshot is not None:
+            _snapshots.move_to_end(clave)
+            return snapshot
+
+    ruta = ruta_snapshot(*clave)
+    try:
+        if not ruta.exists():
+            ruta = publicar_snapshot(sede)
+        snapshot = abrir_snapshot(ruta)
+    except OSError:
+        snapshot = cargar_snapshot(*clave)
+    with _candado:
+        _snapshots[clave] = snapshot
+        _snapshots.move_to_end(clave)
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.popitem(last=False)
+    return snapshot
+
+
+def limpiar_snapshots():
+    with _candado:
+        _snapshots.clear()
+
+
+def con_modelos(horarios_generados):
+    """
+    Reemplaza los registros `SeccionOferta` del top-K (y de sus alternativas,
+    si las hay) por sus modelos `Asignatura` con horarios precargados, para
+    serializarlos. Si una sección se eliminó después de armar el snapshot, se
+    descarta el horario que la usa (o se omite como alternativa).
+    """
+    ids = {asig.id for horario in horarios_generados for asig in horario['asignaturas']}
+    ids.update(
+        otra.id for horario in horarios_generados
+        for otras in horario.get('alternativas', ()) for otra in otras
+    )
+    modelos = Asignatura.objects.prefetch_related('horarios').in_bulk(ids)
+    resultado = []
+    for horario in horarios_generados:
+        if any(asig.id not in modelos for asig in horario['asignaturas']):
+            continue
+        horario = dict(horario, asignaturas=[modelos[asig.id] for asig in horario['asignaturas']])
+        if 'alternativas' in horario:
+            horario['alternativas'] = [
+                [modelos[otra.id] for otra in otras if otra.id in modelos] for otras in horario['alternativas']
+            ]
+        resultado.append(horario)
+    return resultado
@@ -4,13 +4,22 @@ Utilidades para el generador automático de horarios
 ---------------------------------------------------
 Incluye:
 - Algoritmos de backtracking optimizados
+- Compilación de secciones a máscaras de bits de ocupación
 - Cálculo de métricas de horario
 - Sistema de puntuación adaptativo a la oferta real
 """
 
+import math
 import time
+import heapq
+from bisect import bisect_left, bisect_right
 from datetime import datetime
 from collections import defaultdict
+from itertools import islice, product
+
+import numpy as np
+
+from .generador_conflictos import MatrizConflictos, dominio_de, propagar
 
 # ════════════════════════════════════════════════════════════════════════════════
 # CONFIGURACIÓN
@@ -21,118 +30,791 @@ MAX_TIEMPO_GENERACION = 30  # segundos (límite de seguridad)
 # ════════════════════════════════════════════════════════════════════════════════
 # FUNCIÓN PRINCIPAL: GENERACIÓN DE COMBINACIONES
 # ════════════════════════════════════════════════════════════════════════════════
-def generar_combinaciones_optimizado(por_sigla, preferencias, max_resultados=10):
+def generar_combinaciones_optimizado(por_sigla, preferencias, max_resultados=10, estadisticas=None,
+                                     poda_cota=True, orden_siglas='menos_secciones', tamano_lote=0,
+                                     procesos=1, alternativas=False, agrupar=True, max_dias=None,
+                                     motor='auto', conflictos=None, max_tiempo=MAX_TIEMPO_GENERACION,
+                                     solicitud=None):
     """
     Genera todas las combinaciones válidas de secciones (backtracking optimizado)
     y retorna las mejores según el sistema de puntuación adaptativo.
+
+    La búsqueda hace forward checking sobre la matriz de conflictos: al elegir
+    una sección se filtran de una vez los dominios de las siglas pendientes y la
+    rama se descarta apenas alguno queda vacío. La siguiente sigla a asignar se
+    elige en cada nodo según `orden_siglas` (ver `ESTRATEGIAS_ORDEN`).
+
+    Solo se conservan las `max_resultados` mejores mientras se explora. Con
+    `poda_cota` (branch-and-bound) se descarta todo subárbol cuya cota superior
+    de puntuación no alcanza a la peor del top-K; el resultado es el mismo.
+    Con `tamano_lote` > 0 las hojas se acumulan y se puntúan de a lotes con
+    `calcular_puntuaciones_lote` (el umbral del top-K se actualiza por lote).
+    Con `procesos` > 1 el árbol se reparte en un pool de procesos (ver
+    `generador_paralelo`); el resultado es idéntico al de la búsqueda serial.
+
+    Con `agrupar`, las secciones de una sigla con los mismos bloques, jornada
+    y modalidad se buscan como una sola clase y se expanden a secciones
+    concretas al armar el top-K, con el mismo resultado que sin agrupar. Con
+    `alternativas`, en cambio, cada resultado es una combinación de clases
+    distinta y trae en 'alternativas' las secciones intercambiables de cada
+    asignatura.
+
+    `motor` elige entre el backtracking, la búsqueda por mitades (ver
+    `generador_mitades`), la búsqueda por componentes independientes (ver
+    `generador_componentes`) y la heurística (ver `generador_heuristico`); con
+    'auto' se decide por una estimación de costo. Las alternativas corren en
+    un solo proceso. Si el resultado es heurístico, `estadisticas['heuristico']`
+    es True y cada horario trae 'heuristico': True.
+
+    `max_dias` es una restricción dura: se descarta toda rama que ocupe más
+    días (las demás restricciones se aplican antes, ver
+    `generador_restricciones`).
+    `conflictos` es una matriz compartida entre solicitudes (ver `lotes`) y
+    `max_tiempo` acorta el límite de tiempo de la búsqueda. `solicitud` es la
+    `SolicitudCompilada` de `por_sigla`, si el llamador ya la tiene (ver
+    `cargar_solicitud_generacion`).
+    Si se entrega el dict `estadisticas`, se actualiza con los contadores.
     """
-    siglas_ordenadas = sorted(por_sigla.keys())
-    secciones_por_sigla = [por_sigla[sigla] for sigla in siglas_ordenadas]
+    if orden_siglas not in ESTRATEGIAS_ORDEN:
+        raise ValueError(f'Estrategia de orden desconocida: {orden_siglas}')
 
-    todas_las_combinaciones = []
     tiempo_inicio = time.time()
-    stats = {'exploradas': 0, 'validas': 0, 'podadas_jornada': 0, 'podadas_solapamiento': 0}
+    if solicitud is None:
+        solicitud = SolicitudCompilada(por_sigla, agrupar=agrupar, conflictos=conflictos)
 
     # Detectar rango horario global de la oferta (para normalización adaptativa)
     min_hora, max_hora = detectar_rango_global(por_sigla)
     preferencias['rango_inicio_min'] = min_hora
     preferencias['rango_fin_max'] = max_hora
 
-    def backtrack(indice, combinacion_actual, horarios_ocupados):
-        if time.time() - tiempo_inicio > MAX_TIEMPO_GENERACION:
-            return True  # timeout
+    opciones = {'max_resultados': max_resultados, 'poda_cota': poda_cota,
+                'orden_siglas': orden_siglas, 'tamano_lote': tamano_lote, 'max_dias': max_dias,
+                'max_tiempo': min(max_tiempo, MAX_TIEMPO_GENERACION)}
 
-        stats['exploradas'] += 1
-
-        if indice == len(secciones_por_sigla):
-            stats['validas'] += 1
-            metricas = calcular_metricas_horario(combinacion_actual)
-            puntuacion = calcular_puntuacion_normalizada(metricas, preferencias)
-            todas_las_combinaciones.append({
-                'asignaturas': list(combinacion_actual),
-                'puntuacion': puntuacion,
-                'metricas': metricas
-            })
-            return False
-
-        for seccion in secciones_por_sigla[indice]:
-            # PODA 1: jornada
-            if combinacion_actual:
-                jornada_actual = combinacion_actual[0].jornada
-                if seccion.jornada != jornada_actual:
-                    stats['podadas_jornada'] += 1
-                    continue
-
-            # PODA 2: solapamiento
-            if tiene_solapamiento_rapido(seccion, horarios_ocupados):
-                stats['podadas_solapamiento'] += 1
-                continue
-
-            nuevos_horarios = actualizar_horarios_ocupados(horarios_ocupados, seccion)
-            combinacion_actual.append(seccion)
-            timeout = backtrack(indice + 1, combinacion_actual, nuevos_horarios)
-            combinacion_actual.pop()
-
-            if timeout:
-                return True
-        return False
+    from .generador_mitades import elegir_motor
+    from .generador_paralelo import buscar_en_paralelo, paralelo_disponible
+    motor = elegir_motor(solicitud, motor, max_dias)
+    heuristico = False
+    if motor == 'backtracking' and procesos > 1 and paralelo_disponible():
+        mejores_k, stats, timeout_alcanzado = buscar_en_paralelo(
+            solicitud, preferencias, procesos, tiempo_inicio, **opciones
+        )
+    else:
+        procesos = 1
+        busqueda = clase_de_motor(motor)(solicitud, preferencias, tiempo_inicio=tiempo_inicio, **opciones)
+        timeout_alcanzado = busqueda.explorar()
+        mejores_k, stats, heuristico = busqueda.mejores_k, busqueda.stats, busqueda.heuristica
 
-    # Ejecutar backtracking
-    timeout_alcanzado = backtrack(0, [], defaultdict(list))
     tiempo_total = time.time() - tiempo_inicio
+    if estadisticas is not None:
+        estadisticas.update(stats, tiempo=tiempo_total, timeout=timeout_alcanzado, procesos=procesos,
+                            secciones=solicitud.total_secciones, clases=len(solicitud.secciones),
+                            motor=motor, heuristico=heuristico)
 
     # Logging
     print(f"""
 ╔══════════════════════════════════════════════════════════╗
 ║          ESTADÍSTICAS DE GENERACIÓN DE HORARIOS          ║
 ╠══════════════════════════════════════════════════════════╣
+║ Secciones / clases:       {solicitud.total_secciones:>8} / {len(solicitud.secciones):<8}         ║
 ║ Nodos explorados:         {stats['exploradas']:>8}                    ║
 ║ Combinaciones válidas:    {stats['validas']:>8}                    ║
-║ Podadas por jornada:      {stats['podadas_jornada']:>8}                    ║
-║ Podadas por solapamiento: {stats['podadas_solapamiento']:>8}                    ║
+║ Descartadas (conflicto):  {stats['descartadas_conflicto']:>8}                    ║
+║ Podadas por forward chk.: {stats['podadas_forward']:>8}                    ║
+║ Podadas por cota:         {stats['podadas_cota']:>8}                    ║
+║ Podadas por restricción:  {stats['podadas_restriccion']:>8}                    ║
+║ Motor:                    {motor:>12}                ║
+║ Resultado heurístico:     {'SÍ' if heuristico else 'NO':>8}                    ║
+║ Procesos:                 {procesos:>8}                    ║
 ║ Tiempo total:             {tiempo_total:>8.2f}s                  ║
 ║ Timeout alcanzado:        {'SÍ' if timeout_alcanzado else 'NO':>8}                    ║
 ╚══════════════════════════════════════════════════════════╝
 """)
 
-    if not todas_las_combinaciones:
+    mejores = solicitud.horarios_de(mejores_k.ordenados(), max_resultados, alternativas, heuristico)
+    if not mejores:
         return []
 
-    # Ordenar por puntuación
-    todas_las_combinaciones.sort(key=lambda x: x['puntuacion'], reverse=True)
-    mejores = todas_las_combinaciones[:max_resultados]
-
-    print(f"✅ Retornando las {len(mejores)} mejores de {len(todas_las_combinaciones)} opciones válidas")
+    print(f"✅ Retornando las {len(mejores)} mejores de {stats['validas']} opciones válidas")
     print(f"   Rango de puntuaciones: {mejores[-1]['puntuacion']:.2f} - {mejores[0]['puntuacion']:.2f}")
     return mejores
 
 
+def iterar_combinaciones(por_sigla, preferencias, max_resultados=10, intervalo=None,
+                         poda_cota=True, orden_siglas='menos_secciones', tamano_lote=0,
+                         alternativas=False, max_dias=None, motor='auto', solicitud=None):
+    """
+    Variante anytime de `generar_combinaciones_optimizado` (búsqueda serial):
+    generador de avances {'horarios', 'estadisticas', 'final'} con el top-K
+    actual, emitido cada vez que mejora y, con `intervalo`, al menos cada
+    `intervalo` segundos. El último avance trae 'final': True y el mismo
+    ranking que retornaría `generar_combinaciones_optimizado`. El llamador
+    puede cortar la iteración en cualquier momento y usar lo ya recibido.
+    `solicitud` es como en `generar_combinaciones_optimizado`.
+    """
+    if orden_siglas not in ESTRATEGIAS_ORDEN:
+        raise ValueError(f'Estrategia de orden desconocida: {orden_siglas}')
+
+    from .generador_mitades import elegir_motor
+
+    tiempo_inicio = time.time()
+    if solicitud is None:
+        solicitud = SolicitudCompilada(por_sigla)
+    preferencias['rango_inicio_min'], preferencias['rango_fin_max'] = detectar_rango_global(por_sigla)
+    busqueda = clase_de_motor(elegir_motor(solicitud, motor, max_dias))(
+        solicitud, preferencias, max_resultados=max_resultados, poda_cota=poda_cota,
+        orden_siglas=orden_siglas, tamano_lote=tamano_lote, tiempo_inicio=tiempo_inicio,
+        max_dias=max_dias,
+    )
+
+    def avance(mejores, final):
+        return {
+            'horarios': solicitud.horarios_de(mejores, max_resultados, alternativas, busqueda.heuristica),
+            'estadisticas': dict(busqueda.stats, tiempo=time.time() - tiempo_inicio,
+                                 timeout=busqueda.timeout, heuristico=busqueda.heuristica),
+            'final': final,
+        }
+
+    for mejores in busqueda.iterar(intervalo=intervalo):
+        yield avance(mejores, final=False)
+    yield avance(busqueda.mejores_k.ordenados(), final=True)
+
+
+def clase_de_motor(motor):
+    """Clase de búsqueda de un motor ya elegido (ver `generador_mitades.elegir_motor`)."""
+    if motor == 'mitades':
+        from .generador_mitades import BusquedaPorMitades
+        return BusquedaPorMitades
+    if motor == 'componentes':
+        from .generador_componentes import BusquedaPorComponentes
+        return BusquedaPorComponentes
+    if motor == 'heuristico':
+        from .generador_heuristico import BusquedaHeuristica
+        return BusquedaHeuristica
+    if motor == 'exacto_con_respaldo':
+        from .generador_heuristico import BusquedaExactaConRespaldo
+        return BusquedaExactaConRespaldo
+    return BusquedaHorarios
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# MOTOR DE BÚSQUEDA
+# ════════════════════════════════════════════════════════════════════════════════
+class SolicitudCompilada:
+    """
+    Todo lo que la búsqueda necesita de una solicitud, calculado una sola vez:
+    secciones compiladas por sigla (orden alfabético), matriz de conflictos,
+    dominios iniciales y densidad de conflictos entre siglas.
+
+    Con `agrupar`, cada sigla queda con una sección por clase de equivalencia
+    (ver `agrupar_equivalentes`). Las claves de combinación siguen siendo
+    posiciones en las listas de entrada: la de cada clase es la de su primera
+    sección.
+
+    Con `conflictos` (ver `lotes.ConflictosCompartidos`), la matriz de
+    conflictos sale de la compartida por un lote de solicitudes en vez de
+    construirse de nuevo.
+    """
+
+    def __init__(self, por_sigla, agrupar=True, conflictos=None):
+        compiladas = compilar_secciones(por_sigla)
+        self.siglas = sorted(compiladas)
+        self.entrada = [por_sigla[sigla] for sigla in self.siglas]
+        self.secciones_por_sigla = [compiladas[sigla] for sigla in self.siglas]
+        if agrupar:
+            self.secciones_por_sigla = [agrupar_equivalentes(s) for s in self.secciones_por_sigla]
+            for indice, seccion in enumerate(s for secciones in self.secciones_por_sigla for s in secciones):
+                seccion.indice = indice
+        # equivalentes[j]: {posición de la clase: posiciones de todas sus secciones}
+        self.equivalentes = [
+            {s.posicion: s.equivalentes for s in secciones} for secciones in self.secciones_por_sigla
+        ]
+        self.secciones = [s for secciones in self.secciones_por_sigla for s in secciones]
+        # dias_de[indice]: días que ocupa cada sección global
+        self.dias_de = [frozenset(dia for dia, _, _ in s.bloques) for s in self.secciones]
+        # sigla_de[indice]: posición de la sigla de cada sección global
+        self.sigla_de = [j for j, secciones in enumerate(self.secciones_por_sigla) for _ in secciones]
+        self.matriz = MatrizConflictos(self.secciones, conflictos)
+        self.dominios = [dominio_de(secciones) for secciones in self.secciones_por_sigla]
+        self.densidad = self.matriz.densidad_siglas(self.secciones_por_sigla)
+        # Cotas de lo que aún pueden aportar las siglas pendientes (memo por conjunto)
+        self._resumenes = {}
+        # Mitades enumeradas, si se eligió la búsqueda por mitades (ver `generador_mitades`)
+        self.mitades = None
+        # Componentes enumeradas, si se eligió la búsqueda por componentes (ver `generador_componentes`)
+        self.componentes = None
+
+    @property
+    def total_siglas(self):
+        return len(self.secciones_por_sigla)
+
+    @property
+    def total_secciones(self):
+        return sum(len(entrada) for entrada in self.entrada)
+
+    def resumen_de(self, pendientes):
+        clave = frozenset(pendientes)
+        if clave not in self._resumenes:
+            self._resumenes[clave] = resumir_siglas([self.secciones_por_sigla[j] for j in pendientes])
+        return self._resumenes[clave]
+
+    def asignaturas_de(self, clave):
+        """
+        Secciones de entrada (modelos `Asignatura` o registros del snapshot) de
+        una combinación dada por su clave de posiciones.
+        """
+        return [entrada[posicion] for entrada, posicion in zip(self.entrada, clave)]
+
+    def alternativas_de(self, clave):
+        """Por asignatura de la combinación, las demás secciones de su clase."""
+        return [
+            [entrada[p] for p in equivalentes[posicion][1:]]
+            for entrada, equivalentes, posicion in zip(self.entrada, self.equivalentes, clave)
+        ]
+
+    def horarios_de(self, mejores, max_resultados, alternativas=False, heuristico=False):
+        """
+        Resultados {'asignaturas', 'puntuacion', 'metricas'} a partir de los
+        datos del top-K de clases (de mejor a peor): expandidos a las
+        `max_resultados` mejores combinaciones concretas o, con `alternativas`,
+        uno por combinación de clases con sus secciones intercambiables. Con
+        `heuristico`, cada resultado lo indica con 'heuristico': True.
+        """
+        if alternativas:
+            resultados = [
+                {
+                    'asignaturas': self.asignaturas_de(datos['clave']),
+                    'puntuacion': datos['puntuacion'],
+                    'metricas': datos['metricas'],
+                    'alternativas': self.alternativas_de(datos['clave']),
+                }
+                for datos in mejores
+            ]
+        else:
+            concretas = expandir_mejores(
+                [(datos['puntuacion'], datos['clave']) for datos in mejores], self.equivalentes, max_resultados
+            )
+            resultados = [
+                {
+                    'asignaturas': self.asignaturas_de(clave),
+                    'puntuacion': mejores[i]['puntuacion'],
+                    'metricas': mejores[i]['metricas']
+                }
+                for i, clave in concretas
+            ]
+        if heuristico:
+            for resultado in resultados:
+                resultado['heuristico'] = True
+        return resultados
+
+
+class BusquedaHorarios:
+    """
+    Backtracking con forward checking y branch-and-bound sobre una
+    `SolicitudCompilada`. Explora el árbol completo o solo el subárbol que
+    cuelga de un prefijo de secciones ya elegidas (así lo reparte
+    `generador_paralelo`).
+
+    Los resultados quedan en `mejores_k` con datos {'clave', 'puntuacion',
+    'metricas'}; `umbral_compartido` (un `multiprocessing.Value`) permite
+    podar con la peor puntuación de los top-K de otros procesos. Con
+    `recolector`, cada combinación válida se entrega a `recolector(clave,
+    metricas)` sin puntuarla (usar sin `poda_cota`). Con `max_dias` no se
+    elige una sección que lleve la asignación a más días que ese máximo.
+    """
+
+    def __init__(self, solicitud, preferencias, max_resultados=10, poda_cota=True,
+                 orden_siglas='menos_secciones', tamano_lote=0, tiempo_inicio=None,
+                 umbral_compartido=None, recolector=None, max_dias=None, max_tiempo=MAX_TIEMPO_GENERACION):
+        self.solicitud = solicitud
+        self.max_dias = max_dias
+        self.recolector = recolector
+        self.preferencias = preferencias
+        self.poda_cota = poda_cota
+        self.elegir_sigla = ESTRATEGIAS_ORDEN[orden_siglas]
+        self.tamano_lote = tamano_lote
+        self.tiempo_inicio = time.time() if tiempo_inicio is None else tiempo_inicio
+        self.umbral_compartido = umbral_compartido
+
+        self.mejores_k = MejoresK(max_resultados)
+        self.stats = nuevas_estadisticas()
+        # asignadas[j]: sección elegida para la sigla j (orden alfabético)
+        self.asignadas = [None] * solicitud.total_siglas
+        self.estado = EstadoMetricas()
+        self.hojas_pendientes = []  # (metricas, clave) aún sin puntuar
+        self.version = 0  # cambia cada vez que entra una combinación al top-K
+        self.timeout = False
+        self.max_tiempo = max_tiempo
+        self.heuristica = False  # True si el top-K no viene de una búsqueda completa
+
+    def explorar(self, prefijo=()):
+        """
+        Explora el subárbol bajo `prefijo` (índices globales de secciones ya
+        elegidas, en orden de asignación). Retorna True si se alcanzó el límite
+        de tiempo.
+        """
+        for _ in self.iterar(prefijo):
+            pass
+        return self.timeout
+
+    def iterar(self, prefijo=(), intervalo=None):
+        """
+        Versión anytime de `explorar`: generador que entrega el top-K actual
+        (lista de datos, de mejor a peor) cada vez que mejora y, con
+        `intervalo` (segundos), al menos cada ese tiempo. El llamador puede
+        dejar de iterar cuando quiera y quedarse con lo último recibido; los
+        contadores siguen disponibles en `stats`.
+
+        La búsqueda usa una pila explícita en vez de recursión. Cada marco
+        guarda la sigla que se está asignando, las siglas restantes, los
+        dominios del nodo y la próxima sección a probar.
+        """
+        solicitud = self.solicitud
+        stats = self.stats
+        estado = self.estado
+        asignadas = self.asignadas
+        secciones_por_sigla = solicitud.secciones_por_sigla
+        compatibles = solicitud.matriz.compatibles
+        dias_de = solicitud.dias_de
+        max_dias = self.max_dias
+        self.timeout = False
+
+        pendientes = tuple(range(solicitud.total_siglas))
+        dominios = solicitud.dominios
+        try:
+            for indice_seccion in prefijo:
+                indice = solicitud.sigla_de[indice_seccion]
+                pendientes = tuple(j for j in pendientes if j != indice)
+                dominios = propagar(dominios, pendientes, compatibles[indice_seccion])
+                if dominios is None:
+                    return
+                asignadas[indice] = solicitud.secciones[indice_seccion]
+                estado.agregar(asignadas[indice], indice)
+                if max_dias is not None and len(estado.dias) > max_dias:
+                    return
+
+            version_entregada = self.version
+            ultima_entrega = time.time()
+            pila = []  # marcos [indice, resto, dominios, siguiente, asignada]
+            nodo = (pendientes, dominios)
+
+            while True:
+                if nodo is not None:
+                    pendientes, dominios = nodo
+                    nodo = None
+                    ahora = time.time()
+                    if ahora - self.tiempo_inicio > self.max_tiempo:
+                        self.timeout = True
+                        break
+                    stats['exploradas'] += 1
+
+                    if not pendientes:
+                        self._registrar_hoja()
+                    elif not self._podar_por_cota(pendientes):
+                        indice = self.elegir_sigla(pendientes, dominios, solicitud.densidad)
+                        resto = tuple(j for j in pendientes if j != indice)
+                        pila.append([indice, resto, dominios, 0, False])
+
+                    if self.version != version_entregada or (
+                        intervalo is not None and ahora - ultima_entrega >= intervalo
+                    ):
+                        version_entregada = self.version
+                        ultima_entrega = ahora
+                        yield self.mejores_k.ordenados()
+
+                if not pila:
+                    break
+
+                # Avanzar el marco superior a su siguiente sección compatible
+                marco = pila[-1]
+                indice, resto, dominios, siguiente, asignada = marco
+                if asignada:
+                    estado.quitar()
+                    asignadas[indice] = None
+                    marco[4] = False
+
+                secciones = secciones_por_sigla[indice]
+                dominio = dominios[indice]
+                while siguiente < len(secciones):
+                    seccion = secciones[siguiente]
+                    siguiente += 1
+                    if not (dominio >> seccion.indice) & 1:
+                        continue  # descartada por una sección ya elegida
+
+                    # Restricción dura de días ocupados (sobre el estado actual)
+                    if max_dias is not None and len(estado.dias.keys() | dias_de[seccion.indice]) > max_dias:
+                        stats['podadas_restriccion'] += 1
+                        continue
+
+                    # PODA 2: forward checking (jornada y solapamiento vía matriz)
+                    nuevos_dominios = propagar(dominios, resto, compatibles[seccion.indice])
+                    if nuevos_dominios is None:
+                        stats['podadas_forward'] += 1
+                        continue
+                    stats['descartadas_conflicto'] += sum(
+                        dominios[j].bit_count() - nuevos_dominios[j].bit_count() for j in resto
+                    )
+
+                    asignadas[indice] = seccion
+                    estado.agregar(seccion, indice)
+                    marco[4] = True
+                    nodo = (resto, nuevos_dominios)
+                    break
+                marco[3] = siguiente
+                if nodo is None:
+                    pila.pop()
+
+            self._puntuar_hojas_pendientes()
+            if self.version != version_entregada:
+                yield self.mejores_k.ordenados()
+        finally:
+            self._deshacer_prefijo()
+
+    def _agregar(self, siglas, secciones):
+        """Asigna `secciones` a las `siglas` (en el mismo orden), como un bloque."""
+        for j, seccion in zip(siglas, secciones):
+            self.asignadas[j] = seccion
+            self.estado.agregar(seccion, j)
+
+    def _quitar(self, siglas):
+        """Revierte el último `_agregar` de `siglas`."""
+        for j in reversed(siglas):
+            self.estado.quitar()
+            self.asignadas[j] = None
+
+    def _deshacer_prefijo(self):
+        while self.estado.total:
+            self.estado.quitar()
+        self.asignadas = [None] * self.solicitud.total_siglas
+
+    def umbral(self):
+        """Peor puntuación que aún puede entrar al top-K (propio o compartido)."""
+        propio = self.mejores_k.umbral()
+        if self.umbral_compartido is None:
+            return propio
+        compartido = self.umbral_compartido.value
+        if propio is None:
+            return compartido if compartido > float('-inf') else None
+        return max(propio, compartido)
+
+    def _publicar_umbral(self):
+        propio = self.mejores_k.umbral()
+        if self.umbral_compartido is None or propio is None:
+            return
+        if propio > self.umbral_compartido.value:
+            with self.umbral_compartido.get_lock():
+                if propio > self.umbral_compartido.value:
+                    self.umbral_compartido.value = propio
+
+    def _registrar(self, puntuacion, clave, metricas):
+        if self.mejores_k.admite(puntuacion, clave):
+            self.mejores_k.agregar(puntuacion, clave, {
+                'clave': clave,
+                'puntuacion': puntuacion,
+                'metricas': metricas
+            })
+            self.version += 1
+            self._publicar_umbral()
+
+    def _puntuar_hojas_pendientes(self):
+        if not self.hojas_pendientes:
+            return
+        puntuaciones = calcular_puntuaciones_lote(
+            metricas_a_arrays([metricas for metricas, _ in self.hojas_pendientes]), self.preferencias
+        )
+        for puntuacion, (metricas, clave) in zip(puntuaciones.tolist(), self.hojas_pendientes):
+            self._registrar(puntuacion, clave, metricas)
+        self.hojas_pendientes.clear()
+
+    def _registrar_hoja(self):
+        # Cuenta combinaciones concretas: la hoja vale por todas las de sus clases
+        self.stats['validas'] += math.prod(len(seccion.equivalentes) for seccion in self.asignadas)
+        metricas = self.estado.metricas()
+        clave = tuple(seccion.posicion for seccion in self.asignadas)
+        if self.recolector is not None:
+            self.recolector(clave, metricas)
+            return
+        if self.tamano_lote:
+            self.hojas_pendientes.append((metricas, clave))
+            if len(self.hojas_pendientes) >= self.tamano_lote:
+                self._puntuar_hojas_pendientes()
+            return
+        self._registrar(calcular_puntuacion_normalizada(metricas, self.preferencias), clave, metricas)
+
+    def _cota_superior(self, pendientes):
+        """Cota de puntuación de cualquier horario que complete la asignación actual."""
+        return cota_superior_puntuacion(
+            self.estado.parcial(), self.solicitud.resumen_de(pendientes), self.preferencias,
+            self.solicitud.total_siglas
+        )
+
+    def _podar_por_cota(self, pendientes):
+        """PODA 1: cota superior (branch-and-bound)."""
+        if not self.poda_cota or not self.estado.total:
+            return False
+        umbral = self.umbral()
+        if umbral is None:
+            return False
+        if self._cota_superior(pendientes) < umbral:
+            self.stats['podadas_cota'] += 1
+            return True
+        return False
+
+
+def nuevas_estadisticas():
+    return {'exploradas': 0, 'validas': 0, 'descartadas_conflicto': 0, 'podadas_forward': 0,
+            'podadas_cota': 0, 'podadas_restriccion': 0}
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# ORDEN DINÁMICO DE SIGLAS
+# ════════════════════════════════════════════════════════════════════════════════
+def orden_alfabetico(pendientes, dominios, densidad):
+    """Orden fijo por sigla (comportamiento original)."""
+    return min(pendientes)
+
+
+def orden_menos_secciones(pendientes, dominios, densidad):
+    """Primero la sigla con menos secciones aún compatibles (MRV)."""
+    return min(pendientes, key=lambda j: (dominios[j].bit_count(), j))
+
+
+def orden_mas_restringida(pendientes, dominios, densidad):
+    """
+    Primero la sigla con menor razón entre secciones aún compatibles y grado de
+    conflicto con las siglas pendientes (dom/wdeg), donde el grado suma la
+    densidad de conflictos con cada una: prioriza la que más restringe al resto.
+    """
+    def razon(j):
+        grado = sum(densidad[j][k] for k in pendientes if k != j)
+        return (dominios[j].bit_count() / (1 + grado), j)
+
+    return min(pendientes, key=razon)
+
+
+ESTRATEGIAS_ORDEN = {
+    'alfabetico': orden_alfabetico,
+    'menos_secciones': orden_menos_secciones,
+    'mas_restringida': orden_mas_restringida,
+}
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# SELECCIÓN ACOTADA DE LAS MEJORES COMBINACIONES
+# ════════════════════════════════════════════════════════════════════════════════
+class MejoresK:
+    """
+    Conserva solo las K mejores combinaciones vistas, en un min-heap cuya raíz
+    es la peor de las retenidas.
+
+    Desempate determinista: a igual puntuación gana la combinación con la menor
+    `clave` (tupla de posiciones de sección en orden alfabético de siglas), que
+    es el mismo orden en que el ordenamiento estable original las dejaba.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    @staticmethod
+    def _orden(puntuacion, clave):
+        # Menor = peor: menos puntos o, a igual puntuación, clave mayor
+        return (puntuacion, tuple(-posicion for posicion in clave))
+
+    def umbral(self):
+        """Puntuación de la peor retenida si el top-K está lleno; si no, None."""
+        if self.k <= 0 or len(self._heap) < self.k:
+            return None
+        return self._heap[0][0][0]
+
+    def admite(self, puntuacion, clave):
+        """Indica si una combinación entraría al top-K (antes de armar sus datos)."""
+        if self.k <= 0:
+            return False
+        if len(self._heap) < self.k:
+            return True
+        return self._orden(puntuacion, clave) > self._heap[0][0]
+
+    def agregar(self, puntuacion, clave, datos):
+        if not self.admite(puntuacion, clave):
+            return
+        item = (self._orden(puntuacion, clave), datos)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+        else:
+            heapq.heapreplace(self._heap, item)
+
+    def items(self):
+        """Contenido crudo del heap, para fusionarlo en otro `MejoresK`."""
+        return list(self._heap)
+
+    def fusionar(self, items):
+        """
+        Incorpora los items de otro top-K (ver `items`). Como el orden incluye
+        la clave, el resultado no depende del orden en que se fusionen.
+        """
+        for orden, datos in items:
+            if self.k <= 0:
+                return
+            if len(self._heap) < self.k:
+                heapq.heappush(self._heap, (orden, datos))
+            elif orden > self._heap[0][0]:
+                heapq.heapreplace(self._heap, (orden, datos))
+
+    def ordenados(self):
+        """Datos de las combinaciones retenidas, de mejor a peor."""
+        return [datos for _, datos in sorted(self._heap, key=lambda item: item[0], reverse=True)]
+
+
 # ════════════════════════════════════════════════════════════════════════════════
 # FUNCIONES DE APOYO Y PODA
 # ════════════════════════════════════════════════════════════════════════════════
-def tiene_solapamiento_rapido(asignatura, horarios_ocupados):
-    """Verifica solapamientos entre horarios ocupados."""
-    for horario in asignatura.horarios.all():
-        dia = horario.dia
-        inicio = datetime.combine(datetime.today(), horario.hora_inicio)
-        fin = datetime.combine(datetime.today(), horario.hora_fin)
-        for h_inicio, h_fin in horarios_ocupados[dia]:
-            if inicio < h_fin and fin > h_inicio:
-                return True
-    return False
-
-
-def actualizar_horarios_ocupados(horarios_ocupados, asignatura):
-    """Devuelve una copia inmutable del mapa de horarios ocupados."""
-    nuevos = defaultdict(list)
-    for dia, horarios in horarios_ocupados.items():
-        nuevos[dia] = horarios.copy()
-
-    for horario in asignatura.horarios.all():
-        inicio = datetime.combine(datetime.today(), horario.hora_inicio)
-        fin = datetime.combine(datetime.today(), horario.hora_fin)
-        nuevos[horario.dia].append((inicio, fin))
-    return nuevos
+class SeccionCompilada:
+    """
+    Sección compilada una sola vez por solicitud: bloques en minutos enteros
+    y máscara de bits con la ocupación semanal.
+    """
+    __slots__ = ('asignatura', 'indice', 'posicion', 'jornada', 'virtual', 'bloques', 'mascara',
+                 'equivalentes')
+
+    def __init__(self, asignatura, indice, posicion, jornada, virtual, bloques, mascara=0):
+        self.asignatura = asignatura
+        self.indice = indice
+        self.posicion = posicion
+        self.jornada = jornada
+        self.virtual = virtual
+        self.bloques = bloques
+        self.mascara = mascara
+        self.equivalentes = (posicion,)  # posiciones de su clase (ver `agrupar_equivalentes`)
+
+
+def minutos_del_dia(hora):
+    """Convierte un `datetime.time` a minutos desde la medianoche."""
+    return hora.hour * 60 + hora.minute
+
+
+def construir_tramos(bloques):
+    """
+    Comprime el eje de tiempo de cada día a los límites que realmente aparecen
+    en la oferta. Cada tramo es el intervalo entre dos límites consecutivos, de
+    modo que dos bloques se solapan si y solo si comparten algún tramo.
+
+    Retorna {dia: {minuto_limite: posicion_de_bit}}; cada día ocupa un carril
+    contiguo de bits dentro de una única máscara semanal.
+    """
+    limites_por_dia = defaultdict(set)
+    for dia, inicio, fin in bloques:
+        limites_por_dia[dia].update((inicio, fin))
+
+    tramos = {}
+    desplazamiento = 0
+    for dia in sorted(limites_por_dia):
+        limites = sorted(limites_por_dia[dia])
+        tramos[dia] = {minuto: desplazamiento + i for i, minuto in enumerate(limites)}
+        desplazamiento += len(limites)
+    return tramos
+
+
+def mascara_de_bloques(bloques, tramos):
+    """Máscara de ocupación (int) de una lista de bloques (dia, inicio, fin)."""
+    mascara = 0
+    for dia, inicio, fin in bloques:
+        if fin <= inicio:
+            continue
+        bit_inicio = tramos[dia][inicio]
+        mascara |= ((1 << (tramos[dia][fin] - bit_inicio)) - 1) << bit_inicio
+    return mascara
+
+
+def datos_de_seccion(asig):
+    """
+    (jornada, virtual, bloques en minutos) de una sección candidata, ya sea un
+    modelo `Asignatura` con sus horarios o un registro `SeccionOferta` del
+    snapshot compilado (ver `generador_snapshot`), que ya los trae listos.
+    """
+    if hasattr(asig, 'bloques'):
+        return asig.jornada, asig.virtual, asig.bloques
+    bloques = tuple(
+        (h.dia, minutos_del_dia(h.hora_inicio), minutos_del_dia(h.hora_fin))
+        for h in asig.horarios.all()
+    )
+    return asig.jornada, asig.virtual_sincronica == 'True', bloques
+
+
+def compilar_secciones(por_sigla):
+    """
+    Compila todas las secciones candidatas de la solicitud a `SeccionCompilada`,
+    numeradas globalmente en orden alfabético de sigla. Con esto, verificar un
+    solapamiento es un AND de enteros y el estado ocupado es un único int, sin
+    tocar el ORM ni `datetime` dentro de la búsqueda.
+    """
+    compiladas = {}
+    indice = 0
+    for sigla in sorted(por_sigla):
+        compiladas[sigla] = []
+        for posicion, asig in enumerate(por_sigla[sigla]):
+            jornada, virtual, bloques = datos_de_seccion(asig)
+            compiladas[sigla].append(SeccionCompilada(
+                asignatura=asig,
+                indice=indice,
+                posicion=posicion,
+                jornada=jornada,
+                virtual=virtual,
+                bloques=bloques,
+            ))
+            indice += 1
+
+    tramos = construir_tramos(
+        bloque
+        for secciones in compiladas.values()
+        for seccion in secciones
+        for bloque in seccion.bloques
+    )
+    for secciones in compiladas.values():
+        for seccion in secciones:
+            seccion.mascara = mascara_de_bloques(seccion.bloques, tramos)
+    return compiladas
+
+
+def agrupar_equivalentes(secciones):
+    """
+    Agrupa las secciones compiladas de una sigla que tienen la misma jornada,
+    modalidad y bloques (en el mismo orden): para la búsqueda y la puntuación
+    son indistinguibles, solo cambian la sección o el docente. Retorna la
+    primera sección de cada clase, con las posiciones de todas en
+    `equivalentes`.
+    """
+    clases = {}
+    for seccion in secciones:
+        clave = (seccion.jornada, seccion.virtual, seccion.bloques)
+        representante = clases.get(clave)
+        if representante is None:
+            clases[clave] = seccion
+        else:
+            representante.equivalentes += (seccion.posicion,)
+    return list(clases.values())
+
+
+def expandir_mejores(mejores, equivalentes, max_resultados):
+    """
+    Top-K concreto a partir del top-K de combinaciones de clases. `mejores` son
+    pares (puntuacion, clave) de mejor a peor y `equivalentes[j]` mapea la
+    posición de cada clase de la sigla j a las de todas sus secciones.
+
+    Retorna pares (índice en `mejores`, clave concreta) con el desempate de
+    `MejoresK`. Alcanza con las `max_resultados` menores expansiones de cada
+    clase: la clave de una clase es la menor de las suyas, así que ninguna
+    combinación concreta del top-K queda fuera del top-K de clases.
+    """
+    concretas = []
+    for i, (puntuacion, clave) in enumerate(mejores):
+        expansiones = product(*(equivalentes[j][posicion] for j, posicion in enumerate(clave)))
+        concretas.extend((-puntuacion, concreta, i) for concreta in islice(expansiones, max_resultados))
+    concretas.sort()
+    return [(i, concreta) for _, concreta, i in concretas[:max_resultados]]
 
 
 def detectar_rango_global(por_sigla):
@@ -141,17 +823,288 @@ def detectar_rango_global(por_sigla):
     max_hora = 0.0
     for secciones in por_sigla.values():
         for seccion in secciones:
-            for h in seccion.horarios.all():
-                hora_ini = h.hora_inicio.hour + h.hora_inicio.minute / 60
-                hora_fin = h.hora_fin.hour + h.hora_fin.minute / 60
+            for _, inicio, fin in datos_de_seccion(seccion)[2]:
+                hora_ini = inicio // 60 + inicio % 60 / 60
+                hora_fin = fin // 60 + fin % 60 / 60
                 min_hora = min(min_hora, hora_ini)
                 max_hora = max(max_hora, hora_fin)
     return min_hora, max_hora
 
 
+# ════════════════════════════════════════════════════════════════════════════════
+# COTA SUPERIOR DE PUNTUACIÓN (BRANCH-AND-BOUND)
+# ════════════════════════════════════════════════════════════════════════════════
+class ResumenSiglas:
+    """
+    Lo máximo/mínimo que un conjunto de siglas aún sin asignar puede aportar a
+    las métricas, tomando para cada sigla el caso más favorable entre sus secciones.
+    """
+    __slots__ = ('cantidad', 'min_inicio', 'max_inicio', 'min_fin', 'max_fin',
+                 'por_dia', 'dias', 'con_virtual', 'solo_virtuales')
+
+    def __init__(self):
+        self.cantidad = 0
+        self.min_inicio = self.min_fin = None
+        self.max_inicio = self.max_fin = None
+        self.por_dia = {}  # dia: [min_inicio, max_fin, minutos_max (suma por sigla)]
+        self.dias = set()
+        self.con_virtual = 0
+        self.solo_virtuales = 0
+
+
+def resumir_siglas(secciones_por_sigla):
+    """Construye el `ResumenSiglas` de una lista de listas de `SeccionCompilada`."""
+    resumen = ResumenSiglas()
+    for secciones in secciones_por_sigla:
+        resumen.cantidad += 1
+        resumen.con_virtual += any(s.virtual for s in secciones)
+        resumen.solo_virtuales += all(s.virtual for s in secciones)
+
+        minutos_max_dia = defaultdict(int)
+        for seccion in secciones:
+            minutos_dia = defaultdict(int)
+            for dia, inicio, fin in seccion.bloques:
+                minutos_dia[dia] += max(0, fin - inicio)
+                resumen.dias.add(dia)
+                datos = resumen.por_dia.setdefault(dia, [inicio, fin, 0])
+                datos[0] = min(datos[0], inicio)
+                datos[1] = max(datos[1], fin)
+                resumen.min_inicio = inicio if resumen.min_inicio is None else min(resumen.min_inicio, inicio)
+                resumen.max_inicio = inicio if resumen.max_inicio is None else max(resumen.max_inicio, inicio)
+                resumen.min_fin = fin if resumen.min_fin is None else min(resumen.min_fin, fin)
+                resumen.max_fin = fin if resumen.max_fin is None else max(resumen.max_fin, fin)
+            for dia, minutos in minutos_dia.items():
+                minutos_max_dia[dia] = max(minutos_max_dia[dia], minutos)
+        for dia, minutos in minutos_max_dia.items():
+            resumen.por_dia[dia][2] += minutos
+    return resumen
+
+
+def cota_superior_puntuacion(parcial, restante, preferencias, total_siglas):
+    """
+    Cota optimista de `calcular_puntuacion_normalizada` para cualquier horario
+    completo que extienda la asignación `parcial` (ver `EstadoMetricas.parcial`) con
+    las siglas resumidas en `restante`.
+
+    - Huecos: una sección nueva reduce los huecos de un día a lo más en sus
+      propios minutos de clase ese día.
+    - Horario: se acota el promedio de inicio/fin entre días actuales (que solo
+      pueden adelantar su inicio o atrasar su fin) y días nuevos.
+    - Virtuales: se suman o restan las siglas que pueden/deben ser virtuales.
+    - Balance: 10 pts (solo se conoce en la hoja).
+    - Compacidad: rango alcanzable de días usados y huecos mínimos por día.
+    """
+    por_dia, virtuales = parcial
+    puntuacion = 0.0
+
+    # Huecos mínimos alcanzables por día
+    huecos_min = {
+        dia: max(0, huecos - restante.por_dia.get(dia, (0, 0, 0))[2])
+        for dia, (huecos, _, _) in por_dia.items()
+    }
+
+    # ───── 1. Huecos (35 pts)
+    if preferencias.get('minimizar_huecos', True):
+        total_huecos = sum(huecos_min.values())
+        puntuacion += max(0, 35 * (1 - min(total_huecos / 180, 1) ** 1.3))
+    else:
+        puntuacion += 17.5
+
+    # ───── 2. Horario (30 pts)
+    pref_horario = preferencias.get('preferencia_horario', 'neutro')
+    min_inicio = preferencias.get('rango_inicio_min', 8.0)
+    max_fin = preferencias.get('rango_fin_max', 23.0)
+
+    def promedio(valores):
+        return sum(valores) / len(valores) / 60
+
+    if not por_dia and restante.min_inicio is None:
+        puntuacion += 15
+    else:
+        candidatos_ini_bajo, candidatos_ini_alto = [], []
+        candidatos_fin_bajo, candidatos_fin_alto = [], []
+        if por_dia:
+            ini_bajo, fin_alto = [], []
+            for dia, (_, inicio, fin) in por_dia.items():
+                datos = restante.por_dia.get(dia)
+                ini_bajo.append(min(inicio, datos[0]) if datos else inicio)
+                fin_alto.append(max(fin, datos[1]) if datos else fin)
+            candidatos_ini_bajo.append(promedio(ini_bajo))
+            candidatos_ini_alto.append(promedio([inicio for _, inicio, _ in por_dia.values()]))
+            candidatos_fin_bajo.append(promedio([fin for _, _, fin in por_dia.values()]))
+            candidatos_fin_alto.append(promedio(fin_alto))
+        if restante.min_inicio is not None:
+            candidatos_ini_bajo.append(restante.min_inicio / 60)
+            candidatos_ini_alto.append(restante.max_inicio / 60)
+            candidatos_fin_bajo.append(restante.min_fin / 60)
+            candidatos_fin_alto.append(restante.max_fin / 60)
+
+        rango = max_fin - min_inicio
+
+        def normalizar(hora):
+            return max(0, min(1, (hora - min_inicio) / rango))
+
+        if pref_horario == 'entrar_temprano':
+            pts_horario = (1 - normalizar(min(candidatos_ini_bajo))) * 30
+        elif pref_horario == 'entrar_tarde':
+            pts_horario = normalizar(max(candidatos_ini_alto)) * 30
+        elif pref_horario == 'salir_temprano':
+            pts_horario = (1 - normalizar(min(candidatos_fin_bajo))) * 30
+        elif pref_horario == 'salir_tarde':
+            pts_horario = normalizar(max(candidatos_fin_alto)) * 30
+        else:
+            centro = (min_inicio + max_fin) / 2
+            medio_bajo = (min(candidatos_ini_bajo) + min(candidatos_fin_bajo)) / 2
+            medio_alto = (max(candidatos_ini_alto) + max(candidatos_fin_alto)) / 2
+            distancia = max(0, medio_bajo - centro, centro - medio_alto)
+            pts_horario = max(0, 1 - (distancia / (rango / 2))) * 30
+        if not por_dia:
+            # Si ninguna sección tuviera bloques, el horario valdría 15 pts
+            pts_horario = max(15, pts_horario)
+        puntuacion += pts_horario
+
+    # ───── 3. Clases virtuales (15 pts)
+    total_asig = max(1, total_siglas)
+    pref_virtual = preferencias.get('preferir_virtuales', 'neutro')
+    if pref_virtual == 'si':
+        puntuacion += (virtuales + restante.con_virtual) / total_asig * 15
+    elif pref_virtual == 'no':
+        puntuacion += (1 - (virtuales + restante.solo_virtuales) / total_asig) * 15
+    else:
+        puntuacion += 7.5
+
+    # ───── 4. Balance de carga (10 pts)
+    puntuacion += 10
+
+    # ───── 5. Compacidad (10 pts)
+    dias_min = len(por_dia)
+    dias_max = len(restante.dias.union(por_dia))
+    dias_optimos = min(max(3, dias_min), dias_max)
+    pts_dias = max(0, 5 - abs(dias_optimos - 3) * 1.5)
+    max_hueco = max(huecos_min.values()) if huecos_min else 0
+    pts_hueco = max(0, 5 - min(max_hueco / 120, 1) * 5)
+    puntuacion += pts_dias + pts_hueco
+
+    # Margen para errores de punto flotante frente al cálculo exacto
+    return round(min(100, max(0, puntuacion)) + 1e-9, 2)
+
+
 # ════════════════════════════════════════════════════════════════════════════════
 # MÉTRICAS DE HORARIO
 # ════════════════════════════════════════════════════════════════════════════════
+class EstadoDia:
+    """Bloques de un día en la asignación parcial, ordenados, con sus huecos."""
+    __slots__ = ('bloques', 'huecos', 'primera', 'fin')
+
+    def __init__(self):
+        self.bloques = []    # [(inicio, fin)] en minutos, ordenados
+        self.huecos = 0      # minutos de huecos entre bloques consecutivos
+        self.primera = None  # (sigla, bloque) de la primera aparición del día
+        self.fin = None      # fin más tardío del día
+
+    def insertar(self, inicio, fin, clave):
+        bloque = (inicio, fin)
+        p = bisect_right(self.bloques, bloque)
+        previo = self.bloques[p - 1] if p else None
+        siguiente = self.bloques[p] if p < len(self.bloques) else None
+        if previo and siguiente:
+            self.huecos -= max(0, siguiente[0] - previo[1])
+        if previo:
+            self.huecos += max(0, inicio - previo[1])
+        if siguiente:
+            self.huecos += max(0, siguiente[0] - fin)
+        self.bloques.insert(p, bloque)
+        if self.primera is None or clave < self.primera:
+            self.primera = clave
+        if self.fin is None or fin > self.fin:
+            self.fin = fin
+
+
+class EstadoMetricas:
+    """
+    Métricas de la asignación parcial, actualizadas al agregar una sección y
+    revertidas al quitarla (en orden LIFO, como en el backtracking).
+
+    Trabaja en minutos enteros y mantiene por día los bloques ordenados, los
+    huecos y el primer bloque en orden alfabético de sigla, de modo que
+    `metricas()` cuesta O(días) y reproduce exactamente (mismo orden de días y
+    mismos tipos) el dict de `calcular_metricas_horario`.
+    """
+    __slots__ = ('dias', 'virtuales', 'total', '_deshacer')
+
+    def __init__(self):
+        self.dias = {}
+        self.virtuales = 0
+        self.total = 0
+        self._deshacer = []
+
+    def agregar(self, seccion, orden):
+        """Agrega `seccion`, cuya sigla ocupa la posición `orden` alfabéticamente."""
+        previos = []
+        for posicion, (dia, inicio, fin) in enumerate(seccion.bloques):
+            estado = self.dias.get(dia)
+            if estado is None:
+                estado = self.dias[dia] = EstadoDia()
+            previos.append((estado.huecos, estado.primera, estado.fin))
+            estado.insertar(inicio, fin, (orden, posicion))
+        self.virtuales += seccion.virtual
+        self.total += 1
+        self._deshacer.append((seccion, previos))
+
+    def quitar(self):
+        """Revierte el último `agregar`."""
+        seccion, previos = self._deshacer.pop()
+        for (dia, inicio, fin), (huecos, primera, fin_dia) in zip(reversed(seccion.bloques), reversed(previos)):
+            estado = self.dias[dia]
+            del estado.bloques[bisect_left(estado.bloques, (inicio, fin))]
+            if not estado.bloques:
+                del self.dias[dia]
+                continue
+            estado.huecos, estado.primera, estado.fin = huecos, primera, fin_dia
+        self.virtuales -= seccion.virtual
+        self.total -= 1
+
+    def parcial(self):
+        """Resumen para `cota_superior_puntuacion`: ({dia: (huecos, inicio, fin)}, virtuales)."""
+        return (
+            {dia: (e.huecos, e.bloques[0][0], e.fin) for dia, e in self.dias.items()},
+            self.virtuales,
+        )
+
+    def metricas(self):
+        """Mismo dict que `calcular_metricas_horario` para las secciones agregadas."""
+        dias = sorted(self.dias.items(), key=lambda item: item[1].primera)
+
+        total_huecos = sum(e.huecos for _, e in dias)
+        huecos_por_dia = {dia: float(e.huecos) if e.huecos > 0 else 0 for dia, e in dias}
+
+        horas_inicio = [e.bloques[0][0] // 60 + e.bloques[0][0] % 60 / 60 for _, e in dias]
+        horas_fin = [e.fin // 60 + e.fin % 60 / 60 for _, e in dias]
+
+        clases_por_dia = [len(e.bloques) for _, e in dias]
+        if clases_por_dia:
+            promedio = sum(clases_por_dia) / len(clases_por_dia)
+            varianza = sum((x - promedio) ** 2 for x in clases_por_dia) / len(clases_por_dia)
+            balance = max(0, 1 - (varianza / 16))
+        else:
+            balance = 1.0
+
+        max_hueco_dia = max(huecos_por_dia.values()) if huecos_por_dia else 0
+
+        return {
+            'dias_usados': len(dias),
+            'total_huecos_minutos': float(total_huecos) if total_huecos > 0 else 0,
+            'max_hueco_dia': max_hueco_dia,
+            'clases_virtuales': self.virtuales,
+            'total_clases': self.total,
+            'hora_inicio_promedio': sum(horas_inicio) / len(horas_inicio) if horas_inicio else 0,
+            'hora_fin_promedio': sum(horas_fin) / len(horas_fin) if horas_fin else 0,
+            'bloques_por_dia': {dia: len(e.bloques) for dia, e in dias},
+            'balance_carga': balance,
+            'huecos_por_dia': huecos_por_dia
+        }
+
+
 def calcular_metricas_horario(asignaturas):
     """Calcula métricas cuantitativas del horario generado."""
     dias_usados = set()
@@ -290,4 +1243,98 @@ def calcular_puntuacion_normalizada(metricas, preferencias):
     pts_hueco = max(0, 5 - min(max_hueco / 120, 1) * 5)
     puntuacion += pts_dias + pts_hueco
 
-    return round(min(100, max(0, puntuacion)), 2)
\ No newline at end of file
+    return round(min(100, max(0, puntuacion)), 2)
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# PUNTUACIÓN VECTORIZADA (LOTES)
+# ════════════════════════════════════════════════════════════════════════════════
+CAMPOS_PUNTUACION = (
+    'total_huecos_minutos', 'max_hueco_dia', 'clases_virtuales', 'total_clases',
+    'hora_inicio_promedio', 'hora_fin_promedio', 'balance_carga', 'dias_usados',
+)
+
+
+def metricas_a_arrays(lista_metricas):
+    """Convierte una lista de dicts de métricas en {campo: np.ndarray} para puntuar en lote."""
+    return {
+        campo: np.array([metricas[campo] for metricas in lista_metricas], dtype=np.float64)
+        for campo in CAMPOS_PUNTUACION
+    }
+
+
+def calcular_puntuaciones_lote(metricas, preferencias, exactas=True):
+    """
+    Versión vectorizada de `calcular_puntuacion_normalizada`: recibe las métricas
+    de N horarios como arrays ({campo: np.ndarray}) y retorna un array con las
+    N puntuaciones, iguales a las del cálculo escalar.
+
+    Las operaciones siguen el mismo orden que la versión escalar. Como `np.power`
+    y `np.round` pueden diferir en el último bit de `**` y `round`, los valores
+    que quedan a un pelo de un empate de redondeo se recalculan con la función
+    escalar. Con `exactas=False` se omite ese paso: cada puntuación puede
+    diferir de la escalar en a lo más 0.01.
+    """
+    total_huecos = metricas['total_huecos_minutos']
+    puntuacion = np.zeros(len(total_huecos))
+
+    # ───── 1. Huecos (35 pts)
+    if preferencias.get('minimizar_huecos', True):
+        puntuacion += np.maximum(0, 35 * (1 - np.minimum(total_huecos / 180, 1) ** 1.3))
+    else:
+        puntuacion += 17.5
+
+    # ───── 2. Horario (30 pts) — adaptativo
+    inicio_real = metricas['hora_inicio_promedio']
+    fin_real = metricas['hora_fin_promedio']
+    pref_horario = preferencias.get('preferencia_horario', 'neutro')
+    min_inicio = preferencias.get('rango_inicio_min', 8.0)
+    max_fin = preferencias.get('rango_fin_max', 23.0)
+
+    inicio_norm = np.clip((inicio_real - min_inicio) / (max_fin - min_inicio), 0, 1)
+    fin_norm = np.clip((fin_real - min_inicio) / (max_fin - min_inicio), 0, 1)
+    if pref_horario == 'entrar_temprano':
+        pts_horario = (1 - inicio_norm) * 30
+    elif pref_horario == 'entrar_tarde':
+        pts_horario = inicio_norm * 30
+    elif pref_horario == 'salir_temprano':
+        pts_horario = (1 - fin_norm) * 30
+    elif pref_horario == 'salir_tarde':
+        pts_horario = fin_norm * 30
+    else:
+        centro = (min_inicio + max_fin) / 2
+        distancia = np.abs(((inicio_real + fin_real) / 2) - centro)
+        max_distancia = (max_fin - min_inicio) / 2
+        pts_horario = np.maximum(0, 1 - (distancia / max_distancia)) * 30
+    puntuacion += np.where((inicio_real == 0) | (fin_real == 0), 15, pts_horario)
+
+    # ───── 3. Clases virtuales (15 pts)
+    ratio_virtual = metricas['clases_virtuales'] / np.maximum(1, metricas['total_clases'])
+    pref_virtual = preferencias.get('preferir_virtuales', 'neutro')
+    if pref_virtual == 'si':
+        puntuacion += ratio_virtual * 15
+    elif pref_virtual == 'no':
+        puntuacion += (1 - ratio_virtual) * 15
+    else:
+        puntuacion += 7.5
+
+    # ───── 4. Balance de carga (10 pts)
+    puntuacion += metricas['balance_carga'] * 10
+
+    # ───── 5. Compacidad (10 pts)
+    pts_dias = np.maximum(0, 5 - np.abs(metricas['dias_usados'] - 3) * 1.5)
+    pts_hueco = np.maximum(0, 5 - np.minimum(metricas['max_hueco_dia'] / 120, 1) * 5)
+    puntuacion += pts_dias + pts_hueco
+
+    puntuacion = np.clip(puntuacion, 0, 100)
+    redondeadas = np.round(puntuacion, 2)
+
+    if not exactas:
+        return redondeadas
+
+    escaladas = puntuacion * 100
+    dudosas = np.flatnonzero(np.abs(escaladas - np.floor(escaladas) - 0.5) < 1e-6)
+    for i in dudosas:
+        fila = {campo: valores[i].item() for campo, valores in metricas.items()}
+        redondeadas[i] = calcular_puntuacion_normalizada(fila, preferencias)
+    return redondeadas
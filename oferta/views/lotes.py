@@ -0,0 +1,285 @@
+# oferta/views/lotes.py
+"""
+Generación de horarios por lotes
+--------------------------------
+Para planificar una cohorte (muchos conjuntos de siglas por carrera y nivel,
+o un mismo conjunto con distintas preferencias) se envían todas las
+solicitudes de una sede juntas, en vez de una llamada a la API por cada una.
+
+- El snapshot de la sede se abre una vez.
+- La matriz de conflictos se construye una vez para todas las secciones de
+  las siglas del lote. Cada solicitud toma de ella la submatriz de sus
+  secciones para el diagnóstico, el conjunto factible y la búsqueda.
+- Las solicitudes que solo difieren en las preferencias se calculan juntas
+  (un conjunto factible o una búsqueda multiperfil), como en
+  `generar_rankings_serializados`.
+- Los cálculos se reparten en un pool de procesos (con `fork`, heredan el
+  snapshot y la matriz sin serializarlos). Cada uno tiene su propio límite
+  de tiempo y no usa la base de datos, así que la serialización y las cachés
+  quedan en el proceso principal.
+
+El resultado es uno solo, con un resultado por solicitud en el mismo orden.
+La API no calcula dentro del request: encola el lote como un trabajo (ver
+`trabajos`), con un tope de tiempo total para que el proceso de la cola no
+lo dé por abandonado. El comando `generar_lote` lo calcula directamente.
+"""
+
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.http import require_http_methods
+
+from .generador import (
+    MENSAJE_SIN_COMBINACIONES,
+    calcular_rankings,
+    serializar_rankings,
+    son_heuristicos,
+)
+from .generador_cache import clave_factibles, clave_resultados, guardar_resultados, obtener_resultados
+from .generador_conflictos import MatrizConflictos
+from .generador_factibles import cache_factibles
+from .generador_paralelo import paralelo_disponible
+from .generador_snapshot import obtener_snapshot
+from .generador_utils import MAX_TIEMPO_GENERACION, compilar_secciones
+from .trabajos import TIEMPO_MAXIMO_EN_PROCESO, encolar_trabajo, trabajo_a_json
+
+# Solicitudes máximas por lote
+MAX_SOLICITUDES_LOTE = 100
+
+# Segundos por cálculo si el lote no indica otro límite
+TIEMPO_POR_SOLICITUD = 10
+
+# Tope de segundos de un lote encolado desde la API, en el peor caso (todas las
+# solicitudes agotan su tiempo). Menor que `TIEMPO_MAXIMO_EN_PROCESO`, tras el
+# cual la cola devuelve el trabajo a pendiente como abandonado
+MAX_TIEMPO_LOTE = TIEMPO_MAXIMO_EN_PROCESO.total_seconds() * 3 / 4
+
+# Sobre esta cantidad de secciones no se comparte la matriz (crece con el cuadrado)
+MAX_SECCIONES_COMPARTIDAS = 1500
+
+# Estado de cada proceso del pool (lo fija `_inicializar_proceso`)
+_contexto = {}
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# MATRIZ DE CONFLICTOS COMPARTIDA
+# ════════════════════════════════════════════════════════════════════════════════
+class ConflictosCompartidos:
+    """
+    Matriz de conflictos entre todas las secciones de `por_sigla` (registros
+    del snapshot, de todas las jornadas). Una solicitud con parte de esas
+    secciones toma su submatriz en vez de compararlas de nuevo.
+    """
+
+    def __init__(self, por_sigla):
+        secciones = [s for secciones in compilar_secciones(por_sigla).values() for s in secciones]
+        self.fila = {s.asignatura.id: s.indice for s in secciones}
+        self.matriz = MatrizConflictos(secciones).matriz
+
+    def __len__(self):
+        return len(self.fila)
+
+    def submatriz(self, secciones):
+        """Conflictos entre `secciones` (compiladas), o None si alguna no está."""
+        try:
+            filas = np.array([self.fila[s.asignatura.id] for s in secciones], dtype=np.intp)
+        except KeyError:
+            return None
+        return self.matriz[np.ix_(filas, filas)]
+
+
+def compartir_conflictos(snapshot, solicitudes):
+    """
+    `ConflictosCompartidos` de las siglas de `solicitudes`, o None si no vale
+    la pena (una sola solicitud) o si son demasiadas secciones.
+    """
+    if len(solicitudes) < 2:
+        return None
+    siglas = sorted({
+        sigla for data in solicitudes
+        for sigla in data.get('siglas') or [] if isinstance(sigla, str)
+    })
+    por_sigla = snapshot.por_sigla(siglas)
+    if not por_sigla or sum(len(secciones) for secciones in por_sigla.values()) > MAX_SECCIONES_COMPARTIDAS:
+        return None
+    return ConflictosCompartidos(por_sigla)
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# LOTE
+# ════════════════════════════════════════════════════════════════════════════════
+def validar_lote(data):
+    """
+    (sede, solicitudes, segundos por cálculo, error) del cuerpo de un lote;
+    si hay error, es el mensaje a mostrar y los otros valores son None.
+    """
+    sede = data.get('sede')
+    solicitudes = data.get('solicitudes')
+    max_tiempo = data.get('tiempo_por_solicitud', TIEMPO_POR_SOLICITUD)
+    if not sede:
+        return None, None, None, 'La sede es requerida'
+    if not isinstance(solicitudes, list) or not solicitudes or not all(isinstance(s, dict) for s in solicitudes):
+        return None, None, None, "'solicitudes' debe ser una lista de solicitudes de generación"
+    if len(solicitudes) > MAX_SOLICITUDES_LOTE:
+        return None, None, None, f'Un lote admite hasta {MAX_SOLICITUDES_LOTE} solicitudes'
+    if isinstance(max_tiempo, bool) or not isinstance(max_tiempo, (int, float)) or max_tiempo <= 0:
+        return None, None, None, "'tiempo_por_solicitud' debe ser un número de segundos mayor que 0"
+    return sede, solicitudes, min(max_tiempo, MAX_TIEMPO_GENERACION), None
+
+
+def tiempo_maximo_lote(solicitudes, max_tiempo, procesos):
+    """Segundos de `generar_lote` si cada cálculo agota `max_tiempo` (en `procesos` procesos)."""
+    procesos = procesos_efectivos(procesos, solicitudes)
+    return -(-len(solicitudes) // procesos) * max_tiempo
+
+
+def _inicializar_proceso(snapshot, conflictos, max_tiempo):
+    _contexto.update(snapshot=snapshot, conflictos=conflictos, max_tiempo=max_tiempo)
+
+
+def _calcular(tarea):
+    data, perfiles = tarea
+    try:
+        return calcular_rankings(data, perfiles, _contexto['snapshot'], _contexto['conflictos'],
+                                 max_tiempo=_contexto['max_tiempo'])
+    except Exception as e:
+        # Una solicitud que falla no tumba el lote
+        return None, None, False, str(e)
+
+
+def procesos_efectivos(procesos, tareas):
+    """Procesos que usa `calcular_en_pool` (1 = en el proceso actual)."""
+    if len(tareas) <= 1 or not paralelo_disponible():
+        return 1
+    return max(1, min(procesos, len(tareas)))
+
+
+def calcular_en_pool(tareas, snapshot, conflictos, max_tiempo, procesos):
+    """Resultados de `calcular_rankings` para cada tarea (data, perfiles), en orden."""
+    contexto = (snapshot, conflictos, max_tiempo)
+    procesos = procesos_efectivos(procesos, tareas)
+    if procesos == 1:
+        _inicializar_proceso(*contexto)
+        try:
+            return [_calcular(tarea) for tarea in tareas]
+        finally:
+            _contexto.clear()
+    with ProcessPoolExecutor(
+        max_workers=procesos, mp_context=multiprocessing.get_context('fork'),
+        initializer=_inicializar_proceso, initargs=contexto,
+    ) as pool:
+        return list(pool.map(_calcular, tareas))
+
+
+def generar_lote(sede, solicitudes, procesos=1, max_tiempo=TIEMPO_POR_SOLICITUD):
+    """
+    Horarios de cada solicitud (cuerpos como los de `api_generar_horarios`,
+    sin la sede) de `sede`, con `max_tiempo` segundos por cálculo y hasta
+    `procesos` procesos. Retorna (resultados, estadisticas); cada resultado
+    es {'horarios', 'heuristico'} o {'error'}, con la 'etiqueta' de la
+    solicitud si traía una.
+    """
+    tiempo_inicio = time.time()
+    datos = [dict(solicitud, sede=sede) for solicitud in solicitudes]
+    claves = [clave_resultados(data) for data in datos]
+    resultados = [None] * len(datos)
+
+    # Pendientes agrupadas por lo que no depende de las preferencias
+    grupos = {}
+    for i, (data, clave) in enumerate(zip(datos, claves)):
+        horarios = obtener_resultados(clave)
+        if horarios is not None:
+            resultados[i] = {'horarios': horarios}
+            continue
+        grupo = (clave_factibles(data), bool(data.get('alternativas')), data.get('motor', 'auto'))
+        grupos.setdefault(grupo, []).append(i)
+
+    # Los grupos con conjunto factible en caché solo se re-puntúan; el resto se calcula
+    conjuntos = {grupo: cache_factibles.obtener(grupo[0]) for grupo in grupos}
+    por_calcular = [grupo for grupo in grupos if conjuntos[grupo] is None]
+    snapshot = obtener_snapshot(sede)
+    conflictos = compartir_conflictos(snapshot, [datos[grupos[grupo][0]] for grupo in por_calcular])
+    tareas = [
+        (datos[grupos[grupo][0]], [datos[i].get('preferencias', {}) for i in grupos[grupo]])
+        for grupo in por_calcular
+    ]
+    calculados = dict(zip(por_calcular, calcular_en_pool(tareas, snapshot, conflictos, max_tiempo, procesos)))
+
+    for grupo, indices in grupos.items():
+        generados, timeout, error = None, False, None
+        conjunto = conjuntos[grupo]
+        if conjunto is None:
+            conjunto, generados, timeout, error = calculados[grupo]
+            if conjunto is not None:
+                cache_factibles.guardar(grupo[0], conjunto)
+        if error:
+            for i in indices:
+                resultados[i] = {'error': error}
+            continue
+
+        perfiles = [datos[i].get('preferencias', {}) for i in indices]
+        for i, horarios in zip(indices, serializar_rankings(datos[indices[0]], perfiles, conjunto, generados)):
+            resultados[i] = {'horarios': horarios}
+            if not timeout:
+                guardar_resultados(claves[i], horarios)
+
+    for resultado, solicitud in zip(resultados, solicitudes):
+        if 'horarios' in resultado:
+            if not resultado['horarios']:
+                del resultado['horarios']
+                resultado['error'] = MENSAJE_SIN_COMBINACIONES
+            else:
+                resultado['heuristico'] = son_heuristicos(resultado['horarios'])
+        if 'etiqueta' in solicitud:
+            resultado['etiqueta'] = solicitud['etiqueta']
+
+    estadisticas = {
+        'solicitudes': len(datos),
+        'desde_cache': len(datos) - sum(len(indices) for indices in grupos.values()),
+        'calculos': len(tareas),
+        'secciones_compartidas': len(conflictos) if conflictos is not None else 0,
+        'procesos': procesos_efectivos(procesos, tareas),
+        'tiempo': time.time() - tiempo_inicio,
+    }
+    return resultados, estadisticas
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# API
+# ════════════════════════════════════════════════════════════════════════════════
+@require_http_methods(["POST"])
+def api_generar_lote(request):
+    """
+    Encola la generación de un lote de solicitudes de una sede:
+    {'sede', 'solicitudes': [{'siglas', 'preferencias', ...}], 'tiempo_por_solicitud'}.
+    Responde 202 con el trabajo (ver `trabajos`); completado, trae
+    'resultados' con uno por solicitud y 'estadisticas' (ver `generar_lote`).
+    Un lote que en el peor caso supera `MAX_TIEMPO_LOTE` se rechaza con 413.
+    Solo para el personal (coordinadores).
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'No autorizado'}, status=403)
+    try:
+        data = json.loads(request.body)
+        sede, solicitudes, max_tiempo, error = validar_lote(data)
+        if error:
+            return JsonResponse({'error': error}, status=400)
+        if tiempo_maximo_lote(solicitudes, max_tiempo, settings.GENERADOR_PROCESOS) > MAX_TIEMPO_LOTE:
+            return JsonResponse({'error': (
+                f'El lote puede tardar más de {MAX_TIEMPO_LOTE:.0f} segundos: divídelo, baja '
+                "'tiempo_por_solicitud' o usa el comando generar_lote"
+            )}, status=413)
+
+        trabajo, creado = encolar_trabajo({'sede': sede, 'solicitudes': solicitudes,
+                                           'tiempo_por_solicitud': max_tiempo})
+        return JsonResponse(trabajo_a_json(trabajo), status=202 if creado else 200)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Datos inválidos'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
@@ -0,0 +1,252 @@
+# oferta/views/trabajos.py
+"""
+Cola de trabajos del generador de horarios
+------------------------------------------
+La generación pesada sale del ciclo request/response: la API solo registra el
+trabajo en la base de datos y un proceso aparte (`manage.py procesar_generaciones`)
+lo ejecuta. El cliente consulta el estado hasta que esté completado.
+
+- Solicitudes idénticas en curso (o con resultado vigente) comparten trabajo;
+  una restricción única parcial sobre la clave impide duplicarlos.
+- Un trabajo se toma con un UPDATE condicional sobre su estado, así dos
+  procesos nunca ejecutan el mismo.
+- Los resultados expiran tras `GENERADOR_TTL_RESULTADOS` segundos.
+
+Un trabajo de lote (parámetros con 'solicitudes', ver `lotes`) ejecuta
+`generar_lote` y guarda un resultado por solicitud.
+"""
+
+import hashlib
+import json
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
+
+from ..models import TrabajoGeneracion, VersionOferta
+from .generador import (
+    MENSAJE_SIN_COMBINACIONES,
+    generar_horarios_serializados,
+    generar_rankings_serializados,
+    perfiles_de_solicitud,
+    perfiles_serializados,
+    son_heuristicos,
+    validar_solicitud_generacion,
+)
+from .generador_utils import MAX_TIEMPO_GENERACION
+
+# Un trabajo en proceso por más de esto se considera abandonado (proceso caído)
+TIEMPO_MAXIMO_EN_PROCESO = timedelta(seconds=MAX_TIEMPO_GENERACION * 4)
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# COLA
+# ════════════════════════════════════════════════════════════════════════════════
+def normalizar_parametros(data):
+    """
+    Parámetros de generación en forma canónica (el orden de siglas no
+    importa). Con 'perfiles', las preferencias de cada perfil reemplazan a
+    'preferencias'. Un lote ya validado (ver `lotes.validar_lote`) conserva
+    sus solicitudes en orden, que es el de los resultados.
+    """
+    if 'solicitudes' in data:
+        return {
+            'sede': data.get('sede'),
+            'solicitudes': data['solicitudes'],
+            'tiempo_por_solicitud': data['tiempo_por_solicitud'],
+        }
+    parametros = {
+        'sede': data.get('sede'),
+        'jornada': data.get('jornada') or None,
+        'siglas': sorted(set(data.get('siglas', []))),
+        'preferencias': data.get('preferencias', {}),
+        'restricciones': data.get('restricciones') or {},
+        'alternativas': bool(data.get('alternativas')),
+        'motor': data.get('motor', 'auto'),
+    }
+    if 'perfiles' in data:
+        parametros['preferencias'] = {}
+        parametros['perfiles'] = data['perfiles']
+    return parametros
+
+
+def clave_de(parametros):
+    contenido = json.dumps(parametros, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def encolar_trabajo(data):
+    """
+    Retorna (trabajo, creado). Si hay un trabajo idéntico pendiente, en
+    proceso o completado y vigente, se reutiliza en vez de crear otro. Un
+    completado ya vencido se elimina (como en `purgar_trabajos_vencidos`)
+    para dejar lugar al nuevo.
+
+    Si dos procesos encolan la misma solicitud a la vez, la restricción única
+    de `TrabajoGeneracion` rechaza el segundo INSERT y ese proceso retorna el
+    trabajo del primero.
+    """
+    parametros = normalizar_parametros(data)
+    # Con la versión de la oferta: tras recargar la sede no se reutilizan resultados viejos
+    clave = clave_de(dict(parametros, version=VersionOferta.actual(parametros['sede'])))
+    activos = TrabajoGeneracion.objects.filter(clave=clave, estado__in=TrabajoGeneracion.ACTIVOS)
+    TrabajoGeneracion.objects.filter(
+        clave=clave, estado=TrabajoGeneracion.COMPLETADO, expira_en__lte=timezone.now()
+    ).delete()
+    existente = activos.first()
+    if existente:
+        return existente, False
+    try:
+        with transaction.atomic():
+            return TrabajoGeneracion.objects.create(clave=clave, parametros=parametros), True
+    except IntegrityError:
+        return activos.get(), False
+
+
+def tomar_siguiente_trabajo(nombre_proceso=None):
+    """
+    Toma el trabajo pendiente más antiguo. El UPDATE condicional sobre el
+    estado garantiza que solo un proceso lo obtenga; si otro se adelantó, se
+    intenta con el siguiente. Retorna None si la cola está vacía.
+    """
+    nombre_proceso = nombre_proceso or f'{socket.gethostname()}:{os.getpid()}'
+    while True:
+        candidato = (
+            TrabajoGeneracion.objects
+            .filter(estado=TrabajoGeneracion.PENDIENTE)
+            .order_by('creado_en')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if candidato is None:
+            return None
+        tomado = TrabajoGeneracion.objects.filter(
+            pk=candidato, estado=TrabajoGeneracion.PENDIENTE
+        ).update(
+            estado=TrabajoGeneracion.EN_PROCESO,
+            iniciado_en=timezone.now(),
+            tomado_por=nombre_proceso[:100],
+        )
+        if tomado:
+            return TrabajoGeneracion.objects.get(pk=candidato)
+
+
+def ejecutar_trabajo(trabajo):
+    """Ejecuta un trabajo ya tomado y guarda su resultado o error."""
+    parametros = trabajo.parametros
+    try:
+        if 'solicitudes' in parametros:
+            from .lotes import generar_lote
+            resultados, estadisticas = generar_lote(
+                parametros['sede'], parametros['solicitudes'], procesos=settings.GENERADOR_PROCESOS,
+                max_tiempo=parametros['tiempo_por_solicitud'],
+            )
+            error = None
+            resultado = {'resultados': resultados, 'estadisticas': estadisticas}
+        elif 'perfiles' in parametros:
+            rankings, error = generar_rankings_serializados(parametros, parametros['perfiles'])
+            if not error and not any(rankings):
+                error = MENSAJE_SIN_COMBINACIONES
+            resultado = None if error else {'perfiles': perfiles_serializados(parametros['perfiles'], rankings)}
+        else:
+            horarios, error = generar_horarios_serializados(parametros)
+            if not error and not horarios:
+                error = MENSAJE_SIN_COMBINACIONES
+            resultado = {'horarios': horarios}
+    except Exception as e:
+        error = str(e)
+
+    ahora = timezone.now()
+    trabajo.terminado_en = ahora
+    trabajo.expira_en = ahora + timedelta(seconds=settings.GENERADOR_TTL_RESULTADOS)
+    if error:
+        trabajo.estado = TrabajoGeneracion.ERROR
+        trabajo.error = error
+    else:
+        trabajo.estado = TrabajoGeneracion.COMPLETADO
+        trabajo.resultado = resultado
+    trabajo.save(update_fields=['estado', 'resultado', 'error', 'terminado_en', 'expira_en'])
+    return trabajo
+
+
+def liberar_trabajos_abandonados():
+    """Devuelve a la cola los trabajos cuyo proceso murió a mitad de camino."""
+    limite = timezone.now() - TIEMPO_MAXIMO_EN_PROCESO
+    return TrabajoGeneracion.objects.filter(
+        estado=TrabajoGeneracion.EN_PROCESO, iniciado_en__lt=limite
+    ).update(estado=TrabajoGeneracion.PENDIENTE, iniciado_en=None, tomado_por='')
+
+
+def purgar_trabajos_vencidos():
+    """Elimina los trabajos terminados cuyo resultado ya expiró."""
+    borrados, _ = TrabajoGeneracion.objects.filter(
+        estado__in=[TrabajoGeneracion.COMPLETADO, TrabajoGeneracion.ERROR],
+        expira_en__lte=timezone.now(),
+    ).delete()
+    return borrados
+
+
+# ════════════════════════════════════════════════════════════════════════════════
+# API
+# ════════════════════════════════════════════════════════════════════════════════
+def trabajo_a_json(trabajo):
+    data = {
+        'id': str(trabajo.id),
+        'estado': trabajo.estado,
+        'url': reverse('api_estado_trabajo', args=[trabajo.id]),
+    }
+    if trabajo.estado == TrabajoGeneracion.PENDIENTE:
+        data['posicion'] = TrabajoGeneracion.objects.filter(
+            estado=TrabajoGeneracion.PENDIENTE, creado_en__lt=trabajo.creado_en
+        ).count() + 1
+    elif trabajo.estado == TrabajoGeneracion.COMPLETADO and 'resultados' in trabajo.resultado:
+        data['resultados'] = trabajo.resultado['resultados']
+        data['estadisticas'] = trabajo.resultado['estadisticas']
+    elif trabajo.estado == TrabajoGeneracion.COMPLETADO and 'perfiles' in trabajo.resultado:
+        data['perfiles'] = trabajo.resultado['perfiles']
+    elif trabajo.estado == TrabajoGeneracion.COMPLETADO:
+        data['horarios'] = trabajo.resultado['horarios']
+        data['heuristico'] = son_heuristicos(data['horarios'])
+    elif trabajo.estado == TrabajoGeneracion.ERROR:
+        data['error'] = trabajo.error
+    return data
+
+
+@require_http_methods(["POST"])
+def api_crear_trabajo_generacion(request):
+    """
+    Registra una solicitud de generación (mismo cuerpo que
+    `api_generar_horarios`, también con 'perfiles') y retorna el trabajo para
+    consultar su estado.
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Datos inválidos'}, status=400)
+
+    # Lo que fallaría en el proceso de la cola se rechaza antes de encolar
+    _, error = validar_solicitud_generacion(data)
+    if error:
+        return JsonResponse({'error': error}, status=400)
+    if 'perfiles' in data:
+        _, error = perfiles_de_solicitud(data)
+        if error:
+            return JsonResponse({'error': error}, status=400)
+
+    trabajo, creado = encolar_trabajo(data)
+    return JsonResponse(trabajo_a_json(trabajo), status=202 if creado else 200)
+
+
+@require_http_methods(["GET"])
+def api_estado_trabajo_generacion(request, trabajo_id):
+    """Estado de un trabajo y, si terminó, sus horarios o el error."""
+    trabajo = TrabajoGeneracion.objects.filter(pk=trabajo_id).first()
+    if trabajo is None:
+        return JsonResponse({'error': 'Trabajo no encontrado o expirado'}, status=404)
+    return JsonResponse(trabajo_a_json(trabajo))